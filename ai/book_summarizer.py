@@ -0,0 +1,393 @@
+"""
+Offline map-reduce summaries of whole books
+
+Run before serving, or whenever books change:
+
+    python -m ai.book_summarizer
+    python -m ai.book_summarizer --book intelligent_investor --force
+
+Each book is split into chapters (and chapters longer than a prompt into
+parts), the parts are summarized concurrently under a Groq rate limit, and
+the chapter summaries are reduced into one book summary. Artifacts are
+versioned by book hash, so an edited book gets a new summary.
+"""
+import os
+import re
+import json
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import config
+from ai.chunking import TextChunker
+from utils.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Bump when prompts or the pipeline change; older artifacts are regenerated
+SUMMARY_VERSION = "1"
+
+# Chapter headings: markdown level 1-2 headings, or lines such as "Chapter 3: ..."
+CHAPTER_HEADING = re.compile(
+    r"^(?:#{1,2}[ \t]+\S[^\n]{0,118}|(?:chapter|part|book)[ \t]+[\w-]+\b[^\n]{0,100})$",
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Chapters shorter than this many tokens are merged with a neighbouring one
+MIN_CHAPTER_TOKENS = 200
+
+class BookSummarizer:
+    """
+    Builds whole-book summaries with map-reduce and stores them as JSON
+    artifacts, one file per book and book hash.
+    """
+
+    def __init__(self, groq_client, summaries_dir: Path, concurrency: Optional[int] = None,
+                 requests_per_minute: Optional[int] = None, section_tokens: Optional[int] = None):
+        """
+        Initialize the summarizer.
+
+        Args:
+            groq_client: Groq client used for the summarization calls
+            summaries_dir: Directory holding the summary artifacts
+            concurrency: Parallel LLM calls (defaults to config setting)
+            requests_per_minute: LLM call rate limit (defaults to config setting)
+            section_tokens: Maximum tokens of book text per map prompt (defaults to config setting)
+        """
+        self.groq_client = groq_client
+        self.summaries_dir = Path(summaries_dir)
+        os.makedirs(self.summaries_dir, exist_ok=True)
+
+        self.concurrency = concurrency or config.BOOK_SUMMARY_CONCURRENCY
+        self.rate_limiter = RateLimiter(requests_per_minute or config.BOOK_SUMMARY_REQUESTS_PER_MINUTE)
+        self.section_chunker = TextChunker(
+            chunk_size=section_tokens or config.BOOK_SUMMARY_SECTION_TOKENS,
+            chunk_overlap=0
+        )
+
+        self._background: Dict[str, threading.Thread] = {}
+        self._background_lock = threading.Lock()
+
+    def artifact_path(self, book_id: str, book_hash: str) -> Path:
+        """Path of the artifact for a book at a given content hash."""
+        return self.summaries_dir / f"{book_id}.{book_hash[:16]}.v{SUMMARY_VERSION}.json"
+
+    def load(self, book_id: str, book_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Load the artifact for the current version of a book.
+
+        Args:
+            book_id: Identifier for the book
+            book_hash: SHA-256 of the book file
+
+        Returns:
+            Summary artifact, or None if it has not been generated
+        """
+        return self._read(self.artifact_path(book_id, book_hash))
+
+    def latest(self, book_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load the most recently generated artifact for a book, whatever its version.
+
+        Args:
+            book_id: Identifier for the book
+
+        Returns:
+            Summary artifact, or None if none exists
+        """
+        paths = sorted(self.summaries_dir.glob(f"{book_id}.*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for path in paths:
+            artifact = self._read(path)
+            if artifact is not None:
+                return artifact
+        return None
+
+    @staticmethod
+    def _read(path: Path) -> Optional[Dict[str, Any]]:
+        """Read an artifact file, or None if missing or unreadable."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Error loading summary artifact {path.name}: {e}")
+            return None
+
+    def summarize_book(self, book: Dict[str, Any], book_hash: str, force: bool = False) -> Dict[str, Any]:
+        """
+        Summarize a whole book and store the artifact.
+
+        Args:
+            book: Book metadata with 'id', 'title', 'author' and 'file_path'
+            book_hash: SHA-256 of the book file
+            force: Regenerate even if an artifact for this hash exists
+
+        Returns:
+            Summary artifact
+
+        Raises:
+            RuntimeError: If an LLM call fails; nothing is stored
+        """
+        book_id = book["id"]
+        if not force:
+            artifact = self.load(book_id, book_hash)
+            if artifact is not None:
+                return artifact
+
+        started = time.time()
+        with open(book["file_path"], 'r', encoding='utf-8') as f:
+            text = f.read()
+
+        chapters = self._split_chapters(text, book["title"])
+        logger.info(
+            f"Summarizing {book_id}: {len(chapters)} chapters, "
+            f"{sum(len(chapter['parts']) for chapter in chapters)} parts"
+        )
+
+        # Map: every part of every chapter, concurrently
+        parts = [(chapter, part) for chapter in chapters for part in chapter["parts"]]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            part_summaries = list(executor.map(
+                lambda item: self._summarize_part(book, item[0]["title"], text[item[1][0]:item[1][1]]),
+                parts
+            ))
+
+        # Chapters split into several parts get one combined summary each
+        calls = len(parts)
+        summaries_by_chapter: Dict[int, List[str]] = {}
+        for (chapter, _), summary in zip(parts, part_summaries):
+            summaries_by_chapter.setdefault(chapter["index"], []).append(summary)
+
+        multi_part = [chapter for chapter in chapters if len(summaries_by_chapter[chapter["index"]]) > 1]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            combined = list(executor.map(
+                lambda chapter: self._combine(book, chapter["title"], summaries_by_chapter[chapter["index"]]),
+                multi_part
+            ))
+        calls += len(multi_part)
+        for chapter, summary in zip(multi_part, combined):
+            summaries_by_chapter[chapter["index"]] = [summary]
+
+        chapter_entries = [{
+            "index": chapter["index"],
+            "title": chapter["title"],
+            "start_offset": chapter["start"],
+            "end_offset": chapter["end"],
+            "summary": summaries_by_chapter[chapter["index"]][0]
+        } for chapter in chapters]
+
+        # Reduce: chapter summaries into the book summary
+        summary, reduce_calls = self._reduce(book, [entry["summary"] for entry in chapter_entries])
+        calls += reduce_calls
+
+        artifact = {
+            "version": SUMMARY_VERSION,
+            "book_id": book_id,
+            "book_hash": book_hash,
+            "title": book["title"],
+            "author": book["author"],
+            "summary": summary,
+            "chapters": chapter_entries,
+            "llm_calls": calls,
+            "generated_at": datetime.now().isoformat()
+        }
+        self._save(book_id, book_hash, artifact)
+
+        logger.info(f"Summarized {book_id} with {calls} LLM calls in {time.time() - started:.1f}s")
+        return artifact
+
+    def summarize_in_background(self, book: Dict[str, Any], book_hash: str) -> bool:
+        """
+        Start summarizing a book on a daemon thread unless it is already running.
+
+        Args:
+            book: Book metadata
+            book_hash: SHA-256 of the book file
+
+        Returns:
+            True if a new job was started
+        """
+        book_id = book["id"]
+        with self._background_lock:
+            thread = self._background.get(book_id)
+            if thread is not None and thread.is_alive():
+                return False
+
+            def run():
+                try:
+                    self.summarize_book(book, book_hash)
+                except Exception as e:
+                    logger.error(f"Error summarizing {book_id}: {str(e)}")
+
+            thread = threading.Thread(target=run, name=f"summarize-{book_id}", daemon=True)
+            self._background[book_id] = thread
+            thread.start()
+            return True
+
+    def _split_chapters(self, text: str, title: str) -> List[Dict[str, Any]]:
+        """
+        Split a book into chapters at headings, each split into parts that fit a prompt.
+
+        Returns:
+            Chapters with 'index', 'title', 'start', 'end' and 'parts' as (start, end) offsets
+        """
+        headings = list(CHAPTER_HEADING.finditer(text))
+
+        bounds = []
+        if headings and text[:headings[0].start()].strip():
+            bounds.append((title, 0, headings[0].start()))
+        for i, heading in enumerate(headings):
+            end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+            bounds.append((heading.group(0).lstrip("#").strip(), heading.start(), end))
+        if not bounds:
+            bounds.append((title, 0, len(text)))
+
+        # Fold short sections (front matter, one-paragraph headings) into their neighbour
+        counter = self.section_chunker.counter
+        merged: List[List[Any]] = []
+        for section_title, start, end in bounds:
+            if merged and (counter.count(text[start:end]) < MIN_CHAPTER_TOKENS or
+                           counter.count(text[merged[-1][1]:merged[-1][2]]) < MIN_CHAPTER_TOKENS):
+                merged[-1][2] = end
+            else:
+                merged.append([section_title, start, end])
+
+        chapters = []
+        for section_title, start, end in merged:
+            parts = [
+                (start + chunk["start"], start + chunk["end"])
+                for chunk in self.section_chunker.chunk(text[start:end])
+            ]
+            if parts:
+                chapters.append({
+                    "index": len(chapters),
+                    "title": section_title,
+                    "start": start,
+                    "end": end,
+                    "parts": parts
+                })
+        return chapters
+
+    def _summarize_part(self, book: Dict[str, Any], chapter_title: str, text: str) -> str:
+        """Map step: summarize one part of a chapter."""
+        prompt = (
+            f"You are summarizing '{book['title']}' by {book['author']} one section at a time.\n"
+            f"Section: {chapter_title}\n\n"
+            f"Text:\n{text}\n\n"
+            "Summarize the main ideas, financial concepts and lessons of this section "
+            "in 100-150 words. Do not add anything that is not in the text."
+        )
+        return self._generate(prompt)
+
+    def _combine(self, book: Dict[str, Any], chapter_title: str, summaries: List[str]) -> str:
+        """Combine the summaries of a chapter's parts into one chapter summary."""
+        joined = "\n\n".join(f"[Part {i+1}] {summary}" for i, summary in enumerate(summaries))
+        prompt = (
+            f"Below are summaries of consecutive parts of the section '{chapter_title}' "
+            f"of '{book['title']}' by {book['author']}.\n\n"
+            f"{joined}\n\n"
+            "Combine them into a single summary of the section in 120-180 words."
+        )
+        return self._generate(prompt)
+
+    def _reduce(self, book: Dict[str, Any], summaries: List[str]) -> "tuple[str, int]":
+        """
+        Reduce chapter summaries into the book summary, in rounds if they do
+        not fit in one prompt.
+
+        Returns:
+            Tuple of (book summary, LLM calls made)
+        """
+        calls = 0
+        budget = self.section_chunker.chunk_size
+        counter = self.section_chunker.counter
+
+        while len(summaries) > 1 and counter.count("\n\n".join(summaries)) > budget:
+            groups, group, tokens = [], [], 0
+            for summary in summaries:
+                summary_tokens = counter.count(summary)
+                if group and tokens + summary_tokens > budget:
+                    groups.append(group)
+                    group, tokens = [], 0
+                group.append(summary)
+                tokens += summary_tokens
+            groups.append(group)
+
+            if len(groups) == len(summaries):
+                # No two summaries fit together; the final prompt takes them as they are
+                break
+
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                summaries = list(executor.map(
+                    lambda group: self._combine(book, "several consecutive chapters", group) if len(group) > 1 else group[0],
+                    groups
+                ))
+            calls += sum(1 for group in groups if len(group) > 1)
+
+        joined = "\n\n".join(f"[Chapter {i+1}] {summary}" for i, summary in enumerate(summaries))
+        prompt = (
+            f"You are helping to create a summary for '{book['title']}' by {book['author']}.\n"
+            "Based on the chapter summaries below, which cover the whole book, write a "
+            "concise summary of the book that includes:\n"
+            "1. The main thesis or premise of the book\n"
+            "2. Key financial concepts covered\n"
+            "3. Major takeaways or lessons for readers\n"
+            "4. Who would benefit most from reading this book\n\n"
+            "Chapter summaries:\n"
+            f"{joined}\n\n"
+            "Please provide a well-structured summary in 250-300 words."
+        )
+        return self._generate(prompt), calls + 1
+
+    def _generate(self, prompt: str) -> str:
+        """Make one rate-limited LLM call, raising on failure."""
+        self.rate_limiter.acquire()
+        text = self.groq_client.generate_text(prompt, temperature=0.3)
+        if text.startswith("Error:"):
+            raise RuntimeError(text[len("Error:"):].strip())
+        return text
+
+    def _save(self, book_id: str, book_hash: str, artifact: Dict[str, Any]) -> None:
+        """Write an artifact atomically and remove the book's older artifacts."""
+        path = self.artifact_path(book_id, book_hash)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(artifact, f, indent=2)
+        os.replace(tmp_path, path)
+
+        for old_path in self.summaries_dir.glob(f"{book_id}.*.json"):
+            if old_path != path:
+                old_path.unlink(missing_ok=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Precompute whole-book summaries.")
+    parser.add_argument("--book", nargs="+", help="Book ids to summarize (defaults to all)")
+    parser.add_argument("--force", action="store_true", help="Regenerate summaries that are up to date")
+    args = parser.parse_args(argv)
+
+    from ai.rag_system import initialize_rag_system
+    rag_system = initialize_rag_system()
+
+    failed = 0
+    for book in rag_system.get_available_books():
+        if args.book and book["id"] not in args.book:
+            continue
+        result = rag_system.precompute_book_summary(book["id"], force=args.force)
+        if "error" in result:
+            failed += 1
+            print(f"{book['id']}: {result['error']}")
+        else:
+            print(f"{book['id']}: {len(result['chapters'])} chapters, generated {result['generated_at']}")
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
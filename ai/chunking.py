@@ -0,0 +1,263 @@
+"""
+Token-aware text chunking shared by RAG indexing and retrieval
+"""
+import re
+import math
+import itertools
+import logging
+from typing import Dict, Any, List, Tuple, Optional, Iterable, Iterator
+
+import config
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Paragraphs are separated by blank lines
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+# Sentence ends: terminal punctuation (optionally closed by a quote or
+# bracket) followed by whitespace and an upper-case letter, digit or opener
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[A-Z0-9\"'(\[])")
+
+# Word and punctuation pieces used by the fallback token estimate
+_WORD_PIECE = re.compile(r"\w+|[^\w\s]")
+
+# Sub-word tokenizers split roughly this many tokens per word/punctuation piece
+_TOKENS_PER_PIECE = 1.3
+
+class TokenCounter:
+    """
+    Counts tokens with tiktoken when installed, otherwise with a word-piece
+    estimate. The name identifies the method so indexes can tell when token
+    counts (and therefore chunk boundaries) would change.
+    """
+
+    def __init__(self, encoding: str = "cl100k_base"):
+        """
+        Initialize the counter.
+
+        Args:
+            encoding: tiktoken encoding to use when tiktoken is installed
+        """
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.get_encoding(encoding)
+            except Exception as e:
+                logger.warning(f"Could not load tiktoken encoding {encoding}, estimating tokens: {str(e)}")
+
+        self.name = f"tiktoken-{encoding}" if self._encoding is not None else "estimate"
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens in a text.
+
+        Args:
+            text: Text to measure
+
+        Returns:
+            Number of tokens
+        """
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return math.ceil(len(_WORD_PIECE.findall(text)) * _TOKENS_PER_PIECE)
+
+
+class TextChunker:
+    """
+    Splits text into chunks of at most chunk_size tokens on sentence and
+    paragraph boundaries. A chunk never starts mid-sentence unless a single
+    sentence is longer than a chunk, and consecutive chunks share up to
+    chunk_overlap tokens of whole sentences. Every chunk carries its
+    character offsets in the source text.
+    """
+
+    def __init__(self, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None,
+                 counter: Optional[TokenCounter] = None):
+        """
+        Initialize the chunker.
+
+        Args:
+            chunk_size: Maximum tokens per chunk (defaults to config setting)
+            chunk_overlap: Tokens shared by consecutive chunks (defaults to config setting)
+            counter: Token counter (defaults to tiktoken or the estimate)
+        """
+        self.chunk_size = config.EMBEDDING_CHUNK_SIZE if chunk_size is None else chunk_size
+        self.chunk_overlap = config.EMBEDDING_CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+        if self.chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        # Overlap must leave room for progress
+        self.chunk_overlap = max(0, min(self.chunk_overlap, self.chunk_size // 2))
+        self.counter = counter or TokenCounter()
+
+    @property
+    def version(self) -> str:
+        """Identifier that changes whenever chunk boundaries would change."""
+        return f"sentences-v1-{self.counter.name}-{self.chunk_size}-{self.chunk_overlap}"
+
+    def chunk(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Split a text into chunks.
+
+        Args:
+            text: Text to split
+
+        Returns:
+            List of chunks with 'text', 'start' and 'end' character offsets
+            (text == source[start:end]), 'tokens' and 'index'
+        """
+        return list(self.chunk_stream([text], segment_chars=len(text) + 1))
+
+    def chunk_stream(self, blocks: Iterable[str], segment_chars: int = 1 << 20) -> Iterator[Dict[str, Any]]:
+        """
+        Chunk a text that arrives in blocks, holding about segment_chars of it
+        in memory. Yields exactly the chunks chunk() returns for the whole text.
+
+        Whenever segment_chars of unsplit text have arrived, the text up to
+        the last paragraph break is split into sentence units (paragraphs are
+        split independently, so this matches splitting the whole text), and
+        every chunk whose packing stopped at the token budget rather than at
+        the last known unit is emitted. Text before the first pending unit is
+        then dropped.
+
+        Args:
+            blocks: Consecutive pieces of the text
+            segment_chars: Amount of unsplit text that triggers splitting
+
+        Yields:
+            Chunks as returned by chunk(), with offsets into the whole text
+        """
+        buffer = ""  # text from offset base on
+        base = 0
+        scanned = 0  # offset up to which the text has been split into units
+        units: List[Tuple[int, int, int]] = []  # from the next chunk's first unit on
+        index = 0
+
+        for block in itertools.chain(blocks, [None]):
+            final = block is None
+            if final:
+                cut = base + len(buffer)
+            else:
+                buffer += block
+                if base + len(buffer) - scanned < segment_chars:
+                    continue
+
+                # Split only up to the last paragraph break, so no sentence is cut
+                cut = None
+                search_from = max(scanned - base, len(buffer) - segment_chars // 2)
+                for match in PARAGRAPH_BREAK.finditer(buffer, search_from):
+                    cut = base + match.start()
+                if cut is None or cut <= scanned:
+                    continue
+
+            units.extend(
+                (start + base, end + base, tokens)
+                for start, end, tokens in self._split_units(buffer, scanned - base, cut - base)
+            )
+            scanned = cut
+
+            i = 0
+            while i < len(units):
+                # Pack whole units up to the token budget
+                j = i
+                tokens = 0
+                while j < len(units) and (j == i or tokens + units[j][2] <= self.chunk_size):
+                    tokens += units[j][2]
+                    j += 1
+
+                if j >= len(units) and not final:
+                    # More text may still fit in this chunk
+                    break
+
+                start, end = units[i][0], units[j - 1][1]
+                yield {
+                    "text": buffer[start - base:end - base],
+                    "start": start,
+                    "end": end,
+                    "tokens": tokens,
+                    "index": index
+                }
+                index += 1
+
+                if j >= len(units):
+                    i = j
+                    break
+
+                # Step back over trailing units that fit in the overlap
+                next_start = j
+                overlap = 0
+                while next_start - 1 > i and overlap + units[next_start - 1][2] <= self.chunk_overlap:
+                    next_start -= 1
+                    overlap += units[next_start][2]
+                i = next_start
+
+            units = units[i:]
+            keep_from = units[0][0] if units else scanned
+            buffer = buffer[keep_from - base:]
+            base = keep_from
+
+    def _split_units(self, text: str, start: int = 0, end: Optional[int] = None) -> List[Tuple[int, int, int]]:
+        """
+        Split text[start:end] into sentence units no longer than a chunk.
+
+        Returns:
+            List of (start, end, tokens) with offsets into text
+        """
+        units = []
+        end = len(text) if end is None else end
+        for para_start, para_end in self._spans(text, PARAGRAPH_BREAK, start, end):
+            for sentence_start, sentence_end in self._spans(text, SENTENCE_BREAK, para_start, para_end):
+                tokens = self.counter.count(text[sentence_start:sentence_end])
+                if tokens <= self.chunk_size:
+                    units.append((sentence_start, sentence_end, tokens))
+                else:
+                    units.extend(self._split_long(text, sentence_start, sentence_end))
+        return units
+
+    @staticmethod
+    def _spans(text: str, separator: "re.Pattern", start: int, end: int) -> List[Tuple[int, int]]:
+        """Split text[start:end] on a separator into stripped, non-empty spans."""
+        spans = []
+        position = start
+        for match in separator.finditer(text, start, end):
+            spans.append((position, match.start()))
+            position = match.end()
+        spans.append((position, end))
+
+        stripped = []
+        for span_start, span_end in spans:
+            while span_start < span_end and text[span_start].isspace():
+                span_start += 1
+            while span_end > span_start and text[span_end - 1].isspace():
+                span_end -= 1
+            if span_start < span_end:
+                stripped.append((span_start, span_end))
+        return stripped
+
+    def _split_long(self, text: str, start: int, end: int) -> List[Tuple[int, int, int]]:
+        """Split an over-long sentence into word runs that fit in a chunk."""
+        pieces = []
+        piece_start = None
+        piece_end = start
+        tokens = 0
+        for word in re.finditer(r"\S+", text[start:end]):
+            word_start, word_end = start + word.start(), start + word.end()
+            word_tokens = self.counter.count(text[word_start:word_end])
+            if piece_start is not None and tokens + word_tokens > self.chunk_size:
+                pieces.append((piece_start, piece_end, tokens))
+                piece_start, tokens = None, 0
+            if piece_start is None:
+                piece_start = word_start
+            piece_end = word_end
+            tokens += word_tokens
+        if piece_start is not None:
+            pieces.append((piece_start, piece_end, tokens))
+        return pieces
+
+
+# Create a global chunker configured from settings
+default_chunker = TextChunker()
@@ -0,0 +1,100 @@
+"""
+Process-wide cache of query embeddings
+"""
+import math
+import time
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Callable
+
+import config
+from utils.memory_cache import MemoryCache
+
+logger = logging.getLogger(__name__)
+
+def normalize_text(text: str) -> str:
+    """Normalize a query for caching: lower case with collapsed whitespace."""
+    return " ".join(text.lower().split())
+
+class EmbeddingCache:
+    """
+    LRU cache of embedding vectors keyed by model id and normalized text.
+
+    The default embedding model (all-MiniLM-L6-v2) is uncased, so queries
+    that differ only in case or whitespace share an entry. embed() looks up
+    a whole batch and computes the missing texts in one model call, so each
+    distinct text is embedded once however many times it appears.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached vectors (defaults to config setting)
+        """
+        max_entries = config.QUERY_EMBEDDING_CACHE_SIZE if max_entries is None else max_entries
+        # A 384-dimension vector of floats is about 12 KB as a Python list
+        self._vectors = MemoryCache(max_entries=max_entries, max_bytes=max_entries * 16 * 1024)
+        self._stats = {"hits": 0, "misses": 0, "batches": 0}
+        self._stats_lock = threading.Lock()
+
+    def embed(self, embedding_function: Callable[[List[str]], Any], model_id: str,
+              texts: List[str]) -> List[List[float]]:
+        """
+        Get embeddings for texts, computing only the ones not cached.
+
+        Args:
+            embedding_function: Function mapping a list of texts to embedding vectors
+            model_id: Identifier of the model behind embedding_function
+            texts: Texts to embed
+
+        Returns:
+            Embedding vectors aligned with texts
+        """
+        normalized = [normalize_text(text) for text in texts]
+        keys = [f"{model_id}\0{text}" for text in normalized]
+
+        vectors: Dict[str, List[float]] = {}
+        for key in dict.fromkeys(keys):
+            cached = self._vectors.get(key)
+            if cached is not None:
+                vectors[key] = cached["data"]
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing:
+            texts_by_key = dict(zip(keys, normalized))
+            computed = embedding_function([texts_by_key[key] for key in missing])
+
+            now = time.time()
+            for key, vector in zip(missing, computed):
+                vectors[key] = [float(x) for x in vector]
+                self._vectors.set(key, {
+                    "data": vectors[key],
+                    "cached_at": now,
+                    "expires_at": math.inf
+                }, len(vectors[key]) * 32)
+
+        with self._stats_lock:
+            self._stats["hits"] += len(keys) - len(missing)
+            self._stats["misses"] += len(missing)
+            if missing:
+                self._stats["batches"] += 1
+
+        return [vectors[key] for key in keys]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with 'entries', 'hits', 'misses' and 'batches' (model calls)
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["entries"] = len(self._vectors)
+        return stats
+
+
+# Create a global query embedding cache shared by everything in the process
+query_embedding_cache = EmbeddingCache()
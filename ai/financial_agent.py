@@ -4,16 +4,22 @@ Financial Agent for Indian Financial Analyzer
 import os
 import json
 import logging
-from typing import Dict, Any, List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Union, Iterator, Tuple
 from datetime import datetime
 
+import config
 from ai.groq_client import GroqClient
-from ai.rag_system import rag_system
+from ai.rag_system import initialize_rag_system
 from data_sources.stock_data import stock_data
 from data_sources.news_extractor import news_extractor
 
 logger = logging.getLogger(__name__)
 
+# Ways to answer a question: one LLM call over passages and market data
+# fetched in parallel, or book insight -> refined answer -> market answer
+ANSWER_MODES = ("single_pass", "multi_stage")
+
 class FinancialAgent:
     """
     AI-powered financial agent specialized for Indian markets
@@ -112,87 +118,7 @@ class FinancialAgent:
             Dictionary with stock analysis
         """
         try:
-            # Get stock data
-            price_data = stock_data.get_stock_price(symbol)
-            company_info = stock_data.get_company_info(symbol)
-            
-            # Get recent news about the stock
-            news_data = news_extractor.get_stock_news(symbol=symbol, limit=3)
-            
-            # Format context for LLM
-            context = f"Analysis for {company_name or symbol} ({symbol}):\n\n"
-            
-            if company_info:
-                context += "Company Information:\n"
-                context += f"- Name: {company_info.get('name', 'N/A')}\n"
-                context += f"- Sector: {company_info.get('sector', 'N/A')}\n"
-                context += f"- Industry: {company_info.get('industry', 'N/A')}\n"
-                context += f"- Current Price: ₹{company_info.get('current_price', 0):.2f}\n"
-                
-                if company_info.get('market_cap'):
-                    context += f"- Market Cap: ₹{company_info.get('market_cap') / 10000000:.2f} Cr\n"
-                
-                if company_info.get('pe_ratio'):
-                    context += f"- P/E Ratio: {company_info.get('pe_ratio'):.2f}\n"
-                
-                if company_info.get('eps'):
-                    context += f"- EPS: ₹{company_info.get('eps'):.2f}\n"
-                
-                if company_info.get('dividend_yield'):
-                    context += f"- Dividend Yield: {company_info.get('dividend_yield') * 100:.2f}%\n"
-                
-                if company_info.get('52w_high'):
-                    context += f"- 52 Week High: ₹{company_info.get('52w_high'):.2f}\n"
-                
-                if company_info.get('52w_low'):
-                    context += f"- 52 Week Low: ₹{company_info.get('52w_low'):.2f}\n"
-            
-            if price_data:
-                context += "\nRecent Price Performance:\n"
-                
-                if 'change' in price_data and 'change_percent' in price_data:
-                    change_sign = "+" if price_data.get('change', 0) >= 0 else ""
-                    context += f"- Today's Change: {change_sign}{price_data.get('change', 0):.2f} ({change_sign}{price_data.get('change_percent', 0):.2f}%)\n"
-                
-                if 'volume' in price_data:
-                    context += f"- Volume: {price_data.get('volume', 0):,}\n"
-                
-                if 'avg_volume' in price_data:
-                    context += f"- Average Volume: {price_data.get('avg_volume', 0):,}\n"
-                
-                if 'performance' in price_data:
-                    perf = price_data['performance']
-                    if '1m' in perf:
-                        context += f"- 1 Month: {perf['1m']:.2f}%\n"
-                    if '3m' in perf:
-                        context += f"- 3 Month: {perf['3m']:.2f}%\n"
-                    if '6m' in perf:
-                        context += f"- 6 Month: {perf['6m']:.2f}%\n"
-                    if '1y' in perf:
-                        context += f"- 1 Year: {perf['1y']:.2f}%\n"
-            
-            if news_data.get("articles"):
-                context += "\nRecent News:\n"
-                for article in news_data["articles"]:
-                    context += f"- {article.get('title')} ({article.get('published_date')})\n"
-                    if article.get('content'):
-                        # Include a snippet of the content
-                        snippet = article['content'][:200] + "..." if len(article['content']) > 200 else article['content']
-                        context += f"  Summary: {snippet}\n"
-            
-            # Generate analysis
-            prompt = (
-                "You are a financial analyst specializing in Indian stock markets. "
-                "Provide a detailed analysis of the following stock based on the provided data. "
-                "Focus on current valuation, recent performance, news impact, and outlook. "
-                "Tailor your analysis for Indian investors, considering relevant market context.\n\n"
-                f"{context}\n\n"
-                "Format your analysis with the following sections:\n"
-                "1. Company Overview (brief description of business and market position)\n"
-                "2. Financial Assessment (valuation metrics, financial health)\n"
-                "3. Recent Performance (price action, news impact)\n"
-                "4. Outlook & Recommendation (potential future performance, risk factors, investment thesis)\n"
-            )
+            prompt, company_info = self._stock_analysis_prompt(symbol, company_name)
             
             analysis = self.groq_client.analyze_finance(prompt)
             
@@ -213,6 +139,142 @@ class FinancialAgent:
                 "timestamp": datetime.now().isoformat()
             }
     
+    def stock_analysis_stream(self, symbol: str, company_name: Optional[str] = None) -> Iterator[Tuple[str, Any]]:
+        """
+        Generate an analysis for a specific stock, streaming the text as it
+        is generated.
+        
+        Args:
+            symbol: Stock symbol
+            company_name: Optional company name
+            
+        Yields:
+            ('meta', dict with symbol and company_name) once the data is
+            gathered, ('token', text) for each piece of the analysis, and
+            finally ('done', dictionary as returned by stock_analysis)
+        """
+        try:
+            prompt, company_info = self._stock_analysis_prompt(symbol, company_name)
+            company_name = company_info.get('name', company_name or symbol)
+            yield "meta", {"symbol": symbol, "company_name": company_name}
+            
+            pieces = []
+            for piece in self.groq_client.stream_analysis(prompt):
+                pieces.append(piece)
+                yield "token", piece
+            
+            yield "done", {
+                "symbol": symbol,
+                "company_name": company_name,
+                "analysis": "".join(pieces),
+                "timestamp": datetime.now().isoformat()
+            }
+            
+        except Exception as e:
+            logger.error(f"Error streaming stock analysis for {symbol}: {str(e)}")
+            yield "done", {
+                "symbol": symbol,
+                "company_name": company_name or symbol,
+                "analysis": f"Unable to generate analysis for {symbol} due to an error. Please try again later.",
+                "error": str(e),
+                "timestamp": datetime.now().isoformat()
+            }
+    
+    def _stock_analysis_prompt(self, symbol: str, company_name: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Gather a stock's data and news into an analysis prompt.
+        
+        Args:
+            symbol: Stock symbol
+            company_name: Optional company name
+            
+        Returns:
+            Tuple of (prompt, company information)
+        """
+        # Get stock data
+        price_data = stock_data.get_stock_price(symbol)
+        company_info = stock_data.get_company_info(symbol)
+        
+        # Get recent news about the stock
+        news_data = news_extractor.get_stock_news(symbol=symbol, limit=3)
+        
+        # Format context for LLM
+        context = f"Analysis for {company_name or symbol} ({symbol}):\n\n"
+        
+        if company_info:
+            context += "Company Information:\n"
+            context += f"- Name: {company_info.get('name', 'N/A')}\n"
+            context += f"- Sector: {company_info.get('sector', 'N/A')}\n"
+            context += f"- Industry: {company_info.get('industry', 'N/A')}\n"
+            context += f"- Current Price: ₹{company_info.get('current_price', 0):.2f}\n"
+        
+            if company_info.get('market_cap'):
+                context += f"- Market Cap: ₹{company_info.get('market_cap') / 10000000:.2f} Cr\n"
+        
+            if company_info.get('pe_ratio'):
+                context += f"- P/E Ratio: {company_info.get('pe_ratio'):.2f}\n"
+        
+            if company_info.get('eps'):
+                context += f"- EPS: ₹{company_info.get('eps'):.2f}\n"
+        
+            if company_info.get('dividend_yield'):
+                context += f"- Dividend Yield: {company_info.get('dividend_yield') * 100:.2f}%\n"
+        
+            if company_info.get('52w_high'):
+                context += f"- 52 Week High: ₹{company_info.get('52w_high'):.2f}\n"
+        
+            if company_info.get('52w_low'):
+                context += f"- 52 Week Low: ₹{company_info.get('52w_low'):.2f}\n"
+        
+        if price_data:
+            context += "\nRecent Price Performance:\n"
+        
+            if 'change' in price_data and 'change_percent' in price_data:
+                change_sign = "+" if price_data.get('change', 0) >= 0 else ""
+                context += f"- Today's Change: {change_sign}{price_data.get('change', 0):.2f} ({change_sign}{price_data.get('change_percent', 0):.2f}%)\n"
+        
+            if 'volume' in price_data:
+                context += f"- Volume: {price_data.get('volume', 0):,}\n"
+        
+            if 'avg_volume' in price_data:
+                context += f"- Average Volume: {price_data.get('avg_volume', 0):,}\n"
+        
+            if 'performance' in price_data:
+                perf = price_data['performance']
+                if '1m' in perf:
+                    context += f"- 1 Month: {perf['1m']:.2f}%\n"
+                if '3m' in perf:
+                    context += f"- 3 Month: {perf['3m']:.2f}%\n"
+                if '6m' in perf:
+                    context += f"- 6 Month: {perf['6m']:.2f}%\n"
+                if '1y' in perf:
+                    context += f"- 1 Year: {perf['1y']:.2f}%\n"
+        
+        if news_data.get("articles"):
+            context += "\nRecent News:\n"
+            for article in news_data["articles"]:
+                context += f"- {article.get('title')} ({article.get('published_date')})\n"
+                if article.get('content'):
+                    # Include a snippet of the content
+                    snippet = article['content'][:200] + "..." if len(article['content']) > 200 else article['content']
+                    context += f"  Summary: {snippet}\n"
+        
+        # Generate analysis
+        prompt = (
+            "You are a financial analyst specializing in Indian stock markets. "
+            "Provide a detailed analysis of the following stock based on the provided data. "
+            "Focus on current valuation, recent performance, news impact, and outlook. "
+            "Tailor your analysis for Indian investors, considering relevant market context.\n\n"
+            f"{context}\n\n"
+            "Format your analysis with the following sections:\n"
+            "1. Company Overview (brief description of business and market position)\n"
+            "2. Financial Assessment (valuation metrics, financial health)\n"
+            "3. Recent Performance (price action, news impact)\n"
+            "4. Outlook & Recommendation (potential future performance, risk factors, investment thesis)\n"
+        )
+        
+        return prompt, company_info
+    
     def generate_investment_advice(self, profile: Dict[str, Any]) -> Dict[str, Any]:
         """
         Generate personalized investment advice based on a user profile.
@@ -284,59 +346,227 @@ class FinancialAgent:
                 "timestamp": datetime.now().isoformat()
             }
     
-    def answer_financial_question(self, question: str) -> Dict[str, Any]:
+    def answer_financial_question(self, question: str, mode: Optional[str] = None) -> Dict[str, Any]:
         """
         Answer a financial question using AI and financial book knowledge.
         
         Args:
             question: The financial question to answer
+            mode: 'single_pass' or 'multi_stage' (defaults to config setting)
             
         Returns:
             Dictionary with answer information
         """
+        mode = mode or config.ANSWER_MODE
+        if mode not in ANSWER_MODES:
+            raise ValueError(f"Unknown answer mode '{mode}', expected one of {', '.join(ANSWER_MODES)}")
+        
         try:
-            # First, get insights from financial books
-            book_insights = rag_system.answer_financial_question(question)
+            if mode == "single_pass":
+                return self._answer_single_pass(question)
+            return self._answer_multi_stage(question)
             
-            # Then, augment with current market context
-            market_data = stock_data.get_market_overview()
-            
-            market_context = "Current Indian Market Context:\n"
-            if market_data.get("indices"):
-                for index in market_data["indices"]:
-                    change_sign = "+" if index.get("change", 0) >= 0 else ""
-                    market_context += f"- {index.get('name')}: {index.get('value', 0):.2f} ({change_sign}{index.get('change_percent', 0):.2f}%)\n"
+        except Exception as e:
+            logger.error(f"Error answering financial question: {str(e)}")
+            return {
+                "question": question,
+                "answer": f"Unable to answer this question due to an error. Please try again later.",
+                "error": str(e),
+                "mode": mode,
+                "timestamp": datetime.now().isoformat()
+            }
+    
+    def answer_financial_question_stream(self, question: str, mode: Optional[str] = None) -> Iterator[Tuple[str, Any]]:
+        """
+        Answer a financial question, streaming the final answer as it is
+        generated. In multi_stage mode the earlier stages complete first.
+        
+        Args:
+            question: The financial question to answer
+            mode: 'single_pass' or 'multi_stage' (defaults to config setting)
             
-            # Generate a comprehensive answer
-            prompt = (
-                "You are a financial advisor specializing in Indian markets. "
-                f"The user asks: \"{question}\"\n\n"
-                "Provide a comprehensive answer combining financial wisdom from books "
-                "and current market context. Focus on relevance to Indian investors.\n\n"
-                f"Insights from financial books:\n{book_insights.get('answer')}\n\n"
-                f"{market_context}\n\n"
-                "Provide a clear, actionable answer that integrates the book knowledge "
-                "with current market context. Be specific to Indian markets where relevant."
-            )
+        Yields:
+            ('meta', dict with question, mode and book_sources) once the
+            prompt is built, ('token', text) for each piece of the answer,
+            and finally ('done', dictionary as returned by answer_financial_question)
+        """
+        mode = mode or config.ANSWER_MODE
+        if mode not in ANSWER_MODES:
+            raise ValueError(f"Unknown answer mode '{mode}', expected one of {', '.join(ANSWER_MODES)}")
+        
+        try:
+            if mode == "single_pass":
+                prompt, book_sources = self._single_pass_prompt(question)
+            else:
+                prompt, book_sources = self._multi_stage_prompt(question)
+            yield "meta", {"question": question, "mode": mode, "book_sources": book_sources}
             
-            answer = self.groq_client.analyze_finance(prompt)
+            pieces = []
+            for piece in self.groq_client.stream_analysis(prompt, semantic_query=question, template=f"answer_{mode}"):
+                pieces.append(piece)
+                yield "token", piece
             
-            return {
+            yield "done", {
                 "question": question,
-                "answer": answer,
-                "book_sources": book_insights.get("sources", []),
+                "answer": "".join(pieces),
+                "book_sources": book_sources,
+                "mode": mode,
                 "timestamp": datetime.now().isoformat()
             }
             
         except Exception as e:
-            logger.error(f"Error answering financial question: {str(e)}")
-            return {
+            logger.error(f"Error streaming answer to financial question: {str(e)}")
+            yield "done", {
                 "question": question,
-                "answer": f"Unable to answer this question due to an error. Please try again later.",
+                "answer": "Unable to answer this question due to an error. Please try again later.",
                 "error": str(e),
+                "mode": mode,
                 "timestamp": datetime.now().isoformat()
             }
     
+    def _answer_single_pass(self, question: str) -> Dict[str, Any]:
+        """
+        Answer a question with one LLM call. Book passages and market data
+        are fetched in parallel and both go into the final prompt.
+        
+        Args:
+            question: The financial question to answer
+            
+        Returns:
+            Dictionary with answer information
+        """
+        prompt, book_sources = self._single_pass_prompt(question)
+        
+        answer = self.groq_client.analyze_finance(prompt, semantic_query=question, template="answer_single_pass")
+        
+        return {
+            "question": question,
+            "answer": answer,
+            "book_sources": book_sources,
+            "mode": "single_pass",
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    def _single_pass_prompt(self, question: str) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Fetch book passages and market data in parallel and build the
+        single-pass answer prompt.
+        
+        Args:
+            question: The financial question to answer
+            
+        Returns:
+            Tuple of (prompt, book sources)
+        """
+        rag_system = initialize_rag_system()
+        
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            passages_future = executor.submit(rag_system.search_passages, [question], None, 5)
+            market_future = executor.submit(stock_data.get_market_overview)
+            
+            try:
+                passages = passages_future.result()[0]
+            except Exception as e:
+                logger.error(f"Error retrieving book passages: {str(e)}")
+                passages = []
+            
+            try:
+                market_context = self._format_market_context(market_future.result())
+            except Exception as e:
+                logger.error(f"Error getting market context: {str(e)}")
+                market_context = ""
+        
+        book_context = ""
+        for i, passage in enumerate(passages):
+            book_context += f"[Passage {i+1}] From '{passage['book_title']}' by {passage['book_author']}:\n"
+            book_context += f"\"{passage['text']}\"\n\n"
+        
+        prompt = (
+            "You are a financial advisor specializing in Indian markets. "
+            f"The user asks: \"{question}\"\n\n"
+            "Provide a comprehensive answer combining financial wisdom from books "
+            "and current market context. Focus on relevance to Indian investors.\n\n"
+            f"Passages from financial books:\n{book_context or 'No relevant passages found.'}\n"
+            f"{market_context}\n\n"
+            "Provide a clear, actionable answer that draws on the passages where they "
+            "are relevant and integrates the current market context. Be specific to "
+            "Indian markets where relevant."
+        )
+        
+        return prompt, rag_system.format_sources(passages)
+    
+    def _answer_multi_stage(self, question: str) -> Dict[str, Any]:
+        """
+        Answer a question in three LLM calls: a book insight, a direct answer
+        refined from it, and a final answer adding market context.
+        
+        Args:
+            question: The financial question to answer
+            
+        Returns:
+            Dictionary with answer information
+        """
+        prompt, book_sources = self._multi_stage_prompt(question)
+        
+        answer = self.groq_client.analyze_finance(prompt, semantic_query=question, template="answer_multi_stage")
+        
+        return {
+            "question": question,
+            "answer": answer,
+            "book_sources": book_sources,
+            "mode": "multi_stage",
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    def _multi_stage_prompt(self, question: str) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Run the book insight stage and build the final answer prompt from
+        it and the market context.
+        
+        Args:
+            question: The financial question to answer
+            
+        Returns:
+            Tuple of (prompt, book sources)
+        """
+        # First, get insights from financial books
+        book_insights = initialize_rag_system().answer_financial_question(question)
+        
+        # Then, augment with current market context
+        market_context = self._format_market_context(stock_data.get_market_overview())
+        
+        # Generate a comprehensive answer
+        prompt = (
+            "You are a financial advisor specializing in Indian markets. "
+            f"The user asks: \"{question}\"\n\n"
+            "Provide a comprehensive answer combining financial wisdom from books "
+            "and current market context. Focus on relevance to Indian investors.\n\n"
+            f"Insights from financial books:\n{book_insights.get('answer')}\n\n"
+            f"{market_context}\n\n"
+            "Provide a clear, actionable answer that integrates the book knowledge "
+            "with current market context. Be specific to Indian markets where relevant."
+        )
+        
+        return prompt, book_insights.get("sources", [])
+    
+    @staticmethod
+    def _format_market_context(market_data: Dict[str, Any]) -> str:
+        """
+        Format index levels as prompt context.
+        
+        Args:
+            market_data: Market overview from stock_data
+            
+        Returns:
+            Market context text
+        """
+        market_context = "Current Indian Market Context:\n"
+        if market_data.get("indices"):
+            for index in market_data["indices"]:
+                change_sign = "+" if index.get("change", 0) >= 0 else ""
+                market_context += f"- {index.get('name')}: {index.get('value', 0):.2f} ({change_sign}{index.get('change_percent', 0):.2f}%)\n"
+        return market_context
+    
     def generate_financial_report(self, report_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Generate a financial report of a specific type.
@@ -1,18 +1,34 @@
 """
 Groq LLM Client for Indian Financial Analyzer using LangChain
-with caching to conserve API usage limits
+with caching to conserve API usage limits and token streaming
 """
 import os
 import json
+import asyncio
 import logging
 import hashlib
-from typing import Dict, Any, List, Optional, Union
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Union, Coroutine, Tuple, Iterator
 
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 from langchain_groq import ChatGroq
 from langchain.schema.output_parser import StrOutputParser
 
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+import config
+from ai.chunking import default_chunker
+from ai.semantic_cache import semantic_response_cache
+from ai.model_router import model_router
+from utils.rate_limiter import RateLimiter
+
 # Import cache manager for API usage optimization
 try:
     from utils.cache_manager import cache_manager
@@ -24,8 +40,132 @@ except ImportError:
 else:
     logger = logging.getLogger(__name__)
 
+# Completions that can wait on the response cache at the same time
+CACHE_WAIT_THREADS = 64
+
+class _BackgroundLoop:
+    """
+    Event loop on a daemon thread that runs every Groq call in the process.
+    
+    Synchronous callers block on a future while the call runs here, so the
+    concurrency limit and token budget below are shared by all threads.
+    """
+    
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.token_limiter = (
+            RateLimiter(config.GROQ_TOKENS_PER_MINUTE, capacity=config.GROQ_TOKENS_PER_MINUTE)
+            if config.GROQ_TOKENS_PER_MINUTE > 0 else None
+        )
+    
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The running loop, started on first use."""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                
+                def run():
+                    asyncio.set_event_loop(loop)
+                    # Threads blocked on the response cache, one per waiting completion
+                    loop.set_default_executor(ThreadPoolExecutor(max_workers=CACHE_WAIT_THREADS,
+                                                                 thread_name_prefix="groq-cache"))
+                    self.semaphore = asyncio.Semaphore(max(1, config.GROQ_MAX_CONCURRENT_REQUESTS))
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+                
+                self._thread = threading.Thread(target=run, name="groq-client-loop", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+    
+    def in_loop(self) -> bool:
+        """Whether the caller is running on the loop's thread."""
+        return self._thread is not None and threading.current_thread() is self._thread
+    
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule a coroutine on the loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    
+    def run(self, coro: Coroutine) -> Any:
+        """Run a coroutine on the loop and wait for its result."""
+        if self.in_loop():
+            coro.close()
+            raise RuntimeError("Synchronous GroqClient methods cannot be called from its event loop; await the async ones")
+        return self.submit(coro).result()
+
+# Shared by all GroqClient instances, since the Groq limits are per account
+_background_loop = _BackgroundLoop()
+
+class _LLMPool:
+    """
+    Thread-safe pool of ChatGroq instances, one per (API key, model,
+    temperature, max_tokens). Instances are configured once and never
+    mutated, so concurrent calls with different parameters cannot affect
+    each other, and they share one pair of HTTP clients so connections are
+    reused across models and parameters.
+    """
+    
+    def __init__(self):
+        self._llms: Dict[Tuple[str, str, float, int], ChatGroq] = {}
+        self._lock = threading.Lock()
+        self._http_client = None
+        self._http_async_client = None
+    
+    def get(self, api_key: str, model_name: str, temperature: float, max_tokens: int) -> ChatGroq:
+        """
+        Get the LLM for a set of parameters, creating it on first use.
+        
+        Args:
+            api_key: Groq API key
+            model_name: Model to use
+            temperature: Sampling temperature (0.0 to 1.0)
+            max_tokens: Maximum tokens to generate
+            
+        Returns:
+            Shared ChatGroq instance; callers must not change its settings
+        """
+        key = (api_key, model_name, float(temperature), int(max_tokens))
+        with self._lock:
+            llm = self._llms.get(key)
+            if llm is None:
+                if httpx is not None and self._http_client is None:
+                    self._http_client = httpx.Client()
+                    self._http_async_client = httpx.AsyncClient()
+                
+                llm = ChatGroq(
+                    groq_api_key=api_key,
+                    model_name=model_name,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    http_client=self._http_client,
+                    http_async_client=self._http_async_client
+                )
+                self._llms[key] = llm
+                logger.info(f"Created Groq LLM for {model_name} (temperature={temperature}, max_tokens={max_tokens})")
+            return llm
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._llms)
+
+# LLMs for every client and parameter set in the process
+_llm_pool = _LLMPool()
+
 class GroqClient:
-    """Client for Groq LLM API using LangChain"""
+    """
+    Client for Groq LLM API using LangChain.
+    
+    Calls run asynchronously on a shared background event loop with at most
+    GROQ_MAX_CONCURRENT_REQUESTS in flight and a GROQ_TOKENS_PER_MINUTE
+    budget. The async methods (achat_completion, abatch_completion) can be
+    awaited from any event loop; the synchronous methods wrap them.
+    """
     
     def __init__(self, api_key=None):
         """Initialize Groq client with API key."""
@@ -33,14 +173,11 @@ class GroqClient:
         if not self.api_key:
             logger.warning("No Groq API key provided. Set the GROQ_API_KEY environment variable.")
         
-        self.default_model = "llama3-70b-8192"  # Using LLaMA 3 70B model
+        self.default_model = config.LLM_MODEL  # For calls without a task; tasks are routed by model_router
         
-        # Initialize the LangChain LLM
+        # Initialize the LangChain LLM; calls take preconfigured ones from the pool
         try:
-            self.llm = ChatGroq(
-                groq_api_key=self.api_key,
-                model_name=self.default_model
-            )
+            self.llm = _llm_pool.get(self.api_key, self.default_model, 0.7, 1024)
             logger.info(f"Initialized Groq LLM with model: {self.default_model}")
         except Exception as e:
             logger.error(f"Error initializing Groq LLM: {str(e)}")
@@ -51,7 +188,10 @@ class GroqClient:
                         model: Optional[str] = None,
                         temperature: float = 0.7,
                         max_tokens: int = 1024,
-                        stream: bool = False) -> Dict[str, Any]:
+                        stream: bool = False,
+                        task: Optional[str] = None,
+                        semantic_query: Optional[str] = None,
+                        template: Optional[str] = None) -> Dict[str, Any]:
         """
         Get a chat completion from Groq API using LangChain with caching to minimize API usage.
         
@@ -60,85 +200,455 @@ class GroqClient:
             model: Model to use (defaults to self.default_model)
             temperature: Sampling temperature (0.0 to 1.0)
             max_tokens: Maximum tokens to generate
-            stream: Whether to stream the response
+            stream: Whether to skip the response cache (use stream_chat_completion
+                    to receive the text as it is generated)
+            task: Kind of call ('analysis', 'advice', 'extraction' or 'summarization')
+            semantic_query: The user's question, if an earlier answer to a
+                            near-duplicate question may be reused
+            template: Name of the prompt template the question was put in; calls
+                      only share answers within a template
+            
+        Returns:
+            Response formatted like the OpenAI API response
+        """
+        return _background_loop.run(self._achat_completion(
+            messages, model, temperature, max_tokens, stream,
+            task=task, semantic_query=semantic_query, template=template
+        ))
+    
+    def batch_completion(self,
+                         messages_list: List[List[Dict[str, str]]],
+                         model: Optional[str] = None,
+                         temperature: float = 0.7,
+                         max_tokens: int = 1024) -> List[Dict[str, Any]]:
+        """
+        Get chat completions for several conversations concurrently.
+        
+        Args:
+            messages_list: One list of message dictionaries per completion
+            model: Model to use (defaults to self.default_model)
+            temperature: Sampling temperature (0.0 to 1.0)
+            max_tokens: Maximum tokens to generate per completion
             
+        Returns:
+            Responses formatted like the OpenAI API response, in input order
+        """
+        return _background_loop.run(self._abatch_completion(messages_list, model, temperature, max_tokens))
+    
+    async def achat_completion(self,
+                               messages: List[Dict[str, str]],
+                               model: Optional[str] = None,
+                               temperature: float = 0.7,
+                               max_tokens: int = 1024,
+                               stream: bool = False,
+                               task: Optional[str] = None,
+                               semantic_query: Optional[str] = None,
+                               template: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Async version of chat_completion, usable from any event loop.
+        
         Returns:
             Response formatted like the OpenAI API response
         """
+        coro = self._achat_completion(messages, model, temperature, max_tokens, stream,
+                                      task=task, semantic_query=semantic_query, template=template)
+        if _background_loop.in_loop():
+            return await coro
+        return await asyncio.wrap_future(_background_loop.submit(coro))
+    
+    async def abatch_completion(self,
+                                messages_list: List[List[Dict[str, str]]],
+                                model: Optional[str] = None,
+                                temperature: float = 0.7,
+                                max_tokens: int = 1024) -> List[Dict[str, Any]]:
+        """
+        Async version of batch_completion, usable from any event loop.
+        
+        Returns:
+            Responses formatted like the OpenAI API response, in input order
+        """
+        coro = self._abatch_completion(messages_list, model, temperature, max_tokens)
+        if _background_loop.in_loop():
+            return await coro
+        return await asyncio.wrap_future(_background_loop.submit(coro))
+    
+    async def _abatch_completion(self, messages_list: List[List[Dict[str, str]]], model: Optional[str],
+                                 temperature: float, max_tokens: int) -> List[Dict[str, Any]]:
+        """Run completions concurrently on the background loop; the limits pace them."""
+        results = await asyncio.gather(
+            *(self._achat_completion(messages, model, temperature, max_tokens) for messages in messages_list),
+            return_exceptions=True
+        )
+        return [
+            {"error": str(result)} if isinstance(result, BaseException) else result
+            for result in results
+        ]
+    
+    async def _achat_completion(self, messages: List[Dict[str, str]], model: Optional[str],
+                                temperature: float, max_tokens: int, stream: bool = False,
+                                task: Optional[str] = None, semantic_query: Optional[str] = None,
+                                template: Optional[str] = None) -> Dict[str, Any]:
+        """Completion with caching and quota checks; runs on the background loop."""
         if not self.api_key:
             return {"error": "API key not configured. Please set GROQ_API_KEY environment variable."}
         
         if not self.llm:
             return {"error": "LLM not initialized properly. Check logs for details."}
         
+        models, model_name, max_tokens, latency_budget_ms = self._plan(model, task, max_tokens)
+        
         # Check if caching is available and enabled
-        caching_enabled = cache_manager is not None
-        
-        # Create a cache key from the request parameters
-        # We don't include stream in the cache key as it only affects delivery, not content
-        cache_key = None
-        if caching_enabled and not stream:
-            # Convert messages to a stable string representation for caching
-            messages_str = json.dumps(messages, sort_keys=True)
-            model_name = model or self.default_model
-            cache_key = f"groq_{model_name}_{temperature}_{max_tokens}_{hashlib.md5(messages_str.encode()).hexdigest()}"
-            
-            # Check if we have a cached response
-            cached_response = cache_manager.get(cache_key)
-            if cached_response:
-                logger.info(f"Using cached response for Groq LLM request")
-                return cached_response
+        if cache_manager is None or stream:
+            return await self._ainvoke(messages, models, temperature, max_tokens,
+                                       task=task, latency_budget_ms=latency_budget_ms)
+        
+        cache_key = self._cache_key(messages, model_name, temperature, max_tokens)
+        
+        # Near-duplicate questions in the same template reuse an earlier answer
+        semantic_scope = self._semantic_scope(messages, task, semantic_query, template,
+                                              model_name, temperature, max_tokens)
+        if semantic_scope is not None:
+            # An exact hit needs no embedding and must not lose to a similar question
+            cached = await asyncio.to_thread(cache_manager.get, cache_key)
+            if cached is None:
+                cached = await asyncio.to_thread(
+                    semantic_response_cache.lookup, task, semantic_scope, semantic_query, cache_manager.get
+                )
+            if cached is not None:
+                return cached
+        
+        # Identical concurrent prompts share a single LLM call, across threads
+        # and coroutines; the cache blocks while waiting, so it runs off the loop
+        response = await asyncio.to_thread(
+            cache_manager.get_or_compute,
+            cache_key,
+            lambda: _background_loop.submit(
+                self._ainvoke(messages, models, temperature, max_tokens, check_rate_limit=True,
+                              task=task, latency_budget_ms=latency_budget_ms)
+            ).result(),
+            stale_ttl=config.CACHE_STALE_TTL_SECONDS
+        )
+        
+        if semantic_scope is not None and "error" not in response:
+            await asyncio.to_thread(semantic_response_cache.add, task, semantic_scope, semantic_query, cache_key)
+        return response
+    
+    def _plan(self, model: Optional[str], task: Optional[str], max_tokens: int) -> Tuple[List[str], str, int, Optional[int]]:
+        """
+        Decide which models a call tries. An explicit model is used as is;
+        otherwise the task's route picks the models and caps max_tokens.
+        
+        Returns:
+            Tuple of (models to try, model name for cache keys, max_tokens,
+            latency budget per attempt in ms or None)
+        """
+        if model:
+            return [model], model, max_tokens, None
+        
+        route = model_router.route(task, self.default_model)
+        if route["max_tokens"]:
+            max_tokens = min(max_tokens, route["max_tokens"])
+        model_name = f"route:{task}" if task in model_router.routes else self.default_model
+        return model_router.candidates(task, self.default_model, claim_probe=True), model_name, max_tokens, route["latency_budget_ms"]
+    
+    @staticmethod
+    def _cache_key(messages: List[Dict[str, str]], model_name: str, temperature: float, max_tokens: int) -> str:
+        """Response cache key of a request."""
+        # Convert messages to a stable string representation for caching
+        messages_str = json.dumps(messages, sort_keys=True)
+        return f"groq_{model_name}_{temperature}_{max_tokens}_{hashlib.md5(messages_str.encode()).hexdigest()}"
+    
+    @staticmethod
+    def _semantic_scope(messages: List[Dict[str, str]], task: Optional[str], semantic_query: Optional[str],
+                        template: Optional[str], model_name: str, temperature: float, max_tokens: int) -> Optional[str]:
+        """Semantic cache scope of a request, or None if it is not looked up semantically."""
+        if not semantic_query or not semantic_response_cache.applies_to(task):
+            return None
+        template_id = hashlib.sha256(json.dumps(
+            [template] + [m for m in messages if m.get("role") == "system"], sort_keys=True
+        ).encode()).hexdigest()[:16]
+        return semantic_response_cache.scope(task, template_id, model_name, temperature, max_tokens, time.time())
+    
+    async def _wait_for_token_budget(self, messages: List[Dict[str, str]], max_tokens: int) -> None:
+        """Wait until the prompt and max_tokens fit the tokens-per-minute budget."""
+        if _background_loop.token_limiter is None:
+            return
+        prompt_tokens = sum(default_chunker.counter.count(message.get("content", "")) for message in messages)
+        wait = _background_loop.token_limiter.reserve(prompt_tokens + max_tokens)
+        if wait > 0:
+            logger.info(f"Groq token budget exhausted, waiting {wait:.1f}s")
+            await asyncio.sleep(wait)
+    
+    @staticmethod
+    def _format_response(content: str, model_name: str) -> Dict[str, Any]:
+        """Format a completion like OpenAI's API for backward compatibility."""
+        return {
+            "choices": [
+                {
+                    "message": {
+                        "role": "assistant",
+                        "content": content
+                    },
+                    "index": 0,
+                    "finish_reason": "stop"
+                }
+            ],
+            "model": model_name,
+            "object": "chat.completion"
+        }
+    
+    async def _ainvoke(self,
+                       messages: List[Dict[str, str]],
+                       models: List[str],
+                       temperature: float,
+                       max_tokens: int,
+                       check_rate_limit: bool = False,
+                       task: Optional[str] = None,
+                       latency_budget_ms: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Call the Groq API without consulting the cache, trying models in turn.
+        
+        Each attempt waits for a concurrency slot and for the prompt and
+        max_tokens to fit the tokens-per-minute budget. A model that fails,
+        is rate limited or exceeds the latency budget falls back to the next
+        one; the last model is given as long as it needs. Every attempt is
+        reported to the model router.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            models: Models to try, in order
+            temperature: Sampling temperature (0.0 to 1.0)
+            max_tokens: Maximum tokens to generate
+            check_rate_limit: Whether to count the call against the daily rate limit
+            task: Task the call is routed for, for the router's stats
+            latency_budget_ms: Time allowed per attempt before falling back
             
-            # Check if we have exceeded the rate limit
-            if not cache_manager.track_api_call("groq"):
+        Returns:
+            Response formatted like the OpenAI API response, with the model that answered
+        """
+        # Reserve quota up front; it is refunded if every model fails
+        reservation = None
+        if check_rate_limit:
+            reservation = cache_manager.reserve_api_call("groq")
+            if reservation is None:
                 logger.warning("Groq API daily rate limit exceeded")
                 return {"error": "Daily rate limit for Groq API exceeded. Try again tomorrow."}
+        
+        error = None
+        for position, model_name in enumerate(models):
+            last = position == len(models) - 1
+            timeout = latency_budget_ms / 1000 if latency_budget_ms and not last else None
+            started = time.perf_counter()
             
-        try:
-            # If a different model is specified, create a new LLM instance
-            llm = self.llm
-            if model and model != self.default_model:
-                llm = ChatGroq(
-                    groq_api_key=self.api_key,
-                    model_name=model,
-                    temperature=temperature,
-                    max_tokens=max_tokens
-                )
-            else:
-                # Update parameters
-                llm.temperature = temperature
-                llm.max_tokens = max_tokens
+            try:
+                async with _background_loop.semaphore:
+                    await self._wait_for_token_budget(messages, max_tokens)
+                    
+                    llm = _llm_pool.get(self.api_key, model_name, temperature, max_tokens)
+                    
+                    logger.info(f"Making Groq LLM request with model: {model_name}")
+                    
+                    # Convert OpenAI-style messages to LangChain format
+                    started = time.perf_counter()
+                    response_text = await asyncio.wait_for(llm.ainvoke(messages), timeout)
+            except Exception as e:
+                error = e
+                model_router.record(task, model_name, (time.perf_counter() - started) * 1000, e)
+                if isinstance(e, TimeoutError):
+                    error = TimeoutError(f"{model_name} did not answer within {latency_budget_ms} ms")
+                if not last:
+                    logger.warning(f"Groq model {model_name} failed, falling back to {models[position + 1]}: {str(error)}")
+                continue
             
-            logger.info(f"Making Groq LLM request with model: {model or self.default_model}")
+            model_router.record(task, model_name, (time.perf_counter() - started) * 1000)
             
-            # Convert OpenAI-style messages to LangChain format
-            response_text = llm.invoke(messages)
+            if reservation is not None:
+                cache_manager.commit_api_call(reservation)
             
-            # Format the response like OpenAI's API for backward compatibility
-            response = {
-                "choices": [
-                    {
-                        "message": {
-                            "role": "assistant",
-                            "content": response_text.content
-                        },
-                        "index": 0,
-                        "finish_reason": "stop"
-                    }
-                ],
-                "model": model or self.default_model,
-                "object": "chat.completion"
-            }
+            return self._format_response(response_text.content, model_name)
+        
+        logger.error(f"Error calling Groq API via LangChain: {str(error)}")
+        if reservation is not None:
+            cache_manager.release_api_call(reservation)
+        return {"error": str(error)}
+    
+    def stream_chat_completion(self,
+                               messages: List[Dict[str, str]],
+                               model: Optional[str] = None,
+                               temperature: float = 0.7,
+                               max_tokens: int = 1024,
+                               task: Optional[str] = None,
+                               semantic_query: Optional[str] = None,
+                               template: Optional[str] = None) -> Iterator[str]:
+        """
+        Stream a chat completion as it is generated.
+        
+        A cached completion (exact or, with semantic_query, semantic) is
+        yielded in one piece. Otherwise text is yielded as the model produces
+        it, and the full completion is written to the response cache once
+        the stream ends, so later calls with the same messages hit the cache
+        whether they stream or not. Routed calls fall back to the next model
+        only until the first text arrives. Closing the generator early
+        cancels the request.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            model: Model to use (defaults to the task's route)
+            temperature: Sampling temperature (0.0 to 1.0)
+            max_tokens: Maximum tokens to generate
+            task: Kind of call ('analysis', 'advice', 'extraction' or 'summarization')
+            semantic_query: The user's question, if an earlier answer to a
+                            near-duplicate question may be reused
+            template: Name of the prompt template the question was put in
+            
+        Yields:
+            Pieces of the completion text
+            
+        Raises:
+            RuntimeError: If the completion fails, possibly after some text was yielded
+        """
+        if not self.api_key:
+            raise RuntimeError("API key not configured. Please set GROQ_API_KEY environment variable.")
+        
+        if not self.llm:
+            raise RuntimeError("LLM not initialized properly. Check logs for details.")
+        
+        if _background_loop.in_loop():
+            raise RuntimeError("GroqClient streams cannot be consumed on its event loop")
+        
+        models, model_name, max_tokens, latency_budget_ms = self._plan(model, task, max_tokens)
+        
+        cache_key = semantic_scope = None
+        if cache_manager is not None:
+            cache_key = self._cache_key(messages, model_name, temperature, max_tokens)
+            semantic_scope = self._semantic_scope(messages, task, semantic_query, template,
+                                                  model_name, temperature, max_tokens)
+            
+            cached = cache_manager.get(cache_key)
+            if cached is None and semantic_scope is not None:
+                cached = semantic_response_cache.lookup(task, semantic_scope, semantic_query, cache_manager.get)
+            if cached is not None and cached.get("choices"):
+                yield cached["choices"][0]["message"]["content"]
+                return
+        
+        pieces: "queue.Queue[Optional[str]]" = queue.Queue()
+        future = _background_loop.submit(self._astream(
+            messages, models, temperature, max_tokens, pieces,
+            check_rate_limit=cache_manager is not None, task=task, latency_budget_ms=latency_budget_ms
+        ))
+        
+        try:
+            while True:
+                piece = pieces.get()
+                if piece is None:
+                    break
+                yield piece
+            response = future.result()
+        finally:
+            # The consumer stopped early, e.g. the browser disconnected
+            if not future.done():
+                future.cancel()
+        
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        
+        if cache_key is not None:
+            cache_manager.set(cache_key, response, stale_ttl=config.CACHE_STALE_TTL_SECONDS)
+            if semantic_scope is not None:
+                semantic_response_cache.add(task, semantic_scope, semantic_query, cache_key)
+    
+    async def _astream(self,
+                       messages: List[Dict[str, str]],
+                       models: List[str],
+                       temperature: float,
+                       max_tokens: int,
+                       pieces: "queue.Queue[Optional[str]]",
+                       check_rate_limit: bool = False,
+                       task: Optional[str] = None,
+                       latency_budget_ms: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Stream from the Groq API into a queue, trying models in turn until
+        one starts answering; None is put on the queue when the stream ends.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            models: Models to try, in order
+            temperature: Sampling temperature (0.0 to 1.0)
+            max_tokens: Maximum tokens to generate
+            pieces: Queue receiving the text as it arrives
+            check_rate_limit: Whether to count the call against the daily rate limit
+            task: Task the call is routed for, for the router's stats
+            latency_budget_ms: Time allowed for the first text before falling back
+            
+        Returns:
+            Full response formatted like the OpenAI API response, or an 'error'
+        """
+        reservation = None
+        try:
+            if check_rate_limit:
+                reservation = cache_manager.reserve_api_call("groq")
+                if reservation is None:
+                    logger.warning("Groq API daily rate limit exceeded")
+                    return {"error": "Daily rate limit for Groq API exceeded. Try again tomorrow."}
             
-            # Cache the successful response if caching is enabled and not streaming
-            if caching_enabled and cache_key and not stream:
-                cache_manager.set(cache_key, response)
+            error = None
+            for position, model_name in enumerate(models):
+                last = position == len(models) - 1
+                timeout = latency_budget_ms / 1000 if latency_budget_ms and not last else None
+                started = time.perf_counter()
+                parts: List[str] = []
+                first_text_ms = 0.0
                 
-            return response
+                try:
+                    async with _background_loop.semaphore:
+                        await self._wait_for_token_budget(messages, max_tokens)
+                        
+                        llm = _llm_pool.get(self.api_key, model_name, temperature, max_tokens)
+                        logger.info(f"Streaming Groq LLM response with model: {model_name}")
+                        
+                        started = time.perf_counter()
+                        stream = llm.astream(messages).__aiter__()
+                        try:
+                            while True:
+                                try:
+                                    # Only the wait for the first text is bounded
+                                    chunk = await asyncio.wait_for(stream.__anext__(), None if parts else timeout)
+                                except StopAsyncIteration:
+                                    break
+                                if chunk.content:
+                                    if not parts:
+                                        first_text_ms = (time.perf_counter() - started) * 1000
+                                    parts.append(chunk.content)
+                                    pieces.put(chunk.content)
+                        finally:
+                            # Release the connection of a stream abandoned on timeout or error
+                            await stream.aclose()
+                except Exception as e:
+                    error = e
+                    model_router.record(task, model_name, (time.perf_counter() - started) * 1000, e)
+                    if isinstance(e, TimeoutError):
+                        error = TimeoutError(f"{model_name} did not start answering within {latency_budget_ms} ms")
+                    if parts:
+                        # Text already reached the caller; another model cannot continue it
+                        break
+                    if not last:
+                        logger.warning(f"Groq model {model_name} failed, falling back to {models[position + 1]}: {str(error)}")
+                    continue
+                
+                # The budget bounds the wait for the first text, so that is the latency recorded
+                model_router.record(task, model_name, first_text_ms if parts else (time.perf_counter() - started) * 1000)
+                if reservation is not None:
+                    cache_manager.commit_api_call(reservation)
+                    reservation = None
+                return self._format_response("".join(parts), model_name)
             
-        except Exception as e:
-            logger.error(f"Error calling Groq API via LangChain: {str(e)}")
-            return {"error": str(e)}
+            logger.error(f"Error streaming from Groq API via LangChain: {str(error)}")
+            return {"error": str(error)}
+        finally:
+            # Refund the quota unless a completion was delivered, also on cancellation
+            if reservation is not None:
+                cache_manager.release_api_call(reservation)
+            pieces.put(None)
     
     def generate_text(self, prompt: str, **kwargs) -> str:
         """
@@ -162,10 +672,26 @@ class GroqClient:
         
         return "No response generated"
     
+    def stream_text(self, prompt: str, **kwargs) -> Iterator[str]:
+        """
+        Stream text generated from a prompt.
+        
+        Args:
+            prompt: The prompt to generate text from
+            **kwargs: Additional parameters to pass to stream_chat_completion
+            
+        Yields:
+            Pieces of the generated text
+        """
+        messages = [{"role": "user", "content": prompt}]
+        yield from self.stream_chat_completion(messages, **kwargs)
+    
     def analyze_finance(self, 
                        query: str, 
                        context: Optional[str] = None, 
-                       format: Optional[str] = None) -> str:
+                       format: Optional[str] = None,
+                       semantic_query: Optional[str] = None,
+                       template: Optional[str] = None) -> str:
         """
         Generate financial analysis on a specific query.
         
@@ -173,10 +699,57 @@ class GroqClient:
             query: The financial query or analysis request
             context: Additional context or data for the analysis
             format: Optional format for the response (json, markdown, etc.)
+            semantic_query: The user's question within query, if an answer to a
+                            near-duplicate question may be reused
+            template: Name of the prompt template query was built from
             
         Returns:
             Generated financial analysis
         """
+        messages = self._analysis_messages(query, context, format)
+        
+        response = self.chat_completion(messages, temperature=0.3, task="analysis",
+                                        semantic_query=semantic_query, template=template)
+        
+        if "error" in response:
+            return f"Error: {response['error']}"
+        
+        if "choices" in response and len(response["choices"]) > 0:
+            return response["choices"][0]["message"]["content"]
+        
+        return "No analysis generated"
+    
+    def stream_analysis(self,
+                        query: str,
+                        context: Optional[str] = None,
+                        format: Optional[str] = None,
+                        semantic_query: Optional[str] = None,
+                        template: Optional[str] = None) -> Iterator[str]:
+        """
+        Stream financial analysis on a specific query, with the same prompt
+        and cache entries as analyze_finance.
+        
+        Args:
+            query: The financial query or analysis request
+            context: Additional context or data for the analysis
+            format: Optional format for the response (json, markdown, etc.)
+            semantic_query: The user's question within query, if an answer to a
+                            near-duplicate question may be reused
+            template: Name of the prompt template query was built from
+            
+        Yields:
+            Pieces of the analysis
+            
+        Raises:
+            RuntimeError: If the analysis fails
+        """
+        messages = self._analysis_messages(query, context, format)
+        yield from self.stream_chat_completion(messages, temperature=0.3, task="analysis",
+                                               semantic_query=semantic_query, template=template)
+    
+    @staticmethod
+    def _analysis_messages(query: str, context: Optional[str], format: Optional[str]) -> List[Dict[str, str]]:
+        """Build the messages of a financial analysis request."""
         # Build the prompt based on the requested format
         if format == "json":
             format_instruction = "Provide the response in valid JSON format."
@@ -197,20 +770,10 @@ class GroqClient:
         if context:
             prompt = f"Context information:\n{context}\n\nQuery: {query}"
         
-        messages = [
+        return [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": prompt}
         ]
-        
-        response = self.chat_completion(messages, temperature=0.3)
-        
-        if "error" in response:
-            return f"Error: {response['error']}"
-        
-        if "choices" in response and len(response["choices"]) > 0:
-            return response["choices"][0]["message"]["content"]
-        
-        return "No analysis generated"
     
     def extract_financial_entities(self, text: str) -> Dict[str, List[str]]:
         """
@@ -242,7 +805,7 @@ class GroqClient:
             {"role": "user", "content": prompt}
         ]
         
-        response = self.chat_completion(messages, temperature=0.1)
+        response = self.chat_completion(messages, temperature=0.1, task="extraction", semantic_query=text)
         
         if "error" in response:
             logger.error(f"Error extracting entities: {response['error']}")
@@ -282,7 +845,8 @@ class GroqClient:
             f"{text}"
         )
         
-        return self.generate_text(prompt, temperature=0.3)
+        return self.generate_text(prompt, temperature=0.3, task="summarization", semantic_query=text,
+                                  template=f"summary:{max_length}")
     
     def answer_financial_question(self, question: str, context: Optional[str] = None) -> str:
         """
@@ -311,7 +875,9 @@ class GroqClient:
             {"role": "user", "content": user_prompt}
         ]
         
-        response = self.chat_completion(messages, temperature=0.3)
+        # With context, the answer depends on more than the question
+        response = self.chat_completion(messages, temperature=0.3, task="advice",
+                                        semantic_query=None if context else question)
         
         if "error" in response:
             return f"Error: {response['error']}"
@@ -0,0 +1,239 @@
+"""
+Parallel, streaming book ingestion for the RAG index
+"""
+import os
+import time
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, List, Optional, Tuple, Iterator, Callable
+
+import config
+from ai.chunking import TextChunker
+
+logger = logging.getLogger(__name__)
+
+# Characters read from a book file at a time
+READ_BLOCK_CHARS = 1 << 16
+
+# Chunk texts, chunk ids and chunk metadatas of one book
+ChunkedBook = Tuple[List[str], List[str], List[Dict[str, Any]]]
+
+def iter_text_blocks(path: str, block_chars: int = READ_BLOCK_CHARS) -> Iterator[str]:
+    """
+    Read a text file in blocks instead of all at once.
+
+    Args:
+        path: File to read
+        block_chars: Characters per block
+
+    Yields:
+        Consecutive blocks of the file's text
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            block = f.read(block_chars)
+            if not block:
+                return
+            yield block
+
+def chunk_book(book: Dict[str, Any], chunker: TextChunker) -> ChunkedBook:
+    """
+    Split a book into chunks with stable ids and index metadata, reading
+    the file incrementally.
+
+    Args:
+        book: Book metadata
+        chunker: Chunker to split the text with
+
+    Returns:
+        Tuple of (chunk texts, chunk ids, chunk metadatas)
+    """
+    book_id = book["id"]
+    chunks, chunk_ids, chunk_metadatas = [], [], []
+
+    # Content-addressed ids; repeated identical chunks get an occurrence suffix
+    seen: Dict[str, int] = {}
+    for chunk in chunker.chunk_stream(iter_text_blocks(book["file_path"])):
+        chunk_hash = hashlib.sha256(chunk["text"].encode('utf-8')).hexdigest()[:24]
+        occurrence = seen.get(chunk_hash, 0)
+        seen[chunk_hash] = occurrence + 1
+
+        chunks.append(chunk["text"])
+        chunk_ids.append(f"{book_id}_{chunk_hash}" + (f"_{occurrence}" if occurrence else ""))
+        chunk_metadatas.append({
+            "book_id": book_id,
+            "book_title": book["title"],
+            "book_author": book["author"],
+            "chunk_index": chunk["index"],
+            "start_offset": chunk["start"],
+            "end_offset": chunk["end"],
+            "token_count": chunk["tokens"],
+            "source": "book"
+        })
+
+    return chunks, chunk_ids, chunk_metadatas
+
+def _chunk_book_worker(book: Dict[str, Any], chunk_size: int, chunk_overlap: int) -> ChunkedBook:
+    """Chunk a book in a worker process, with a chunker built there."""
+    return chunk_book(book, TextChunker(chunk_size, chunk_overlap))
+
+
+class IngestionProgress:
+    """Counts books, chunks and bytes ingested, and reports throughput."""
+
+    def __init__(self, total_books: int):
+        self.total_books = total_books
+        self.books = 0
+        self.chunks = 0
+        self.embedded = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+
+    def book_done(self, book: Dict[str, Any], chunks: int, embedded: int) -> None:
+        """
+        Record a finished book and log progress.
+
+        Args:
+            book: Book metadata
+            chunks: Chunks the book was split into
+            embedded: Chunks that had to be embedded
+        """
+        self.books += 1
+        self.chunks += chunks
+        self.embedded += embedded
+        try:
+            self.bytes += os.path.getsize(book["file_path"])
+        except OSError:
+            pass
+
+        stats = self.get_stats()
+        logger.info(
+            f"Ingested {book['id']} ({self.books}/{self.total_books} books): {chunks} chunks, "
+            f"{embedded} embedded; {stats['chunks_per_second']} chunks/s, {stats['mb_per_second']} MB/s"
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get ingestion totals and throughput so far.
+
+        Returns:
+            Dictionary of counts, elapsed seconds and rates
+        """
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {
+            "books": self.books,
+            "total_books": self.total_books,
+            "chunks": self.chunks,
+            "embedded_chunks": self.embedded,
+            "megabytes": round(self.bytes / 1e6, 2),
+            "elapsed_seconds": round(elapsed, 2),
+            "chunks_per_second": round(self.chunks / elapsed, 1),
+            "embedded_per_second": round(self.embedded / elapsed, 1),
+            "mb_per_second": round(self.bytes / 1e6 / elapsed, 2)
+        }
+
+
+class BookIngestor:
+    """
+    Chunks books in a process pool and embeds chunks in batches on a thread
+    pool. Books are chunked concurrently and handed back as each finishes,
+    with only a few in flight at a time, so embedding one book overlaps with
+    chunking the next and memory stays bounded by the pool size rather than
+    the corpus size.
+    """
+
+    def __init__(self, chunker: TextChunker, embedding_function: Callable[[List[str]], Any],
+                 workers: Optional[int] = None, embed_batch_size: Optional[int] = None,
+                 embed_threads: Optional[int] = None):
+        """
+        Initialize the ingestor.
+
+        Args:
+            chunker: Chunker whose settings the worker processes use
+            embedding_function: Function mapping a list of texts to embedding vectors
+            workers: Chunking processes (defaults to config setting; 0 means one per CPU)
+            embed_batch_size: Texts per embedding call (defaults to config setting)
+            embed_threads: Concurrent embedding calls (defaults to config setting)
+        """
+        self.chunker = chunker
+        self.embedding_function = embedding_function
+        workers = config.INGEST_WORKERS if workers is None else workers
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.embed_batch_size = max(1, config.INGEST_EMBED_BATCH_SIZE if embed_batch_size is None else embed_batch_size)
+        self.embed_threads = max(1, config.INGEST_EMBED_THREADS if embed_threads is None else embed_threads)
+
+    def chunk_books(self, books: List[Dict[str, Any]]) -> Iterator[Tuple[Dict[str, Any], Optional[ChunkedBook], Optional[Exception]]]:
+        """
+        Chunk books, in worker processes when there is more than one.
+
+        Args:
+            books: Books to chunk
+
+        Yields:
+            Tuples of (book, chunked book or None, error or None), in order of completion
+        """
+        workers = min(self.workers, len(books))
+        if workers > 1:
+            try:
+                executor = ProcessPoolExecutor(max_workers=workers)
+            except (OSError, NotImplementedError) as e:
+                logger.warning(f"Could not start chunking processes, chunking in this process: {e}")
+                executor = None
+        else:
+            executor = None
+
+        if executor is None:
+            for book in books:
+                try:
+                    yield book, chunk_book(book, self.chunker), None
+                except Exception as e:
+                    yield book, None, e
+            return
+
+        with executor:
+            pending = {}
+            queued = iter(books)
+            while True:
+                # Keep a few books ahead of the consumer, not the whole corpus
+                while len(pending) < workers * 2:
+                    book = next(queued, None)
+                    if book is None:
+                        break
+                    future = executor.submit(_chunk_book_worker, book,
+                                             self.chunker.chunk_size, self.chunker.chunk_overlap)
+                    pending[future] = book
+                if not pending:
+                    return
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    book = pending.pop(future)
+                    try:
+                        yield book, future.result(), None
+                    except Exception as e:
+                        yield book, None, e
+
+    def embed(self, texts: List[str]) -> List[Any]:
+        """
+        Embed texts in batches, several batches at a time.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Embedding vectors aligned with texts
+        """
+        batches = [texts[start:start + self.embed_batch_size]
+                   for start in range(0, len(texts), self.embed_batch_size)]
+
+        if self.embed_threads > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.embed_threads, len(batches))) as executor:
+                results = list(executor.map(self.embedding_function, batches))
+        else:
+            results = [self.embedding_function(batch) for batch in batches]
+
+        embeddings = []
+        for result in results:
+            embeddings.extend(result)
+        return embeddings
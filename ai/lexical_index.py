@@ -0,0 +1,231 @@
+"""
+Persistent BM25 inverted index over book chunks, and rank fusion helpers
+"""
+import os
+import re
+import json
+import math
+import logging
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Bump when tokenization or the file layout changes; older files are rebuilt
+LEXICAL_INDEX_VERSION = "1"
+
+# Words, numbers and ticker-like terms such as "m&m", "bajaj-auto" or "7.5"
+_TERM = re.compile(r"[a-z0-9]+(?:[.&-][a-z0-9]+)*")
+
+_STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers herself him himself his how i if in into is it its itself
+just me more most my myself no nor not now of off on once only or other our ours ourselves out
+over own same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what when where which
+while who whom why will with would you your yours yourself yourselves
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lower-case index terms, dropping stopwords.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of terms in order of occurrence
+    """
+    return [term for term in _TERM.findall(text.lower()) if term not in _STOPWORDS]
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse several rankings of the same ids with reciprocal rank fusion.
+
+    Each id scores sum(1 / (k + rank)) over the rankings it appears in
+    (rank starting at 1), which needs no score normalization across methods.
+
+    Args:
+        rankings: Lists of ids, best first
+        k: Damping constant; larger values flatten the contribution of top ranks
+
+    Returns:
+        (id, fused score) pairs, best first; ties keep first-seen order
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunks, persisted as a JSON file next to the vector index.
+
+    Documents carry their text and metadata (book_id, title, offsets, ...), so
+    a lexical hit can be turned into a passage without reading the book file.
+    """
+
+    def __init__(self, path: Optional[Path] = None, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize the index, loading it from path if the file exists.
+
+        Args:
+            path: JSON file the index is persisted to (in memory only if None)
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        self.path = Path(path) if path else None
+        self.k1 = k1
+        self.b = b
+
+        # doc_id -> {"text", "metadata", "length"}
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        # term -> {doc_id: term frequency}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.total_length = 0
+        # source id -> fingerprint of the content indexed from it, so callers
+        # can tell whether a source needs re-indexing
+        self.sources: Dict[str, str] = {}
+        self.dirty = False
+
+        if self.path and self.path.exists():
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def load(self) -> None:
+        """Load the index from its file; an unreadable or outdated file leaves it empty."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Error loading lexical index, it will be rebuilt: {e}")
+            return
+
+        if data.get("version") != LEXICAL_INDEX_VERSION:
+            logger.info("Lexical index format changed, it will be rebuilt")
+            return
+
+        self.documents = data["documents"]
+        self.postings = data["postings"]
+        self.sources = data.get("sources", {})
+        self.total_length = sum(doc["length"] for doc in self.documents.values())
+
+    def save(self) -> None:
+        """Write the index to its file atomically if it changed."""
+        if not self.path or not self.dirty:
+            return
+
+        tmp_path = self.path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "version": LEXICAL_INDEX_VERSION,
+                    "documents": self.documents,
+                    "postings": self.postings,
+                    "sources": self.sources
+                }, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except IOError as e:
+            logger.error(f"Error saving lexical index: {e}")
+
+    def clear(self) -> None:
+        """Remove all documents."""
+        self.documents = {}
+        self.postings = {}
+        self.total_length = 0
+        self.sources = {}
+        self.dirty = True
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """
+        Add or replace documents.
+
+        Args:
+            ids: Document ids
+            texts: Document texts
+            metadatas: Document metadata, stored with each document
+        """
+        self.remove([doc_id for doc_id in ids if doc_id in self.documents])
+
+        for doc_id, text, metadata in zip(ids, texts, metadatas):
+            terms = tokenize(text)
+            frequencies: Dict[str, int] = {}
+            for term in terms:
+                frequencies[term] = frequencies.get(term, 0) + 1
+            for term, frequency in frequencies.items():
+                self.postings.setdefault(term, {})[doc_id] = frequency
+
+            self.documents[doc_id] = {"text": text, "metadata": metadata, "length": len(terms)}
+            self.total_length += len(terms)
+
+        self.dirty = True
+
+    def remove(self, ids: Iterable[str]) -> None:
+        """
+        Remove documents if present.
+
+        Args:
+            ids: Document ids
+        """
+        for doc_id in ids:
+            doc = self.documents.pop(doc_id, None)
+            if doc is None:
+                continue
+            self.total_length -= doc["length"]
+            for term in set(tokenize(doc["text"])):
+                posting = self.postings.get(term)
+                if posting is not None:
+                    posting.pop(doc_id, None)
+                    if not posting:
+                        del self.postings[term]
+            self.dirty = True
+
+    def ids_for_book(self, book_id: str) -> List[str]:
+        """Get the ids of all documents belonging to a book."""
+        return [doc_id for doc_id, doc in self.documents.items() if doc["metadata"].get("book_id") == book_id]
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Get a document ({'text', 'metadata', 'length'}) by id."""
+        return self.documents.get(doc_id)
+
+    def search(self, query: str, k: int = 10, book_id: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Score documents against a query with BM25.
+
+        Args:
+            query: Query text
+            k: Maximum number of results
+            book_id: Optional book to restrict the search to
+
+        Returns:
+            (doc_id, score) pairs with a positive score, best first
+        """
+        if not self.documents:
+            return []
+
+        doc_count = len(self.documents)
+        avg_length = self.total_length / doc_count if doc_count else 0.0
+
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+
+            idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, frequency in posting.items():
+                doc = self.documents[doc_id]
+                if book_id is not None and doc["metadata"].get("book_id") != book_id:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * doc["length"] / avg_length) if avg_length else self.k1
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        # Sort by score, then id, so equal scores rank deterministically
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:k]
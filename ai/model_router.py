@@ -0,0 +1,264 @@
+"""
+Task-based routing of Groq calls to models, with fallback and latency stats
+"""
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest call in a model's moving average latency
+LATENCY_EWMA_ALPHA = 0.2
+
+# Calls a model must have made on a route before its latency can demote it
+MIN_LATENCY_SAMPLES = 5
+
+# Seconds after its last latency sample before a slow model is tried first
+# once more, so it can recover and stats loaded from disk cannot pin it
+LATENCY_REPROBE_SECONDS = 300
+
+# Recent latencies kept per route and model for percentiles
+LATENCY_WINDOW = 200
+
+# Seconds a rate-limited model is tried last when the API gives no retry-after
+RATE_LIMIT_COOLDOWN_SECONDS = 60
+
+# Seconds between writes of the stats file
+STATS_SAVE_INTERVAL_SECONDS = 60
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Whether an exception from the Groq client means the model is rate limited."""
+    text = f"{type(error).__name__} {error}".lower()
+    return "ratelimit" in text or "rate limit" in text or "429" in text
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """The retry-after header of a failed API response, if there is one."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class ModelRouter:
+    """
+    Maps task types to an ordered list of models with a latency budget and
+    a max_tokens cap, as configured in MODEL_ROUTES.
+
+    Callers try the models in the order candidates(claim_probe=True)
+    returns and report each attempt with record(). The order is the configured one, except
+    that models in a rate-limit cooldown, and models whose moving average
+    latency on the route reaches its budget, move to the end. An attempt cut
+    off at the budget counts as a sample of its elapsed time, so a model
+    that keeps timing out is demoted too. A slow model with no sample for
+    LATENCY_REPROBE_SECONDS is tried first by one call, whose outcome
+    refreshes its stats. Latency stats are saved to a JSON file and loaded
+    on startup, so a restarted process keeps routing around slow models.
+    Tasks without a route use the client's default model with no budget.
+    """
+
+    def __init__(self, routes: Optional[Dict[str, Dict[str, Any]]] = None, stats_path: Optional[str] = None):
+        """
+        Initialize the router.
+
+        Args:
+            routes: Route settings per task (defaults to config setting)
+            stats_path: File persisting latency stats (defaults to config setting; empty disables)
+        """
+        self.routes = routes if routes is not None else config.MODEL_ROUTES
+        stats_path = config.MODEL_ROUTER_STATS_PATH if stats_path is None else stats_path
+        self.stats_path = Path(stats_path) if stats_path else None
+
+        self._stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._latencies: Dict[Tuple[str, str], deque] = {}
+        self._cooldowns: Dict[str, float] = {}
+        self._probes: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+        self._last_save = time.monotonic()
+        self._load()
+
+    def route(self, task: Optional[str], default_model: str) -> Dict[str, Any]:
+        """
+        Get the settings for a task.
+
+        Args:
+            task: Task type, e.g. 'extraction', 'summarization', 'analysis' or 'advice'
+            default_model: Model for tasks without a route
+
+        Returns:
+            Dictionary with 'models', 'latency_budget_ms' and 'max_tokens' (None for no limit)
+        """
+        route = self.routes.get(task) if task else None
+        if not route or not route.get("models"):
+            return {"models": [default_model], "latency_budget_ms": None, "max_tokens": None}
+        return {
+            "models": list(route["models"]),
+            "latency_budget_ms": route.get("latency_budget_ms") or None,
+            "max_tokens": route.get("max_tokens") or None
+        }
+
+    def candidates(self, task: Optional[str], default_model: str, claim_probe: bool = False) -> List[str]:
+        """
+        Models to try for a task, best first.
+
+        Args:
+            task: Task type
+            default_model: Model for tasks without a route
+            claim_probe: Whether the caller will make the call, and so takes a
+                         due re-probe of a slow model; the order is the same
+                         either way, only a claim postpones the next re-probe
+
+        Returns:
+            Model names in the order they should be tried
+        """
+        route = self.route(task, default_model)
+        budget = route["latency_budget_ms"]
+        now = time.time()
+
+        with self._lock:
+            def demoted(model: str) -> bool:
+                if self._cooldowns.get(model, 0) > now:
+                    return True
+                key = (task or "default", model)
+                stats = self._stats.get(key)
+                if not (budget and stats and stats.get("latency_samples", stats["successes"]) >= MIN_LATENCY_SAMPLES
+                        and stats["latency_ewma_ms"] is not None and stats["latency_ewma_ms"] >= budget):
+                    return False
+                # Let one call re-probe a model that has not been sampled for a while
+                last_seen = max(stats.get("last_sample_at", 0), self._probes.get(key, 0))
+                if now - last_seen >= LATENCY_REPROBE_SECONDS:
+                    if claim_probe:
+                        self._probes[key] = now
+                    return False
+                return True
+
+            flags = [demoted(model) for model in route["models"]]
+
+        return ([model for model, slow in zip(route["models"], flags) if not slow] +
+                [model for model, slow in zip(route["models"], flags) if slow])
+
+    def record(self, task: Optional[str], model: str, latency_ms: float, error: Optional[Exception] = None) -> None:
+        """
+        Record the outcome of one attempt.
+
+        Args:
+            task: Task type
+            model: Model that was called
+            latency_ms: Time the attempt took
+            error: Exception raised by the attempt, if it failed; a TimeoutError
+                   means the attempt was cut off at the latency budget
+        """
+        key = (task or "default", model)
+        with self._lock:
+            stats = self._stats.setdefault(key, {
+                "calls": 0, "successes": 0, "failures": 0, "rate_limited": 0, "timeouts": 0,
+                "latency_ewma_ms": None
+            })
+            stats.setdefault("latency_samples", stats["successes"])
+            stats["calls"] += 1
+
+            # Timeouts are latency samples too: the call took at least the budget
+            timed_out = isinstance(error, TimeoutError)
+            if error is None or timed_out:
+                stats["latency_samples"] += 1
+                stats["last_sample_at"] = time.time()
+                previous = stats["latency_ewma_ms"]
+                stats["latency_ewma_ms"] = round(latency_ms if previous is None else
+                                                 previous + LATENCY_EWMA_ALPHA * (latency_ms - previous), 1)
+                self._latencies.setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(latency_ms)
+
+            if error is None:
+                stats["successes"] += 1
+            else:
+                stats["failures"] += 1
+                if timed_out:
+                    stats["timeouts"] += 1
+                elif is_rate_limit_error(error):
+                    stats["rate_limited"] += 1
+                    self._cooldowns[model] = time.time() + (retry_after_seconds(error) or RATE_LIMIT_COOLDOWN_SECONDS)
+                    logger.warning(f"Groq model {model} is rate limited, trying other models first")
+
+            save = self.stats_path is not None and time.monotonic() - self._last_save >= STATS_SAVE_INTERVAL_SECONDS
+            if save:
+                self._last_save = time.monotonic()
+
+        if save:
+            self.save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get routes and per-model stats.
+
+        Returns:
+            Dictionary per task with the route settings, the current model
+            order and each model's counts, moving average and percentile latencies
+        """
+        with self._lock:
+            stats = {key: dict(value) for key, value in self._stats.items()}
+            latencies = {key: sorted(values) for key, values in self._latencies.items()}
+            cooldowns = dict(self._cooldowns)
+
+        now = time.time()
+        result = {}
+        for task in sorted(set(self.routes) | {task for task, _ in stats}):
+            routed_task = None if task == "default" else task
+            models = {}
+            for (stats_task, model), values in list(stats.items()):
+                if stats_task != task:
+                    continue
+                window = latencies.get((stats_task, model), [])
+                if window:
+                    values["latency_p50_ms"] = round(window[len(window) // 2], 1)
+                    values["latency_p95_ms"] = round(window[min(len(window) - 1, int(0.95 * len(window)))], 1)
+                values["cooling_down"] = cooldowns.get(model, 0) > now
+                models[model] = values
+
+            result[task] = dict(
+                self.route(routed_task, config.LLM_MODEL),
+                order=self.candidates(routed_task, config.LLM_MODEL),
+                stats=models
+            )
+        return result
+
+    def save(self) -> None:
+        """Write the stats file atomically."""
+        if self.stats_path is None:
+            return
+
+        with self._lock:
+            data = {f"{task}\t{model}": dict(values) for (task, model), values in self._stats.items()}
+
+        tmp_path = self.stats_path.with_suffix(".tmp")
+        try:
+            self.stats_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": 1, "saved_at": time.time(), "stats": data}, f, indent=2)
+            os.replace(tmp_path, self.stats_path)
+        except OSError as e:
+            logger.warning(f"Error saving model router stats: {str(e)}")
+
+    def _load(self) -> None:
+        """Load stats saved by an earlier process, if any."""
+        if self.stats_path is None or not self.stats_path.exists():
+            return
+        try:
+            with open(self.stats_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for key, values in data.get("stats", {}).items():
+                task, model = key.split("\t", 1)
+                self._stats[(task, model)] = values
+            logger.info(f"Loaded model router stats for {len(self._stats)} routes and models")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Error loading model router stats: {str(e)}")
+
+
+# Create a global model router shared by every GroqClient
+model_router = ModelRouter()
+atexit.register(model_router.save)
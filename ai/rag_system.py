@@ -7,16 +7,37 @@ import logging
 import re
 import pickle
 import time
-from typing import Dict, List, Any, Optional, Tuple, Union
+import hashlib
+from typing import Dict, List, Any, Optional, Tuple, Union, Iterator
 from pathlib import Path
 import markdown
-import chromadb
 from chromadb.utils import embedding_functions
 
+import config
+
 from ai.groq_client import GroqClient
+from ai.chunking import default_chunker
+from ai.lexical_index import BM25Index, LEXICAL_INDEX_VERSION, reciprocal_rank_fusion
+from ai.reranker import PassageReranker
+from ai.embedding_cache import query_embedding_cache
+from ai.book_summarizer import BookSummarizer
+from ai.vector_store import create_vector_store
+from ai.ingestion import BookIngestor, IngestionProgress, chunk_book
+from utils.cache_manager import cache_manager
 
 logger = logging.getLogger(__name__)
 
+# Bump when chunking or retrieval changes in a way that invalidates cached
+# passages and insights; it is part of the RAG index version
+RAG_PIPELINE_VERSION = "4"
+
+# Candidates taken from each ranking (vector and BM25) before fusion
+FUSION_CANDIDATES = 20
+
+# Cache files written by earlier versions: passages and insights keyed on the
+# per-process hash(query), and summaries of only the start of each book
+LEGACY_CACHE_FILE_PATTERN = re.compile(r"^-?\d+_.+_insight\.json$|^.+_-?\d+_passages\.json$|^.+_summary\.json$")
+
 class RAGSystem:
     """RAG system for financial book insights"""
     
@@ -40,19 +61,43 @@ class RAGSystem:
         self.embeddings_dir = Path(self.cache_dir) / "embeddings"
         os.makedirs(self.embeddings_dir, exist_ok=True)
         
-        # Initialize the ChromaDB client
-        persist_dir = str(self.embeddings_dir / "chroma_db")
-        self.chroma_client = chromadb.PersistentClient(path=persist_dir)
-        
         # Use a default embedding function that's lightweight but effective
         self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
         
+        # ChromaDB or the memory-mapped NumPy store, per VECTOR_STORE_BACKEND
+        self.vector_store = create_vector_store(self.embeddings_dir, self.embedding_function)
+        
+        # Orders candidate passages locally; the LLM only writes the final insight
+        self.reranker = PassageReranker(self.embedding_function, query_embedder=self._embed_queries)
+        
+        # Index and fallback search chunk books the same way, sized in tokens
+        self.chunker = default_chunker
+        
+        # Chunks books in worker processes and embeds new chunks in parallel batches
+        self.ingestor = BookIngestor(self.chunker, self.embedding_function)
+        
+        # Records what is indexed so restarts only embed new or changed chunks;
+        # each store has its own, so switching backends does not force a rebuild
+        self.manifest_path = self.embeddings_dir / self.vector_store.manifest_name
+        self._book_hashes: Dict[str, str] = {}
+        
+        # BM25 index over the same chunks, for term-heavy queries and for
+        # retrieval when embeddings are unavailable
+        self.lexical_index = BM25Index(self.embeddings_dir / "bm25_index.json")
+        
+        # Whole-book summaries, precomputed offline and versioned by book hash
+        self.book_summarizer = BookSummarizer(self.groq_client, self.cache_dir / "summaries")
+        
         # Load book metadata
         self.books = self._load_books()
         
         # Process books and create embeddings if they don't exist
         self.process_books()
         
+        # Cached passages and insights are only valid for the index they came from
+        self.index_version = self._compute_index_version()
+        self._remove_legacy_cache_files()
+        
     def _load_books(self) -> List[Dict[str, Any]]:
         """
         Load metadata for all available books.
@@ -126,6 +171,11 @@ class RAGSystem:
         """
         Get a summary of a specific book.
         
+        Summaries are served from the artifacts written by the offline
+        summarizer (python -m ai.book_summarizer). If the artifact for the
+        current version of the book is missing, it is generated in the
+        background and the previous summary, if any, is served meanwhile.
+        
         Args:
             book_id: Identifier for the book
             
@@ -140,62 +190,142 @@ class RAGSystem:
                 "error": f"Book with ID '{book_id}' not found"
             }
         
-        # Check if we have a cached summary
-        cache_file = self.cache_dir / f"{book_id}_summary.json"
-        if cache_file.exists():
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError) as e:
-                logger.warning(f"Error loading cached summary for {book_id}: {e}")
+        book_hash = self._book_hash(book)
+        artifact = self.book_summarizer.load(book_id, book_hash)
         
-        # If no cached summary, generate one
-        file_path = book["file_path"]
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                # Read the first part of the book for the summary (limit to avoid token limits)
-                text = f.read(20000)  # First ~20k characters
-            
-            # Get summary from Groq
-            prompt = (
-                f"You are helping to create a summary for '{book['title']}' by {book['author']}.\n"
-                "Based on the text provided, write a concise summary of the book that includes:\n"
-                "1. The main thesis or premise of the book\n"
-                "2. Key financial concepts covered\n"
-                "3. Major takeaways or lessons for readers\n"
-                "4. Who would benefit most from reading this book\n\n"
-                "Text excerpt:\n"
-                f"{text}\n\n"
-                "Please provide a well-structured summary in 250-300 words."
-            )
-            
-            summary_text = self.groq_client.generate_text(prompt)
-            
-            # Create the summary object
-            summary = {
+        outdated = False
+        if artifact is None:
+            self.book_summarizer.summarize_in_background(book, book_hash)
+            artifact = self.book_summarizer.latest(book_id)
+            outdated = True
+        
+        if artifact is None:
+            return {
                 "book_id": book_id,
                 "title": book["title"],
                 "author": book["author"],
-                "year": book["year"],
-                "description": book["description"],
-                "summary": summary_text,
+                "status": "pending",
+                "error": "The summary for this book is being generated. Please try again in a few minutes."
             }
+        
+        return {
+            "book_id": book_id,
+            "title": book["title"],
+            "author": book["author"],
+            "year": book["year"],
+            "description": book["description"],
+            "summary": artifact["summary"],
+            "chapters": [
+                {"title": chapter["title"], "summary": chapter["summary"]}
+                for chapter in artifact["chapters"]
+            ],
+            "generated_at": artifact["generated_at"],
+            "outdated": outdated
+        }
+    
+    def precompute_book_summary(self, book_id: str, force: bool = False) -> Dict[str, Any]:
+        """
+        Generate the summary artifact for a book unless it is up to date.
+        
+        Args:
+            book_id: Identifier for the book
+            force: Regenerate even if the artifact is up to date
             
-            # Cache the summary
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(summary, f, indent=2)
-            
-            return summary
-            
+        Returns:
+            Summary artifact, or a dictionary with an 'error'
+        """
+        book = next((b for b in self.books if b["id"] == book_id), None)
+        if not book:
+            return {"error": f"Book with ID '{book_id}' not found"}
+        
+        try:
+            return self.book_summarizer.summarize_book(book, self._book_hash(book), force=force)
         except Exception as e:
-            logger.error(f"Error generating summary for {book_id}: {e}")
-            return {
-                "book_id": book_id,
-                "title": book["title"],
-                "author": book["author"],
-                "error": f"Failed to generate summary: {str(e)}"
-            }
+            logger.error(f"Error summarizing {book_id}: {e}")
+            return {"book_id": book_id, "error": f"Failed to generate summary: {str(e)}"}
 
+    def _compute_index_version(self) -> str:
+        """
+        Get a version string for the current RAG index: a hash of the book
+        contents, the embedding function and the pipeline version.
+        
+        Returns:
+            Hex digest that changes whenever retrieval results may change
+        """
+        digest = hashlib.sha256()
+        digest.update(f"pipeline={RAG_PIPELINE_VERSION}\n".encode())
+        digest.update(f"chunker={self.chunker.version}\n".encode())
+        digest.update(f"embedding={self._embedding_model_id()}\n".encode())
+        digest.update(f"vector_store={self.vector_store.name}\n".encode())
+        digest.update(f"lexical={LEXICAL_INDEX_VERSION}\n".encode())
+        
+        for book in sorted(self.books, key=lambda b: b["id"]):
+            digest.update(f"book={book['id']}:{self._book_hash(book)}\n".encode())
+        
+        return digest.hexdigest()[:16]
+    
+    def _book_hash(self, book: Dict[str, Any]) -> str:
+        """
+        Get the SHA-256 of a book file, computed once per process.
+        
+        Args:
+            book: Book metadata
+            
+        Returns:
+            Hex digest of the file contents, or an empty string if unreadable
+        """
+        book_id = book["id"]
+        if book_id not in self._book_hashes:
+            digest = hashlib.sha256()
+            try:
+                with open(book["file_path"], 'rb') as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b""):
+                        digest.update(block)
+                self._book_hashes[book_id] = digest.hexdigest()
+            except OSError as e:
+                logger.warning(f"Error hashing book {book_id}: {e}")
+                return ""
+        return self._book_hashes[book_id]
+    
+    def _embedding_model_id(self) -> str:
+        """Identify the embedding model; a change forces a full re-index."""
+        return getattr(self.embedding_function, "MODEL_NAME", type(self.embedding_function).__name__)
+    
+    def _cache_key(self, kind: str, query: str, **params) -> str:
+        """
+        Build a deterministic cache key for a RAG result.
+        
+        The key covers the normalized query, the retrieval parameters and the
+        index version, so it is stable across processes and restarts and
+        changes whenever the underlying index does.
+        
+        Args:
+            kind: Result type ('passages' or 'insight')
+            query: User query
+            **params: Book id and other parameters that affect the result
+            
+        Returns:
+            Cache key in the 'rag' namespace
+        """
+        normalized_query = " ".join(query.lower().split())
+        material = json.dumps({
+            "kind": kind,
+            "query": normalized_query,
+            "params": params,
+            "index_version": self.index_version
+        }, sort_keys=True)
+        return f"rag_{kind}_{hashlib.sha256(material.encode()).hexdigest()}"
+    
+    def _remove_legacy_cache_files(self) -> None:
+        """Delete passage, insight and summary files from earlier versions; they are never read."""
+        removed = 0
+        for cache_file in self.cache_dir.iterdir():
+            if LEGACY_CACHE_FILE_PATTERN.match(cache_file.name):
+                cache_file.unlink(missing_ok=True)
+                removed += 1
+        if removed:
+            logger.info(f"Removed {removed} legacy RAG cache files")
+    
     def process_books(self):
         """
         Public method to process all books and create embeddings.
@@ -204,392 +334,456 @@ class RAGSystem:
         
     def _process_books(self):
         """
-        Process all books to create chunk embeddings using ChromaDB.
-        These embeddings will be used for faster retrieval later.
+        Index all books in the vector store and the BM25 index, incrementally.
+        
+        Chunks of every book go into one store, tagged with their book_id,
+        so a single query ranks passages across all books. Chunk ids are derived
+        from the chunk text, and a manifest records each book's file hash, so on
+        startup unchanged books are skipped without being read, only new chunks
+        of changed books are embedded, and chunks that no longer exist are
+        deleted. A change of chunker or embedding model rebuilds the index, and
+        books whose chunks are missing from the store are indexed again.
+        The BM25 index tracks its own per-book fingerprints, so it is built
+        even when the vector store cannot be opened.
+        
+        Books that need indexing are read incrementally and chunked in a
+        process pool while earlier books are embedded and inserted. Each book's
+        new chunks are written in one upsert, and the store, manifest and BM25
+        index are persisted once at the end.
         """
+        manifest = self._load_manifest()
+        
+        if (manifest.get("chunker_version") != self.chunker.version or
+                manifest.get("embedding_model") != self._embedding_model_id()):
+            if manifest:
+                logger.info("Chunker or embedding model changed, rebuilding the book index")
+            else:
+                logger.info("No index manifest found, building the book index")
+            self.vector_store.reset()
+            manifest = {
+                "chunker_version": self.chunker.version,
+                "embedding_model": self._embedding_model_id(),
+                "books": {}
+            }
+        
+        store = self.vector_store if self.vector_store.open() else None
+        indexed_books = manifest["books"]
+        
+        # Books whose files were removed
+        current_ids = {book["id"] for book in self.books}
+        for book_id in set(indexed_books) | set(self.lexical_index.sources):
+            if book_id in current_ids:
+                continue
+            self.lexical_index.remove(self.lexical_index.ids_for_book(book_id))
+            self.lexical_index.sources.pop(book_id, None)
+            if store is not None and book_id in indexed_books:
+                try:
+                    store.delete_book(book_id)
+                    del indexed_books[book_id]
+                except Exception as e:
+                    logger.error(f"Error removing {book_id} from the book index: {e}")
+            logger.info(f"Removed {book_id} from the book index")
+        
+        # The manifest can describe chunks the store lost, e.g. after a crash
+        # between writes or an unreadable store file; such books are indexed
+        # again, which embeds only the chunks actually missing
+        verify_store = store is not None and store.count() != sum(
+            entry.get("chunks", 0) for entry in indexed_books.values()
+        )
+        if verify_store:
+            logger.warning("Vector store does not match the index manifest, checking every book")
+        
+        pending = []
         for book in self.books:
             book_id = book["id"]
-            collection_name = f"book_{book_id}"
+            file_hash = self._book_hash(book)
+            lexical_fingerprint = f"{file_hash}:{self.chunker.version}"
             
-            # Check if this collection already exists in ChromaDB
-            existing_collections = self.chroma_client.list_collections()
-            collection_exists = collection_name in existing_collections
+            indexed = indexed_books.get(book_id, {})
+            vector_current = store is None or bool(
+                file_hash and indexed.get("file_hash") == file_hash and
+                (not verify_store or len(store.ids_for_book(book_id)) == indexed.get("chunks"))
+            )
+            lexical_current = bool(file_hash and self.lexical_index.sources.get(book_id) == lexical_fingerprint)
             
-            if collection_exists:
-                logger.info(f"Collection for {book_id} already exists in ChromaDB, skipping processing")
+            if vector_current and lexical_current:
+                logger.info(f"Book {book_id} is unchanged, skipping indexing")
                 continue
-                
-            logger.info(f"Processing book {book_id} to create embeddings in ChromaDB")
+            pending.append((book, file_hash, lexical_fingerprint, vector_current, lexical_current))
+        
+        progress = IngestionProgress(len(pending))
+        states = {book["id"]: state for book, *state in pending}
+        for book, chunked, error in self.ingestor.chunk_books([entry[0] for entry in pending]):
+            book_id = book["id"]
+            file_hash, lexical_fingerprint, vector_current, lexical_current = states[book_id]
             
             try:
-                # Read the book content
-                with open(book["file_path"], 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Split into chunks (paragraphs)
-                paragraphs = [p.strip() for p in re.split(r'\n\s*\n', content) if p.strip()]
+                if error is not None:
+                    raise error
+                chunks, chunk_ids, chunk_metadatas = chunked
                 
-                # Combine short paragraphs to make reasonable-sized chunks
-                chunks = []
-                chunk_ids = []
-                chunk_metadatas = []
-                current_chunk = ""
-                max_chunk_length = 1000  # characters (ChromaDB can handle larger chunks)
-                chunk_index = 0
+                embedded = 0
+                if not vector_current:
+                    indexed_books[book_id], embedded = self._index_book(store, book_id, file_hash,
+                                                                        chunks, chunk_ids, chunk_metadatas)
                 
-                for p in paragraphs:
-                    if len(current_chunk) + len(p) <= max_chunk_length:
-                        current_chunk += "\n\n" + p if current_chunk else p
-                    else:
-                        if current_chunk:
-                            chunks.append(current_chunk)
-                            chunk_ids.append(f"{book_id}_{chunk_index}")
-                            chunk_metadatas.append({
-                                "book_id": book_id,
-                                "book_title": book["title"],
-                                "book_author": book["author"],
-                                "chunk_index": chunk_index,
-                                "source": "book"
-                            })
-                            chunk_index += 1
-                        current_chunk = p
-                        
-                if current_chunk:
-                    chunks.append(current_chunk)
-                    chunk_ids.append(f"{book_id}_{chunk_index}")
-                    chunk_metadatas.append({
-                        "book_id": book_id,
-                        "book_title": book["title"],
-                        "book_author": book["author"],
-                        "chunk_index": chunk_index,
-                        "source": "book"
-                    })
+                if not lexical_current:
+                    self.lexical_index.remove(self.lexical_index.ids_for_book(book_id))
+                    self.lexical_index.add(chunk_ids, chunks, chunk_metadatas)
+                    self.lexical_index.sources[book_id] = lexical_fingerprint
+                    logger.info(f"Built BM25 index for {book_id}: {len(chunks)} chunks")
                 
-                # Create a new collection in ChromaDB for this book
-                if chunks:  # Only proceed if we have chunks
-                    # Get or create collection
-                    collection = self.chroma_client.create_collection(
-                        name=collection_name,
-                        embedding_function=self.embedding_function,
-                        metadata={"book_id": book_id, "title": book["title"], "author": book["author"]}
-                    )
-                    
-                    # Add documents in batches to avoid memory issues
-                    batch_size = 100
-                    for i in range(0, len(chunks), batch_size):
-                        batch_end = min(i + batch_size, len(chunks))
-                        collection.add(
-                            documents=chunks[i:batch_end],
-                            ids=chunk_ids[i:batch_end],
-                            metadatas=chunk_metadatas[i:batch_end]
-                        )
-                        
-                    # Persist the changes
-                    self.chroma_client.persist()
-                    
-                    logger.info(f"Created ChromaDB collection with {len(chunks)} chunks for {book_id}")
-                else:
-                    logger.warning(f"No chunks found for {book_id}")
-                    
+                progress.book_done(book, len(chunks), embedded)
             except Exception as e:
                 logger.error(f"Error processing embeddings for {book_id}: {e}")
+        
+        if pending:
+            logger.info(f"Book ingestion finished: {progress.get_stats()}")
+        
+        # Persist the vectors before the manifest that describes them
+        if store is not None:
+            store.flush()
+        self._save_manifest(manifest)
+        self.lexical_index.save()
     
-    def _get_book_collection(self, book_id: str):
+    def _chunk_book(self, book: Dict[str, Any]) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
         """
-        Get the ChromaDB collection for a specific book.
+        Split a book into chunks with stable ids and index metadata.
         
         Args:
-            book_id: The book ID
+            book: Book metadata
             
         Returns:
-            ChromaDB collection or None if not found
+            Tuple of (chunk texts, chunk ids, chunk metadatas)
+        """
+        return chunk_book(book, self.chunker)
+    
+    def _index_book(self, store, book_id: str, file_hash: str, chunks: List[str],
+                    chunk_ids: List[str], chunk_metadatas: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], int]:
         """
-        collection_name = f"book_{book_id}"
+        Bring one book's chunks in the vector store up to date with its file.
         
-        try:
-            # Check if this collection exists in ChromaDB
-            existing_collections = self.chroma_client.list_collections()
-            collection_exists = collection_name in existing_collections
-            
-            if not collection_exists:
-                logger.warning(f"Collection for {book_id} not found in ChromaDB, processing book")
-                self._process_books()
-                
-                # Check again after processing
-                existing_collections = self.chroma_client.list_collections()
-                collection_exists = any(collection.name == collection_name for collection in existing_collections)
-                
-                if not collection_exists:
-                    logger.error(f"Failed to create collection for {book_id}")
-                    return None
+        Args:
+            store: Open vector store
+            book_id: Identifier for the book
+            file_hash: SHA-256 of the book file
+            chunks: Chunk texts from _chunk_book
+            chunk_ids: Chunk ids from _chunk_book
+            chunk_metadatas: Chunk metadata from _chunk_book
             
-            # Get the collection
-            collection = self.chroma_client.get_collection(
-                name=collection_name,
-                embedding_function=self.embedding_function
+        Returns:
+            Tuple of (manifest entry for the book, number of chunks embedded)
+        """
+        existing_ids = set(store.ids_for_book(book_id))
+        wanted = {chunk_id: i for i, chunk_id in enumerate(chunk_ids)}
+        
+        stale_ids = [chunk_id for chunk_id in existing_ids if chunk_id not in wanted]
+        new_positions = [i for chunk_id, i in wanted.items() if chunk_id not in existing_ids]
+        kept_positions = [i for chunk_id, i in wanted.items() if chunk_id in existing_ids]
+        
+        if stale_ids:
+            store.delete(stale_ids)
+        
+        # Only new chunks are embedded, in parallel batches, then inserted at once
+        if new_positions:
+            new_chunks = [chunks[i] for i in new_positions]
+            store.upsert(
+                ids=[chunk_ids[i] for i in new_positions],
+                documents=new_chunks,
+                metadatas=[chunk_metadatas[i] for i in new_positions],
+                embeddings=self.ingestor.embed(new_chunks)
             )
+        
+        # Kept chunks may have moved; updating metadata alone does not re-embed
+        if kept_positions:
+            store.update_metadata(
+                ids=[chunk_ids[i] for i in kept_positions],
+                metadatas=[chunk_metadatas[i] for i in kept_positions]
+            )
+        
+        logger.info(
+            f"Indexed {book_id}: {len(new_positions)} chunks embedded, "
+            f"{len(kept_positions)} unchanged, {len(stale_ids)} removed"
+        )
+        
+        return {"file_hash": file_hash, "chunks": len(chunks)}, len(new_positions)
+    
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Load the index manifest, or an empty one if missing or unreadable."""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Error loading index manifest, rebuilding the index: {e}")
+            return {}
+    
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        """Write the index manifest atomically."""
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp_path, self.manifest_path)
+        except IOError as e:
+            logger.error(f"Error saving index manifest: {e}")
+    
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed queries through the process-wide cache, in one model call for
+        all the ones not cached yet.
+        
+        Args:
+            queries: Query texts
             
-            return collection
-        except Exception as e:
-            logger.error(f"Error getting ChromaDB collection for {book_id}: {e}")
-            return None
+        Returns:
+            Embedding vectors aligned with queries
+        """
+        return query_embedding_cache.embed(self.embedding_function, self._embedding_model_id(), queries)
     
-    def _extract_relevant_passages(self, book_id: str, query: str, max_passages: int = 3) -> List[Dict[str, Any]]:
+    def _query_index(self, query: str, n_results: int, book_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
-        Extract passages from a book that are relevant to a query using ChromaDB.
+        Query the vector store for the passages most similar to a query.
         
         Args:
-            book_id: ID of the book to search
             query: Query to search for
-            max_passages: Maximum number of passages to return
+            n_results: Maximum number of passages to return
+            book_id: Optional book to restrict the search to (searches all books if None)
             
         Returns:
-            List of relevant passages with metadata
+            Passages ranked by similarity across the searched books
         """
-        book = next((b for b in self.books if b["id"] == book_id), None)
-        
-        if not book or "file_path" not in book:
-            logger.error(f"Book with ID '{book_id}' not found or has no file path")
-            return []
-        
-        # Check if we have a cached result for this query and book
-        cache_key = f"{book_id}_{hash(query)}"
-        cache_file = self.cache_dir / f"{cache_key}_passages.json"
+        query_embedding = self._embed_queries([query])[0]
+        
+        passages = []
+        for chunk in self.vector_store.query(query_embedding, n_results, book_id=book_id):
+            metadata = chunk["metadata"]
+            similarity = chunk["similarity"]
+            passages.append({
+                "chunk_id": chunk["id"],
+                "book_id": metadata["book_id"],
+                "book_title": metadata["book_title"],
+                "book_author": metadata["book_author"],
+                "text": chunk["text"],
+                "relevance": f"Semantic similarity: {similarity:.4f}",
+                "similarity_score": float(similarity),
+                "start_offset": metadata.get("start_offset"),
+                "end_offset": metadata.get("end_offset")
+            })
+        
+        return passages
+    
+    def _query_lexical(self, query: str, n_results: int, book_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Query the BM25 index for the passages that best match a query's terms.
         
-        if cache_file.exists():
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError) as e:
-                logger.warning(f"Error loading cached passages for {cache_key}: {e}")
+        Args:
+            query: Query to search for
+            n_results: Maximum number of passages to return
+            book_id: Optional book to restrict the search to (searches all books if None)
+            
+        Returns:
+            Passages ranked by BM25 score across the searched books
+        """
+        passages = []
+        for chunk_id, score in self.lexical_index.search(query, k=n_results, book_id=book_id):
+            doc = self.lexical_index.get(chunk_id)
+            metadata = doc["metadata"]
+            passages.append({
+                "chunk_id": chunk_id,
+                "book_id": metadata["book_id"],
+                "book_title": metadata["book_title"],
+                "book_author": metadata["book_author"],
+                "text": doc["text"],
+                "relevance": f"BM25 score: {score:.4f}",
+                "bm25_score": float(score),
+                "start_offset": metadata.get("start_offset"),
+                "end_offset": metadata.get("end_offset")
+            })
+        
+        return passages
+    
+    @staticmethod
+    def _fuse_passages(vector_passages: List[Dict[str, Any]],
+                       lexical_passages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Merge vector and BM25 rankings with reciprocal rank fusion.
         
-        # Try using ChromaDB approach
-        try:
-            # Get the collection for this book
-            collection = self._get_book_collection(book_id)
+        Args:
+            vector_passages: Passages ranked by semantic similarity
+            lexical_passages: Passages ranked by BM25 score
             
-            if collection:
-                # Query the collection for similar passages
-                results = collection.query(
-                    query_texts=[query],
-                    n_results=max_passages,
-                    include=["documents", "metadatas", "distances"]
+        Returns:
+            Passages ranked by fused score, each carrying the scores it has
+        """
+        by_id: Dict[str, Dict[str, Any]] = {}
+        for passage in vector_passages + lexical_passages:
+            merged = by_id.setdefault(passage["chunk_id"], dict(passage))
+            merged.update({k: v for k, v in passage.items() if k.endswith("_score")})
+        
+        fused = []
+        for chunk_id, score in reciprocal_rank_fusion([
+            [passage["chunk_id"] for passage in vector_passages],
+            [passage["chunk_id"] for passage in lexical_passages]
+        ]):
+            passage = by_id[chunk_id]
+            if "similarity_score" in passage and "bm25_score" in passage:
+                passage["relevance"] = (
+                    f"Hybrid match (semantic similarity: {passage['similarity_score']:.4f}, "
+                    f"BM25 score: {passage['bm25_score']:.4f})"
                 )
-                
-                if results and len(results["documents"]) > 0 and len(results["documents"][0]) > 0:
-                    # Prepare the passages with the book metadata
-                    passages = []
-                    for i, (text, metadata, distance) in enumerate(zip(
-                        results["documents"][0], 
-                        results["metadatas"][0], 
-                        results["distances"][0]
-                    )):
-                        # Convert distance to similarity score (ChromaDB returns distance, lower is better)
-                        # Simple conversion: similarity = 1 - normalized_distance
-                        similarity = 1.0 - min(distance, 1.0)
-                        
-                        passage = {
-                            "book_id": book_id,
-                            "book_title": book["title"],
-                            "book_author": book["author"],
-                            "text": text,
-                            "relevance": f"Semantic similarity: {similarity:.4f}",
-                            "similarity_score": float(similarity)
-                        }
-                        passages.append(passage)
-                    
-                    # Cache the results
-                    with open(cache_file, 'w', encoding='utf-8') as f:
-                        json.dump(passages, f, indent=2)
-                    
-                    return passages
-                
-            # If collection is empty or doesn't exist, fall back to the original approach
-            logger.warning(f"ChromaDB collection for {book_id} returned no results, falling back to LLM approach")
+            passage["fusion_score"] = score
+            fused.append(passage)
+        
+        return fused
+    
+    def search_passages(self, queries: List[str], book_id: Optional[str] = None,
+                        max_passages: int = 3) -> List[List[Dict[str, Any]]]:
+        """
+        Find relevant passages for several queries at once.
+        
+        All distinct queries are embedded in a single model call up front, so
+        each is embedded once however many times it repeats or is searched.
+        
+        Args:
+            queries: Queries to search for
+            book_id: ID of the book to search, or None to search all books
+            max_passages: Maximum number of passages per query
             
+        Returns:
+            One list of passages per query, best first
+        """
+        distinct = list(dict.fromkeys(queries))
+        try:
+            self._embed_queries(distinct)
         except Exception as e:
-            logger.error(f"Error in ChromaDB retrieval for {book_id}: {e}")
-            # Fall back to the original approach
+            # Each search falls back on its own
+            logger.error(f"Error embedding queries: {e}")
         
-        # Fall back to the original approach if embeddings don't work
-        # This is our backup approach using keyword matching and LLM
+        results = {query: self._extract_relevant_passages(book_id, query, max_passages) for query in distinct}
+        return [results[query] for query in queries]
+    
+    def _extract_relevant_passages(self, book_id: Optional[str], query: str, max_passages: int = 3) -> List[Dict[str, Any]]:
+        """
+        Extract passages relevant to a query using the hybrid BM25 + vector index.
         
-        try:
-            # Read the book content
-            with open(book["file_path"], 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Split into chunks (paragraphs)
-            paragraphs = [p.strip() for p in re.split(r'\n\s*\n', content) if p.strip()]
-            
-            # If there are too many paragraphs, combine some to reduce the number
-            chunks = []
-            current_chunk = ""
-            max_chunk_length = 500  # characters
-            
-            for p in paragraphs:
-                if len(current_chunk) + len(p) <= max_chunk_length:
-                    current_chunk += "\n\n" + p if current_chunk else p
-                else:
-                    if current_chunk:
-                        chunks.append(current_chunk)
-                    current_chunk = p
-                    
-            if current_chunk:
-                chunks.append(current_chunk)
-            
-            # Use a cache to avoid reprocessing the same query for the same book
-            cache_key = f"{book_id}_{hash(query)}"
-            cache_file = self.cache_dir / f"{cache_key}_passages.json"
-            
-            if cache_file.exists():
-                try:
-                    with open(cache_file, 'r', encoding='utf-8') as f:
-                        return json.load(f)
-                except (json.JSONDecodeError, IOError) as e:
-                    logger.warning(f"Error loading cached passages for {cache_key}: {e}")
-            
-            # Approach 1: For small books, we can ask the LLM to find relevant passages directly
-            if len(chunks) < 50:  # Arbitrary threshold
-                prompt = (
-                    f"You are helping to find passages from '{book['title']}' by {book['author']} "
-                    f"that are relevant to the query: '{query}'\n\n"
-                    "Book content is provided below. Identify the {max_passages} most relevant passages "
-                    "and return them in JSON format with the following structure:\n"
-                    "[\n"
-                    "  {\n"
-                    "    \"text\": \"The passage text...\",\n"
-                    "    \"relevance\": \"Brief explanation of how this passage relates to the query\"\n"
-                    "  },\n"
-                    "  ...\n"
-                    "]\n\n"
-                    "Book Content:\n"
-                    f"{content[:50000]}"  # Limit content to avoid token limits
-                )
-                
-                response = self.groq_client.generate_text(prompt)
-                
-                # Try to extract JSON from the response
-                try:
-                    # Look for JSON in the response
-                    match = re.search(r'(\[\s*\{.*\}\s*\])', response, re.DOTALL)
-                    if match:
-                        json_str = match.group(1)
-                        passages = json.loads(json_str)
-                    else:
-                        # Try to parse the entire response as JSON
-                        passages = json.loads(response)
-                        
-                    # Add book metadata to each passage
-                    for passage in passages:
-                        passage["book_id"] = book_id
-                        passage["book_title"] = book["title"]
-                        passage["book_author"] = book["author"]
-                    
-                    # Cache the results
-                    with open(cache_file, 'w', encoding='utf-8') as f:
-                        json.dump(passages, f, indent=2)
-                    
-                    return passages[:max_passages]
-                        
-                except (json.JSONDecodeError, AttributeError) as e:
-                    logger.error(f"Error parsing LLM response as JSON: {e}")
-                    # Fall back to approach 2
-            
-            # Approach 2: For longer books, we need to be more selective
-            # This is a simple keyword matching approach for demo purposes
-            # In a real implementation, this would use embeddings and semantic search
-            query_keywords = set(re.findall(r'\w+', query.lower()))
-            
-            scored_chunks = []
-            for i, chunk in enumerate(chunks):
-                chunk_text = chunk.lower()
-                score = sum(1 for kw in query_keywords if kw in chunk_text)
-                scored_chunks.append((score, i, chunk))
-            
-            # Sort by score (descending)
-            scored_chunks.sort(reverse=True)
-            
-            # Take the top chunks
-            top_chunks = scored_chunks[:min(max_passages*2, len(scored_chunks))]
+        Args:
+            book_id: ID of the book to search, or None to search all books
+            query: Query to search for
+            max_passages: Maximum number of passages to return
             
-            # Ask the LLM to evaluate and rank these chunks
-            chunks_with_index = [f"[{i+1}] {chunk}" for _, i, chunk in top_chunks]
-            chunks_text = "\n\n".join(chunks_with_index)
+        Returns:
+            List of relevant passages with metadata, best first
+        """
+        book = None
+        if book_id is not None:
+            book = next((b for b in self.books if b["id"] == book_id), None)
+            
+            if not book or "file_path" not in book:
+                logger.error(f"Book with ID '{book_id}' not found or has no file path")
+                return []
+        
+        cache_key = self._cache_key("passages", query, book_id=book_id, max_passages=max_passages)
+        result = cache_manager.get_or_compute(
+            cache_key,
+            lambda: self._search_passages(book, query, max_passages),
+            cacheable=lambda result: result["cacheable"] and bool(result["passages"])
+        )
+        return result["passages"]
+    
+    def _search_passages(self, book: Optional[Dict[str, Any]], query: str, max_passages: int) -> Dict[str, Any]:
+        """
+        Search for passages relevant to a query without consulting the cache.
+        
+        Args:
+            book: Book metadata, or None to search all books
+            query: Query to search for
+            max_passages: Maximum number of passages to return
             
-            prompt = (
-                f"You are helping to find passages from '{book['title']}' by {book['author']} "
-                f"that are relevant to the query: '{query}'\n\n"
-                "Below are some candidate passages. Rank the top {max_passages} most relevant passages "
-                "and return them in JSON format with the following structure:\n"
-                "[\n"
-                "  {\n"
-                "    \"passage_number\": 1,  // The index number in brackets\n"
-                "    \"text\": \"The passage text...\",\n"
-                "    \"relevance\": \"Brief explanation of how this passage relates to the query\"\n"
-                "  },\n"
-                "  ...\n"
-                "]\n\n"
-                "Candidate Passages:\n"
-                f"{chunks_text}"
-            )
+        Returns:
+            Dictionary with the 'passages' and whether they may be cached
+            ('cacheable' is False for degraded, keyword-only rankings)
+        """
+        book_id = book["id"] if book else None
+        candidates = max(FUSION_CANDIDATES, max_passages)
+        
+        vector_passages = []
+        try:
+            vector_passages = self._query_index(query, candidates, book_id=book_id)
+        except Exception as e:
+            logger.error(f"Error in vector retrieval for {book_id or 'all books'}: {e}")
+        
+        lexical_passages = self._query_lexical(query, candidates, book_id=book_id)
+        
+        if vector_passages or lexical_passages:
+            if not vector_passages:
+                logger.warning(f"No vector results for {book_id or 'all books'}, using BM25 results only")
             
-            response = self.groq_client.generate_text(prompt)
+            passages = self._fuse_passages(vector_passages, lexical_passages)
+            if self.reranker.uses_cross_encoder:
+                passages = self.reranker.rerank(query, passages)
             
-            # Try to extract JSON from the response
-            try:
-                # Look for JSON in the response
-                match = re.search(r'(\[\s*\{.*\}\s*\])', response, re.DOTALL)
-                if match:
-                    json_str = match.group(1)
-                    ranked_passages = json.loads(json_str)
-                else:
-                    # Try to parse the entire response as JSON
-                    ranked_passages = json.loads(response)
-                
-                # Process the ranked passages to get the actual chunks
-                passages = []
-                for ranked in ranked_passages[:max_passages]:
-                    if "passage_number" in ranked:
-                        idx = int(ranked["passage_number"]) - 1
-                        if 0 <= idx < len(chunks_with_index):
-                            # Extract the original text (remove the index prefix)
-                            original_text = re.sub(r'^\[\d+\]\s*', '', chunks_with_index[idx])
-                            passage = {
-                                "book_id": book_id,
-                                "book_title": book["title"],
-                                "book_author": book["author"],
-                                "text": original_text,
-                                "relevance": ranked.get("relevance", "")
-                            }
-                            passages.append(passage)
-                
-                # Cache the results
-                with open(cache_file, 'w', encoding='utf-8') as f:
-                    json.dump(passages, f, indent=2)
-                
-                return passages
-                
-            except (json.JSONDecodeError, AttributeError) as e:
-                logger.error(f"Error parsing LLM response as JSON: {e}")
-                
-                # Fallback: Just return the top chunks with minimal processing
-                passages = []
-                for _, i, chunk in top_chunks[:max_passages]:
-                    passage = {
-                        "book_id": book_id,
-                        "book_title": book["title"],
-                        "book_author": book["author"],
-                        "text": chunk,
-                        "relevance": "Matched query keywords"
-                    }
-                    passages.append(passage)
-                
-                return passages
+            return {
+                "passages": passages[:max_passages],
+                "cacheable": bool(vector_passages)
+            }
+        
+        logger.warning(f"No indexed results for {book_id or 'all books'}, reranking book chunks locally")
+        
+        # Candidates from every searched book are ranked together
+        candidates = []
+        for searched_book in ([book] if book is not None else self.books):
+            candidates.extend(self._fallback_candidates(searched_book, query, config.RERANKER_CANDIDATES))
+        
+        passages = self.reranker.rerank(query, candidates, top_k=max_passages)
+        return {
+            "passages": passages,
+            "cacheable": bool(passages) and all(passage["rerank_method"] != "lexical" for passage in passages)
+        }
+    
+    def _fallback_candidates(self, book: Dict[str, Any], query: str, max_candidates: int) -> List[Dict[str, Any]]:
+        """
+        Find candidate passages in a book that is missing from the indexes,
+        by chunking its file and keeping the chunks that best match the
+        query's terms.
+        
+        Args:
+            book: Book metadata
+            query: Query to search for
+            max_candidates: Maximum number of candidates to return
             
+        Returns:
+            Candidate passages, best keyword match first
+        """
+        book_id = book["id"]
+        
+        try:
+            chunks, chunk_ids, chunk_metadatas = self._chunk_book(book)
         except Exception as e:
-            logger.error(f"Error extracting passages from {book_id}: {e}")
+            logger.error(f"Error reading {book_id} for fallback search: {e}")
             return []
+        
+        # Same chunks and scoring as the persistent BM25 index, for this book only
+        book_index = BM25Index()
+        book_index.add(chunk_ids, chunks, chunk_metadatas)
+        
+        candidates = []
+        for chunk_id, score in book_index.search(query, k=max_candidates):
+            doc = book_index.get(chunk_id)
+            candidates.append({
+                "chunk_id": chunk_id,
+                "book_id": book_id,
+                "book_title": book["title"],
+                "book_author": book["author"],
+                "text": doc["text"],
+                "relevance": "Matched query keywords",
+                "bm25_score": float(score),
+                "start_offset": doc["metadata"]["start_offset"],
+                "end_offset": doc["metadata"]["end_offset"]
+            })
+        
+        return candidates
 
     def generate_book_insight(self, query: str, book_id: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -602,39 +796,118 @@ class RAGSystem:
         Returns:
             Dictionary with generated insight and source references
         """
-        # Check if we have a cached response for this query
-        cache_key = f"{hash(query)}_{book_id or 'all'}"
-        cache_file = self.cache_dir / f"{cache_key}_insight.json"
+        cache_key = self._cache_key("insight", query, book_id=book_id)
         
-        if cache_file.exists():
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError) as e:
-                logger.warning(f"Error loading cached insight for {cache_key}: {e}")
-        
-        # Get relevant passages from the specified book or all books
-        all_passages = []
-        
-        if book_id:
-            # Search in the specific book
-            all_passages = self._extract_relevant_passages(book_id, query)
-        else:
-            # Search across all books
-            for book in self.books:
-                passages = self._extract_relevant_passages(book["id"], query, max_passages=2)
-                all_passages.extend(passages)
+        # Failed generations and empty results are not cached
+        return cache_manager.get_or_compute(
+            cache_key,
+            lambda: self._generate_book_insight(query, book_id),
+            cacheable=self._insight_cacheable
+        )
+    
+    def generate_book_insight_stream(self, query: str, book_id: Optional[str] = None) -> Iterator[Tuple[str, Any]]:
+        """
+        Generate insights from books based on a query, streaming the insight
+        as it is generated. Shares cache entries with generate_book_insight.
+        
+        Args:
+            query: The user's query about financial concepts
+            book_id: Optional specific book to search in (if None, search all books)
             
-            # Sort by relevance (assuming more detailed relevance scoring in a real implementation)
-            # For now, we'll just take the top 5
-            all_passages = all_passages[:5]
+        Yields:
+            ('meta', dict with sources) once passages are found, ('token', text)
+            for each piece of the insight, and finally ('done', dictionary as
+            returned by generate_book_insight)
+        """
+        cache_key = self._cache_key("insight", query, book_id=book_id)
+        
+        cached = cache_manager.get(cache_key)
+        if cached is not None:
+            yield "done", cached
+            return
+        
+        prompt, all_passages = self._insight_prompt(query, book_id)
+        if prompt is None:
+            yield "done", self._no_insight(query)
+            return
+        
+        sources = self.format_sources(all_passages)
+        yield "meta", {"query": query, "sources": sources}
+        
+        pieces = []
+        try:
+            for piece in self.groq_client.stream_text(prompt, task="advice", semantic_query=query,
+                                                      template=f"book_insight:{book_id or 'all'}"):
+                pieces.append(piece)
+                yield "token", piece
+            insight = "".join(pieces)
+        except RuntimeError as e:
+            insight = f"Error: {str(e)}"
+        
+        result = {
+            "query": query,
+            "insight": insight,
+            "sources": sources
+        }
+        if self._insight_cacheable(result):
+            cache_manager.set(cache_key, result)
+        yield "done", result
+    
+    @staticmethod
+    def _insight_cacheable(result: Dict[str, Any]) -> bool:
+        """Failed generations and empty results are not cached."""
+        return bool(result["sources"]) and not result["insight"].startswith("Error:")
+    
+    @staticmethod
+    def _no_insight(query: str) -> Dict[str, Any]:
+        """Insight result for a query no passage matches."""
+        return {
+            "query": query,
+            "insight": f"No relevant insights found for query: '{query}'",
+            "sources": []
+        }
+    
+    def _generate_book_insight(self, query: str, book_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Generate insights from books without consulting the cache.
+        
+        Args:
+            query: The user's query about financial concepts
+            book_id: Optional specific book to search in (if None, search all books)
+            
+        Returns:
+            Dictionary with generated insight and source references
+        """
+        prompt, all_passages = self._insight_prompt(query, book_id)
+        if prompt is None:
+            return self._no_insight(query)
+        
+        insight = self.groq_client.generate_text(prompt, task="advice", semantic_query=query,
+                                                 template=f"book_insight:{book_id or 'all'}")
+        
+        return {
+            "query": query,
+            "insight": insight,
+            "sources": self.format_sources(all_passages)
+        }
+    
+    def _insight_prompt(self, query: str, book_id: Optional[str]) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """
+        Find the passages for an insight and build its prompt.
+        
+        Args:
+            query: The user's query about financial concepts
+            book_id: Optional specific book to search in (if None, search all books)
+            
+        Returns:
+            Tuple of (prompt, or None if no passage is relevant, passages)
+        """
+        # Get relevant passages from the specified book, or the globally best
+        # ranked passages across all books
+        all_passages = self._extract_relevant_passages(book_id, query, max_passages=3 if book_id else 5)
         
         if not all_passages:
-            return {
-                "query": query,
-                "insight": f"No relevant insights found for query: '{query}'",
-                "sources": []
-            }
+            return None, []
         
         # Build context from passages
         context = ""
@@ -654,11 +927,21 @@ class RAGSystem:
             "the wisdom from these financial texts, and makes it relevant to the Indian financial context."
         )
         
-        insight = self.groq_client.generate_text(prompt)
+        return prompt, all_passages
+    
+    @staticmethod
+    def format_sources(passages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Format passages as source references for a response.
         
-        # Format sources from passages
+        Args:
+            passages: Passages returned by the search
+            
+        Returns:
+            List of sources with book metadata and a short snippet
+        """
         sources = []
-        for passage in all_passages:
+        for passage in passages:
             source = {
                 "book_id": passage["book_id"],
                 "book_title": passage["book_title"],
@@ -666,18 +949,7 @@ class RAGSystem:
                 "snippet": passage["text"][:150] + "..." if len(passage["text"]) > 150 else passage["text"]
             }
             sources.append(source)
-        
-        result = {
-            "query": query,
-            "insight": insight,
-            "sources": sources
-        }
-        
-        # Cache the result
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2)
-        
-        return result
+        return sources
 
     def answer_financial_question(self, question: str) -> Dict[str, Any]:
         """
@@ -705,7 +977,8 @@ class RAGSystem:
             "Please provide a concise, factual answer to the user's question."
         )
         
-        answer = self.groq_client.generate_text(prompt)
+        answer = self.groq_client.generate_text(prompt, task="advice", semantic_query=question,
+                                                template="book_answer")
         
         return {
             "question": question,
@@ -0,0 +1,193 @@
+"""
+Local passage reranking, so choosing passages never costs an LLM call
+"""
+import time
+import math
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Callable
+
+import config
+from ai.lexical_index import BM25Index
+from utils.memory_cache import MemoryCache
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:
+    CrossEncoder = None
+
+logger = logging.getLogger(__name__)
+
+# Approximate in-memory size of one cached score entry
+_SCORE_ENTRY_BYTES = 128
+
+class PassageReranker:
+    """
+    Scores candidate passages against a query on the local CPU.
+
+    Uses a cross-encoder when RERANKER_MODEL is set and sentence-transformers
+    is installed, otherwise the cosine similarity of the embeddings produced
+    by the RAG embedding function. If neither can run, candidates are scored
+    with BM25 among themselves and the method is reported as 'lexical', so
+    callers can treat the result as degraded. Scores are cached per
+    (method, query, passage text), and ties keep the candidates' input order,
+    so the same candidates always come back in the same order.
+    """
+
+    def __init__(self, embedding_function: Optional[Callable[[List[str]], Any]] = None,
+                 model_name: Optional[str] = None, cache_size: Optional[int] = None,
+                 query_embedder: Optional[Callable[[List[str]], Any]] = None):
+        """
+        Initialize the reranker.
+
+        Args:
+            embedding_function: Function mapping a list of texts to embedding vectors
+            model_name: Cross-encoder model name (defaults to config setting; empty disables it)
+            cache_size: Maximum number of cached scores (defaults to config setting)
+            query_embedder: Function embedding queries, e.g. through a cache
+                            (defaults to embedding_function)
+        """
+        self.embedding_function = embedding_function
+        self.query_embedder = query_embedder or embedding_function
+        self.model_name = config.RERANKER_MODEL if model_name is None else model_name
+        cache_size = config.RERANKER_CACHE_SIZE if cache_size is None else cache_size
+        self._scores = MemoryCache(max_entries=cache_size, max_bytes=cache_size * _SCORE_ENTRY_BYTES)
+
+        self._cross_encoder = None
+        self._cross_encoder_failed = CrossEncoder is None or not self.model_name
+        self._load_lock = threading.Lock()
+
+    @property
+    def uses_cross_encoder(self) -> bool:
+        """Whether a cross-encoder is configured and has not failed to load."""
+        return not self._cross_encoder_failed
+
+    def rerank(self, query: str, passages: List[Dict[str, Any]], top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Order passages by relevance to a query.
+
+        Args:
+            query: User query
+            passages: Candidate passages, each with a 'text'
+            top_k: Maximum number of passages to return (all if None)
+
+        Returns:
+            Copies of the best passages, best first, with 'rerank_score' and
+            'rerank_method' added
+        """
+        if not passages:
+            return []
+
+        method, scores = self.score(query, [passage["text"] for passage in passages])
+
+        order = sorted(range(len(passages)), key=lambda i: (-scores[i], i))
+        if top_k is not None:
+            order = order[:top_k]
+
+        return [
+            dict(passages[i], rerank_score=scores[i], rerank_method=method)
+            for i in order
+        ]
+
+    def score(self, query: str, texts: List[str]) -> "tuple[str, List[float]]":
+        """
+        Score texts against a query with the best available method.
+
+        Args:
+            query: User query
+            texts: Passage texts
+
+        Returns:
+            Tuple of (method name, scores aligned with texts)
+        """
+        if self.uses_cross_encoder:
+            scores = self._score_cached(f"cross-encoder:{self.model_name}", query, texts, self._cross_encoder_scores)
+            if scores is not None:
+                return f"cross-encoder:{self.model_name}", scores
+
+        if self.embedding_function is not None:
+            scores = self._score_cached("embedding-cosine", query, texts, self._cosine_scores)
+            if scores is not None:
+                return "embedding-cosine", scores
+
+        # BM25 statistics depend on the whole candidate set, so these are not cached
+        return "lexical", self._lexical_scores(query, texts)
+
+    def _score_cached(self, method: str, query: str, texts: List[str],
+                      compute: Callable[[str, List[str]], List[float]]) -> Optional[List[float]]:
+        """
+        Look up cached scores and compute the missing ones in one batch.
+
+        Returns:
+            Scores aligned with texts, or None if the method failed
+        """
+        normalized_query = " ".join(query.lower().split())
+        keys = [
+            hashlib.sha256(f"{method}\0{normalized_query}\0{text}".encode('utf-8')).hexdigest()
+            for text in texts
+        ]
+
+        scores: List[Optional[float]] = []
+        for key in keys:
+            cached = self._scores.get(key)
+            scores.append(cached["data"] if cached else None)
+
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            try:
+                computed = compute(query, [texts[i] for i in missing])
+            except Exception as e:
+                logger.error(f"Error scoring passages with {method}: {str(e)}")
+                return None
+
+            now = time.time()
+            for i, score in zip(missing, computed):
+                scores[i] = float(score)
+                self._scores.set(keys[i], {
+                    "data": scores[i],
+                    "cached_at": now,
+                    "expires_at": math.inf
+                }, _SCORE_ENTRY_BYTES)
+
+        return scores
+
+    def _cross_encoder_scores(self, query: str, texts: List[str]) -> List[float]:
+        """Score (query, text) pairs with the cross-encoder, loading it on first use."""
+        model = self._load_cross_encoder()
+        if model is None:
+            raise RuntimeError(f"cross-encoder {self.model_name} is unavailable")
+        return [float(score) for score in model.predict([(query, text) for text in texts])]
+
+    def _load_cross_encoder(self):
+        """Load the cross-encoder once; a failure disables it for this process."""
+        with self._load_lock:
+            if self._cross_encoder is None and not self._cross_encoder_failed:
+                try:
+                    self._cross_encoder = CrossEncoder(self.model_name)
+                    logger.info(f"Loaded reranker model {self.model_name}")
+                except Exception as e:
+                    logger.error(f"Error loading reranker model {self.model_name}, using embedding cosine: {str(e)}")
+                    self._cross_encoder_failed = True
+            return self._cross_encoder
+
+    def _cosine_scores(self, query: str, texts: List[str]) -> List[float]:
+        """Cosine similarity between the query embedding and each text embedding."""
+        query_vector = [float(x) for x in self.query_embedder([query])[0]]
+        query_norm = math.sqrt(sum(x * x for x in query_vector)) or 1.0
+
+        scores = []
+        for vector in self.embedding_function(texts):
+            vector = [float(x) for x in vector]
+            norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+            scores.append(sum(a * b for a, b in zip(query_vector, vector)) / (query_norm * norm))
+        return scores
+
+    @staticmethod
+    def _lexical_scores(query: str, texts: List[str]) -> List[float]:
+        """BM25 scores of the texts as a corpus of their own."""
+        index = BM25Index()
+        ids = [str(i) for i in range(len(texts))]
+        index.add(ids, texts, [{} for _ in texts])
+        scores = dict(index.search(query, k=len(texts)))
+        return [scores.get(doc_id, 0.0) for doc_id in ids]
@@ -0,0 +1,248 @@
+"""
+Semantic cache of Groq completions, keyed on the meaning of the question
+"""
+import math
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+import config
+from ai.chunking import default_chunker
+from ai.embedding_cache import query_embedding_cache
+
+try:
+    from chromadb.utils import embedding_functions
+except ImportError:
+    embedding_functions = None
+
+logger = logging.getLogger(__name__)
+
+# Longest question compared semantically; the default embedding model
+# (all-MiniLM-L6-v2) ignores everything after its first 256 tokens
+MAX_QUERY_TOKENS = 256
+
+class SemanticResponseCache:
+    """
+    Index of earlier completions by the embedding of their question.
+
+    A completion is reused for a new question when the cosine similarity of
+    the two questions reaches the threshold for the call's task and both
+    calls share a scope: the same task, prompt template, model and sampling
+    parameters, and time bucket. The completions themselves stay in the
+    response cache under their exact keys; this index only maps questions
+    to those keys, so cache TTLs and eviction apply unchanged. Tasks without
+    a threshold are never served semantically.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, thresholds: Optional[Dict[str, float]] = None,
+                 bucket_seconds: Optional[int] = None, max_entries: Optional[int] = None,
+                 embedding_function=None):
+        """
+        Initialize the cache.
+
+        Args:
+            enabled: Whether semantic lookups are made (defaults to config setting)
+            thresholds: Minimum cosine similarity per task (defaults to config setting)
+            bucket_seconds: Length of the time buckets scoping reuse (defaults to config setting)
+            max_entries: Maximum number of indexed questions (defaults to config setting)
+            embedding_function: Function mapping a list of texts to embedding vectors
+                                (defaults to ChromaDB's default model, loaded on first use)
+        """
+        self.enabled = config.SEMANTIC_CACHE_ENABLED if enabled is None else enabled
+        self.thresholds = dict(config.SEMANTIC_CACHE_THRESHOLDS if thresholds is None else thresholds)
+        self.bucket_seconds = max(1, config.SEMANTIC_CACHE_BUCKET_SECONDS if bucket_seconds is None else bucket_seconds)
+        self.max_entries = config.SEMANTIC_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+
+        self._embedding_function = embedding_function
+        self._embedding_failed = False
+        # scope -> list of (unit vector, response cache key), oldest scope first
+        self._scopes: "OrderedDict[str, List[Tuple[List[float], str]]]" = OrderedDict()
+        self._entries = 0
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def applies_to(self, task: Optional[str]) -> bool:
+        """Whether calls of a task are looked up semantically."""
+        return self.enabled and task in self.thresholds and not self._embedding_failed
+
+    def scope(self, task: str, template: str, model_name: str, temperature: float,
+              max_tokens: int, now: float) -> str:
+        """
+        Scope within which completions may be reused.
+
+        Args:
+            task: Task of the call
+            template: Identifier of the prompt template
+            model_name: Model used
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens generated
+            now: Time of the call
+
+        Returns:
+            Scope string, ending with the time bucket
+        """
+        bucket = int(now // self.bucket_seconds)
+        return f"{task}\0{template}\0{model_name}\0{temperature}\0{max_tokens}\0{bucket}"
+
+    def lookup(self, task: str, scope: str, query: str, fetch) -> Optional[Dict[str, Any]]:
+        """
+        Find the cached completion of the most similar earlier question.
+
+        Args:
+            task: Task of the call, selecting the threshold
+            scope: Scope of the call, from the caller's template, model and time bucket
+            query: Question to match
+            fetch: Function returning the cached response for a response cache key, or None
+
+        Returns:
+            Cached response, or None on a miss
+        """
+        vector = self._embed(task, query)
+        if vector is None:
+            return None
+
+        with self._lock:
+            candidates = list(self._scopes.get(scope, []))
+
+        threshold = self.thresholds[task]
+        for similarity, cache_key in sorted(
+            ((sum(a * b for a, b in zip(vector, other)), cache_key) for other, cache_key in candidates),
+            reverse=True
+        ):
+            if similarity < threshold:
+                break
+            response = fetch(cache_key)
+            if response is not None:
+                self._count(task, "hits")
+                logger.info(f"Semantic cache hit for {task} (similarity {similarity:.3f})")
+                return response
+            # The response was evicted or expired; forget it
+            self._forget(scope, cache_key)
+
+        self._count(task, "misses")
+        return None
+
+    def add(self, task: str, scope: str, query: str, cache_key: str) -> None:
+        """
+        Index a question whose completion is cached under cache_key.
+
+        Args:
+            task: Task of the call
+            scope: Scope of the call
+            query: Question that was answered
+            cache_key: Response cache key of the completion
+        """
+        vector = self._embed(task, query, count_skips=False)
+        if vector is None:
+            return
+
+        with self._lock:
+            entries = self._scopes.setdefault(scope, [])
+            if any(key == cache_key for _, key in entries):
+                return
+            entries.append((vector, cache_key))
+            self._scopes.move_to_end(scope)
+            self._entries += 1
+
+            # Scopes of past time buckets are never matched again
+            current = scope.rsplit("\0", 1)[-1]
+            for old_scope in [s for s in self._scopes if s.rsplit("\0", 1)[-1] != current]:
+                self._entries -= len(self._scopes.pop(old_scope))
+
+            while self._entries > self.max_entries and self._scopes:
+                oldest_scope, oldest = next(iter(self._scopes.items()))
+                oldest.pop(0)
+                self._entries -= 1
+                if not oldest:
+                    del self._scopes[oldest_scope]
+
+        self._count(task, "stores")
+
+    def _forget(self, scope: str, cache_key: str) -> None:
+        """Drop an indexed question whose response is gone."""
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries is None:
+                return
+            kept = [entry for entry in entries if entry[1] != cache_key]
+            self._entries -= len(entries) - len(kept)
+            if kept:
+                self._scopes[scope] = kept
+            else:
+                del self._scopes[scope]
+
+    def _embed(self, task: str, query: str, count_skips: bool = True) -> Optional[List[float]]:
+        """
+        Embed a question as a unit vector through the query embedding cache.
+
+        Returns:
+            Vector, or None if the question is too long or no model is available
+        """
+        if default_chunker.counter.count(query) > MAX_QUERY_TOKENS:
+            if count_skips:
+                self._count(task, "skipped")
+            return None
+
+        embedding_function = self._get_embedding_function()
+        if embedding_function is None:
+            if count_skips:
+                self._count(task, "skipped")
+            return None
+
+        try:
+            model_id = getattr(embedding_function, "MODEL_NAME", type(embedding_function).__name__)
+            vector = query_embedding_cache.embed(embedding_function, model_id, [query])[0]
+        except Exception as e:
+            logger.error(f"Error embedding question for the semantic cache: {str(e)}")
+            if count_skips:
+                self._count(task, "skipped")
+            return None
+
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def _get_embedding_function(self):
+        """Load the embedding model once; a failure disables semantic lookups."""
+        with self._lock:
+            if self._embedding_function is None and not self._embedding_failed:
+                try:
+                    if embedding_functions is None:
+                        raise ImportError("chromadb is not installed")
+                    self._embedding_function = embedding_functions.DefaultEmbeddingFunction()
+                except Exception as e:
+                    logger.error(f"Semantic response cache disabled, no embedding model: {str(e)}")
+                    self._embedding_failed = True
+            return self._embedding_function
+
+    def _count(self, task: str, counter: str) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(task, {"hits": 0, "misses": 0, "stores": 0, "skipped": 0})
+            stats[counter] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hit and miss counts per task.
+
+        Returns:
+            Dictionary with 'enabled', 'entries', 'thresholds' and per-task
+            'hits', 'misses', 'stores', 'skipped' and 'hit_rate'
+        """
+        with self._lock:
+            tasks = {task: dict(stats) for task, stats in self._stats.items()}
+            entries = self._entries
+
+        for stats in tasks.values():
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+
+        return {
+            "enabled": self.enabled and not self._embedding_failed,
+            "entries": entries,
+            "thresholds": self.thresholds,
+            "tasks": tasks
+        }
+
+
+# Create a global semantic response cache shared by every GroqClient
+semantic_response_cache = SemanticResponseCache()
@@ -0,0 +1,519 @@
+"""
+Vector stores for book chunk embeddings: ChromaDB or a memory-mapped NumPy matrix
+"""
+import os
+import json
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Callable
+from pathlib import Path
+
+import config
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import chromadb
+except ImportError:
+    chromadb = None
+
+logger = logging.getLogger(__name__)
+
+# Single ChromaDB collection holding the chunks of every book, filtered by book_id metadata
+CHROMA_COLLECTION = "financial_books"
+
+# Prefix of the per-book collections used before all books shared one collection
+LEGACY_COLLECTION_PREFIX = "book_"
+
+# Records per ChromaDB write when the client cannot report its limit
+CHROMA_MAX_BATCH = 5000
+
+# Rows scored per matrix product in the NumPy store, bounding temporary memory
+QUERY_BLOCK_ROWS = 65536
+
+class VectorStore:
+    """
+    Interface of a store of embedded chunks. Every chunk has an id, its text
+    and metadata including 'book_id'; queries return the chunks most similar
+    to the query text by cosine similarity.
+    """
+
+    # Backend name, used in config and in the RAG index version
+    name = "base"
+
+    # File in the embeddings directory recording what this store has indexed
+    manifest_name = "index_manifest.json"
+
+    def open(self) -> bool:
+        """
+        Open the store, creating it if needed.
+
+        Returns:
+            True if the store can be used
+        """
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """Number of chunks in the store."""
+        raise NotImplementedError
+
+    def ids_for_book(self, book_id: str) -> List[str]:
+        """Ids of all chunks of a book."""
+        raise NotImplementedError
+
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]],
+               embeddings: Optional[List[Any]] = None) -> None:
+        """Store chunks, replacing any with the same ids; documents are embedded unless embeddings are given."""
+        raise NotImplementedError
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Replace the metadata of stored chunks without re-embedding them."""
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]) -> None:
+        """Delete chunks by id."""
+        raise NotImplementedError
+
+    def delete_book(self, book_id: str) -> None:
+        """Delete all chunks of a book."""
+        self.delete(self.ids_for_book(book_id))
+
+    def reset(self) -> None:
+        """Delete every chunk."""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Persist pending changes. Stores that write through need not override this."""
+
+    def query(self, query_embedding: List[float], n_results: int, book_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Find the chunks most similar to a query.
+
+        Args:
+            query_embedding: Embedding of the query text
+            n_results: Maximum number of chunks to return
+            book_id: Optional book to restrict the search to
+
+        Returns:
+            Chunks as dictionaries with 'id', 'text', 'metadata' and
+            'similarity' (cosine), most similar first
+        """
+        return self.query_many([query_embedding], n_results, book_id=book_id)[0]
+
+    def query_many(self, query_embeddings: List[List[float]], n_results: int,
+                   book_id: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Find the chunks most similar to each of several queries in one pass.
+
+        Args:
+            query_embeddings: Embeddings of the query texts
+            n_results: Maximum number of chunks to return per query
+            book_id: Optional book to restrict the search to
+
+        Returns:
+            One result list per query, as returned by query()
+        """
+        raise NotImplementedError
+
+
+class ChromaVectorStore(VectorStore):
+    """Chunks in a persistent ChromaDB collection with an HNSW cosine index."""
+
+    name = "chroma"
+    manifest_name = "index_manifest.json"
+
+    def __init__(self, directory: Path, embedding_function: Callable[[List[str]], Any],
+                 collection_name: str = CHROMA_COLLECTION):
+        """
+        Initialize the store.
+
+        Args:
+            directory: Embeddings directory; the database lives in its chroma_db subdirectory
+            embedding_function: ChromaDB embedding function
+            collection_name: Collection holding the chunks
+        """
+        self.persist_dir = Path(directory) / "chroma_db"
+        self.embedding_function = embedding_function
+        self.collection_name = collection_name
+        self.client = None
+        self._collection = None
+
+    def open(self) -> bool:
+        if self._collection is not None:
+            return True
+
+        if chromadb is None:
+            logger.error("chromadb is not installed; the chroma vector store is unavailable")
+            return False
+
+        try:
+            if self.client is None:
+                self.client = chromadb.PersistentClient(path=str(self.persist_dir))
+            self._collection = self.client.get_or_create_collection(
+                name=self.collection_name,
+                embedding_function=self.embedding_function,
+                # Cosine distance, so 1 - distance is the cosine similarity
+                metadata={"hnsw:space": "cosine"}
+            )
+        except Exception as e:
+            logger.error(f"Error opening ChromaDB collection {self.collection_name}: {e}")
+            return False
+
+        self._drop_legacy_collections()
+        return True
+
+    def _drop_legacy_collections(self) -> None:
+        """Delete the per-book collections used before all books shared one collection."""
+        try:
+            for name in self._collection_names():
+                if name.startswith(LEGACY_COLLECTION_PREFIX):
+                    self.client.delete_collection(name)
+                    logger.info(f"Removed legacy ChromaDB collection {name}")
+        except Exception as e:
+            logger.warning(f"Error removing legacy ChromaDB collections: {e}")
+
+    def _collection_names(self) -> List[str]:
+        """Names of the client's collections; chromadb 0.6 lists names, other releases Collection objects."""
+        return [getattr(collection, "name", collection) for collection in self.client.list_collections()]
+
+    def count(self) -> int:
+        return self._collection.count() if self.open() else 0
+
+    def ids_for_book(self, book_id: str) -> List[str]:
+        return self._collection.get(where={"book_id": book_id}, include=[])["ids"]
+
+    def _batches(self, count: int) -> List[slice]:
+        """Slices of at most the client's maximum batch size covering count items."""
+        try:
+            size = self.client.get_max_batch_size()
+        except Exception:
+            size = CHROMA_MAX_BATCH
+        return [slice(start, start + size) for start in range(0, count, size)]
+
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]],
+               embeddings: Optional[List[Any]] = None) -> None:
+        for batch in self._batches(len(ids)):
+            self._collection.upsert(
+                ids=ids[batch],
+                documents=documents[batch],
+                metadatas=metadatas[batch],
+                embeddings=None if embeddings is None else [[float(x) for x in vector] for vector in embeddings[batch]]
+            )
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        for batch in self._batches(len(ids)):
+            self._collection.update(ids=ids[batch], metadatas=metadatas[batch])
+
+    def delete(self, ids: List[str]) -> None:
+        if ids:
+            self._collection.delete(ids=ids)
+
+    def delete_book(self, book_id: str) -> None:
+        self._collection.delete(where={"book_id": book_id})
+
+    def reset(self) -> None:
+        self._collection = None
+        try:
+            if self.client is None and chromadb is not None:
+                self.client = chromadb.PersistentClient(path=str(self.persist_dir))
+            if self.client is not None and self.collection_name in self._collection_names():
+                self.client.delete_collection(self.collection_name)
+        except Exception as e:
+            logger.error(f"Error deleting ChromaDB collection {self.collection_name}: {e}")
+
+    def query_many(self, query_embeddings: List[List[float]], n_results: int,
+                   book_id: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        if not query_embeddings:
+            return []
+        if not self.open() or self._collection.count() == 0:
+            return [[] for _ in query_embeddings]
+
+        results = self._collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where={"book_id": book_id} if book_id else None,
+            include=["documents", "metadatas", "distances"]
+        )
+
+        all_chunks = []
+        for q in range(len(query_embeddings)):
+            chunks = []
+            for chunk_id, text, metadata, distance in zip(
+                results["ids"][q],
+                results["documents"][q],
+                results["metadatas"][q],
+                results["distances"][q]
+            ):
+                chunks.append({
+                    "id": chunk_id,
+                    "text": text,
+                    "metadata": metadata,
+                    "similarity": 1.0 - min(distance, 1.0)
+                })
+            all_chunks.append(chunks)
+        return all_chunks
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Chunks as rows of a normalized embedding matrix in a .npy file, memory-
+    mapped for queries, with ids, texts and metadata in a JSON sidecar.
+    Queries are exact: a blocked matrix-vector product over all rows (or the
+    rows of one book). Opening costs one small JSON read, which suits a
+    corpus of a few books far better than a database client.
+
+    Changes are kept in memory and written by flush(), so index one batch of
+    books, then flush once.
+    """
+
+    name = "numpy"
+    manifest_name = "numpy_index_manifest.json"
+
+    def __init__(self, directory: Path, embedding_function: Callable[[List[str]], Any],
+                 dtype: Optional[str] = None):
+        """
+        Initialize the store.
+
+        Args:
+            directory: Embeddings directory; files live in its numpy_store subdirectory
+            embedding_function: Function mapping a list of texts to embedding vectors
+            dtype: Storage dtype, 'float16' or 'float32' (defaults to config setting)
+        """
+        if np is None:
+            raise ImportError("numpy is required for the numpy vector store")
+
+        self.directory = Path(directory) / "numpy_store"
+        self.vectors_path = self.directory / "vectors.npy"
+        self.sidecar_path = self.directory / "chunks.json"
+        self.embedding_function = embedding_function
+        self.dtype = np.dtype(dtype or config.VECTOR_STORE_DTYPE)
+
+        self._vectors = None  # (rows, dim) memmap, or an in-memory array while dirty
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+        self._book_ids = None  # array of book_id per row, for filtered queries
+        self._opened = False
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def open(self) -> bool:
+        with self._lock:
+            if self._opened:
+                return True
+
+            os.makedirs(self.directory, exist_ok=True)
+            try:
+                if self.sidecar_path.exists() and self.vectors_path.exists():
+                    with open(self.sidecar_path, 'r', encoding='utf-8') as f:
+                        sidecar = json.load(f)
+                    vectors = np.load(self.vectors_path, mmap_mode="r")
+                    if vectors.shape[0] != len(sidecar["ids"]):
+                        raise ValueError("vector file does not match its sidecar")
+                    if vectors.dtype != self.dtype:
+                        # Convert instead of re-embedding; the next flush saves the new dtype
+                        logger.info(f"Converting NumPy vector store from {vectors.dtype} to {self.dtype}")
+                        vectors = np.asarray(vectors, dtype=self.dtype)
+                        self._dirty = True
+                    self._set_rows(vectors, sidecar["ids"], sidecar["documents"], sidecar["metadatas"])
+            except (json.JSONDecodeError, KeyError, ValueError, OSError) as e:
+                # Not dirty: the unreadable files are only replaced once rows are
+                # written again, and the index sees the missing books and re-embeds them
+                logger.warning(f"Error loading NumPy vector store, starting empty: {e}")
+                self._set_rows(None, [], [], [])
+
+            self._opened = True
+            return True
+
+    def _set_rows(self, vectors, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Replace all rows; caller must hold the lock."""
+        self._vectors = vectors
+        self._ids = ids
+        self._documents = documents
+        self._metadatas = metadatas
+        self._positions = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        self._book_ids = np.array([metadata.get("book_id", "") for metadata in metadatas], dtype=object)
+
+    def _embed(self, texts: List[str], embeddings: Optional[List[Any]] = None):
+        """Embed texts (or take the given embeddings) as unit-length float32 rows."""
+        vectors = np.asarray(self.embedding_function(texts) if embeddings is None else embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+    def count(self) -> int:
+        self.open()
+        return len(self._ids)
+
+    def ids_for_book(self, book_id: str) -> List[str]:
+        self.open()
+        with self._lock:
+            return [self._ids[i] for i in np.flatnonzero(self._book_ids == book_id)]
+
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]],
+               embeddings: Optional[List[Any]] = None) -> None:
+        self.open()
+        embedded = self._embed(documents, embeddings).astype(self.dtype)
+
+        with self._lock:
+            vectors = np.array(self._vectors) if self._vectors is not None else np.empty((0, embedded.shape[1]), self.dtype)
+            ids_list, documents_list, metadatas_list = list(self._ids), list(self._documents), list(self._metadatas)
+
+            new_rows = []
+            for row, (chunk_id, document, metadata) in enumerate(zip(ids, documents, metadatas)):
+                position = self._positions.get(chunk_id)
+                if position is None:
+                    new_rows.append(row)
+                    ids_list.append(chunk_id)
+                    documents_list.append(document)
+                    metadatas_list.append(metadata)
+                else:
+                    vectors[position] = embedded[row]
+                    documents_list[position] = document
+                    metadatas_list[position] = metadata
+
+            if new_rows:
+                vectors = np.vstack([vectors, embedded[new_rows]])
+
+            self._set_rows(vectors, ids_list, documents_list, metadatas_list)
+            self._dirty = True
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        self.open()
+        with self._lock:
+            metadatas_list = list(self._metadatas)
+            for chunk_id, metadata in zip(ids, metadatas):
+                position = self._positions.get(chunk_id)
+                if position is not None:
+                    metadatas_list[position] = metadata
+            self._set_rows(self._vectors, self._ids, self._documents, metadatas_list)
+            self._dirty = True
+
+    def delete(self, ids: List[str]) -> None:
+        self.open()
+        with self._lock:
+            drop = {self._positions[chunk_id] for chunk_id in ids if chunk_id in self._positions}
+            if not drop:
+                return
+
+            keep = [i for i in range(len(self._ids)) if i not in drop]
+            self._set_rows(
+                np.array(self._vectors[keep]),
+                [self._ids[i] for i in keep],
+                [self._documents[i] for i in keep],
+                [self._metadatas[i] for i in keep]
+            )
+            self._dirty = True
+
+    def reset(self) -> None:
+        with self._lock:
+            self._set_rows(None, [], [], [])
+            self._opened = True
+            self._dirty = True
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+
+            os.makedirs(self.directory, exist_ok=True)
+            try:
+                if self._vectors is None:
+                    for path in (self.vectors_path, self.sidecar_path):
+                        path.unlink(missing_ok=True)
+                else:
+                    tmp_vectors = self.vectors_path.with_suffix(".tmp.npy")
+                    np.save(tmp_vectors, np.ascontiguousarray(self._vectors, dtype=self.dtype))
+                    tmp_sidecar = self.sidecar_path.with_suffix(".tmp")
+                    with open(tmp_sidecar, 'w', encoding='utf-8') as f:
+                        json.dump({
+                            "ids": self._ids,
+                            "documents": self._documents,
+                            "metadatas": self._metadatas
+                        }, f)
+                    os.replace(tmp_vectors, self.vectors_path)
+                    os.replace(tmp_sidecar, self.sidecar_path)
+                    # Serve queries from the page cache instead of private memory
+                    self._vectors = np.load(self.vectors_path, mmap_mode="r")
+                self._dirty = False
+            except OSError as e:
+                logger.error(f"Error saving NumPy vector store: {e}")
+
+    def query_many(self, query_embeddings: List[List[float]], n_results: int,
+                   book_id: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        self.open()
+        with self._lock:
+            vectors, ids, documents, metadatas = self._vectors, self._ids, self._documents, self._metadatas
+            rows = np.flatnonzero(self._book_ids == book_id) if book_id else None
+
+        if not query_embeddings:
+            return []
+        if vectors is None or len(ids) == 0 or (rows is not None and len(rows) == 0):
+            return [[] for _ in query_embeddings]
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1.0, norms)
+
+        # (rows, queries) similarity matrix, one block of rows at a time
+        row_count = len(rows) if rows is not None else vectors.shape[0]
+        scores = np.empty((row_count, len(queries)), dtype=np.float32)
+        for start in range(0, row_count, QUERY_BLOCK_ROWS):
+            end = min(start + QUERY_BLOCK_ROWS, row_count)
+            block = vectors[rows[start:end]] if rows is not None else vectors[start:end]
+            scores[start:end] = block.astype(np.float32) @ queries.T
+
+        k = min(n_results, row_count)
+        all_chunks = []
+        for q in range(len(queries)):
+            column = scores[:, q]
+            top = np.argpartition(-column, k - 1)[:k]
+            # Highest score first; equal scores by row, so results are deterministic
+            top = top[np.lexsort((top, -column[top]))]
+
+            chunks = []
+            for i in top:
+                row = int(rows[i]) if rows is not None else int(i)
+                chunks.append({
+                    "id": ids[row],
+                    "text": documents[row],
+                    "metadata": metadatas[row],
+                    "similarity": float(column[i])
+                })
+            all_chunks.append(chunks)
+        return all_chunks
+
+
+VECTOR_STORES = {
+    ChromaVectorStore.name: ChromaVectorStore,
+    NumpyVectorStore.name: NumpyVectorStore
+}
+
+def create_vector_store(directory: Path, embedding_function: Callable[[List[str]], Any],
+                        backend: Optional[str] = None) -> VectorStore:
+    """
+    Create the configured vector store.
+
+    Args:
+        directory: Embeddings directory
+        embedding_function: Function mapping a list of texts to embedding vectors
+        backend: 'chroma' or 'numpy' (defaults to config setting)
+
+    Returns:
+        Vector store instance (ChromaDB if the requested backend is unknown or unavailable)
+    """
+    backend = backend or config.VECTOR_STORE_BACKEND
+    store_class = VECTOR_STORES.get(backend)
+    if store_class is None:
+        logger.error(f"Unknown vector store backend '{backend}', using {ChromaVectorStore.name}")
+        store_class = ChromaVectorStore
+
+    try:
+        return store_class(directory, embedding_function)
+    except ImportError as e:
+        logger.error(f"Vector store backend '{backend}' is unavailable ({e}), using {ChromaVectorStore.name}")
+        return ChromaVectorStore(directory, embedding_function)
@@ -0,0 +1,173 @@
+"""
+Benchmark the vector store backends on the book corpus
+
+    python -m ai.vector_store_benchmark
+    python -m ai.vector_store_benchmark --backends numpy --k 5 --repeats 50
+
+Every backend indexes the same chunks into a temporary directory and answers
+the same queries. Embeddings are computed once up front and shared, so the
+timings measure the stores themselves: building, opening (what a restart
+pays) and querying. Recall@k is measured against an exact float32 search.
+"""
+import json
+import time
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from ai.chunking import default_chunker
+from ai.vector_store import VECTOR_STORES, create_vector_store
+
+DEFAULT_QUERIES = [
+    "What is a margin of safety?",
+    "How should I think about risk and luck?",
+    "What role does SEBI play in the Indian capital market?",
+    "Why do the rich not work for money?",
+    "How do mutual funds work in India?",
+    "When should I sell a stock?",
+    "What is the difference between an asset and a liability?",
+    "How does compounding build wealth over time?"
+]
+
+class CachedEmbedding:
+    """Embedding function that computes each text once and serves repeats from memory."""
+
+    def __init__(self, embedding_function):
+        self.embedding_function = embedding_function
+        self.vectors: Dict[str, List[float]] = {}
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        missing = [text for text in dict.fromkeys(input) if text not in self.vectors]
+        if missing:
+            for text, vector in zip(missing, self.embedding_function(missing)):
+                self.vectors[text] = [float(x) for x in vector]
+        return [self.vectors[text] for text in input]
+
+def load_corpus(books_dir: Path) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+    """
+    Chunk every .txt file in a directory the way the RAG index does.
+
+    Returns:
+        Tuple of (chunk ids, chunk texts, chunk metadatas)
+    """
+    ids, texts, metadatas = [], [], []
+    for path in sorted(Path(books_dir).glob("*.txt")):
+        book_id = path.stem
+        for chunk in default_chunker.chunk(path.read_text(encoding='utf-8')):
+            ids.append(f"{book_id}_{chunk['index']}")
+            texts.append(chunk["text"])
+            metadatas.append({"book_id": book_id, "chunk_index": chunk["index"]})
+    return ids, texts, metadatas
+
+def exact_top_k(embedding_function, texts: List[str], ids: List[str], query: str, k: int) -> List[str]:
+    """Ids of the k chunks with the highest cosine similarity, computed exactly."""
+    import numpy as np
+
+    vectors = np.asarray(embedding_function(texts), dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query_vector = np.asarray(embedding_function([query])[0], dtype=np.float32)
+    scores = vectors @ (query_vector / max(np.linalg.norm(query_vector), 1e-12))
+    return [ids[i] for i in np.argsort(-scores, kind="stable")[:k]]
+
+def percentile(values: List[float], share: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+def benchmark_backend(backend: str, directory: Path, embedding_function, corpus, queries: List[str],
+                      k: int, repeats: int, reference: Dict[str, List[str]]) -> Dict[str, Any]:
+    """
+    Build, reopen and query one backend.
+
+    Returns:
+        Timings in milliseconds and recall@k against the reference results
+    """
+    ids, texts, metadatas = corpus
+
+    started = time.perf_counter()
+    store = create_vector_store(directory, embedding_function, backend=backend)
+    store.reset()
+    store.open()
+    for start in range(0, len(ids), 100):
+        store.upsert(ids[start:start + 100], texts[start:start + 100], metadatas[start:start + 100])
+    store.flush()
+    build_ms = (time.perf_counter() - started) * 1000
+
+    # A fresh instance pays what a restart pays
+    started = time.perf_counter()
+    store = create_vector_store(directory, embedding_function, backend=backend)
+    store.open()
+    store.count()
+    open_ms = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    recalls = []
+    for query in queries:
+        query_embedding = embedding_function([query])[0]
+        for _ in range(repeats):
+            started = time.perf_counter()
+            results = store.query(query_embedding, k)
+            latencies.append((time.perf_counter() - started) * 1000)
+        found = {chunk["id"] for chunk in results}
+        recalls.append(len(found & set(reference[query])) / max(1, len(reference[query])))
+
+    # All queries in one call, as a request with several questions issues them
+    query_embeddings = embedding_function(queries)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        store.query_many(query_embeddings, k)
+    batch_ms = (time.perf_counter() - started) * 1000 / repeats
+
+    return {
+        "backend": store.name,
+        "chunks": store.count(),
+        "build_ms": round(build_ms, 1),
+        "open_ms": round(open_ms, 2),
+        "query_p50_ms": round(percentile(latencies, 0.5), 3),
+        "query_p95_ms": round(percentile(latencies, 0.95), 3),
+        "query_mean_ms": round(statistics.mean(latencies), 3),
+        f"batch_of_{len(queries)}_ms": round(batch_ms, 3),
+        f"recall@{k}": round(statistics.mean(recalls), 3)
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Compare vector store backends on the book corpus.")
+    parser.add_argument("--books-dir", default="data/books", help="Directory of book .txt files")
+    parser.add_argument("--backends", nargs="+", choices=sorted(VECTOR_STORES), default=sorted(VECTOR_STORES))
+    parser.add_argument("--queries", nargs="+", default=DEFAULT_QUERIES, help="Queries to time")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--repeats", type=int, default=20, help="Times each query is run")
+    args = parser.parse_args(argv)
+
+    from chromadb.utils import embedding_functions
+    embedding_function = CachedEmbedding(embedding_functions.DefaultEmbeddingFunction())
+
+    corpus = load_corpus(Path(args.books_dir))
+    ids, texts, _ = corpus
+    if not ids:
+        parser.error(f"no .txt books found in {args.books_dir}")
+
+    # Embed everything once so no backend pays for the model
+    started = time.perf_counter()
+    embedding_function(texts + args.queries)
+    print(f"Embedded {len(texts)} chunks and {len(args.queries)} queries in {time.perf_counter() - started:.1f}s")
+
+    reference = {query: exact_top_k(embedding_function, texts, ids, query, args.k) for query in args.queries}
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            results.append(benchmark_backend(
+                backend, Path(tmp) / backend, embedding_function, corpus,
+                args.queries, args.k, args.repeats, reference
+            ))
+
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
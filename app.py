@@ -1,7 +1,8 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, Response, stream_with_context
 import os
 import sys
 import json
+import hmac
 import markdown
 import logging
 import traceback
@@ -13,11 +14,20 @@ from data_sources.news_extractor import news_extractor
 from data_sources.stock_data import stock_data
 from ai.groq_client import GroqClient
 groq_client = GroqClient()
-from ai.rag_system import rag_system, initialize_rag_system
-from ai.financial_agent import financial_agent
+from ai.rag_system import initialize_rag_system
+from ai.financial_agent import financial_agent, ANSWER_MODES
+from ai.embedding_cache import query_embedding_cache
+from ai.semantic_cache import semantic_response_cache
+from ai.model_router import model_router
+from utils.cache_manager import cache_manager
+from utils.cache_warmer import cache_warmer
 
-# Initialize RAG system
-initialize_rag_system()
+# Initialize RAG system; ai.rag_system.rag_system is None until this runs
+rag_system = initialize_rag_system()
+
+# Prefetch market data, news and book summaries ahead of the first users each trading day
+if config.CACHE_WARM_SCHEDULE_ENABLED:
+    cache_warmer.start_scheduler()
 
 # Set up Flask app
 app = Flask(__name__)
@@ -43,6 +53,39 @@ try:
 except Exception as e:
     logger.warning(f"Could not connect to MongoDB: {str(e)}")
 
+def _sse_response(events, on_done=None):
+    """
+    Stream (event, data) pairs from a generator to the browser as
+    server-sent events, each data payload encoded as JSON.
+    
+    Args:
+        events: Generator of (event name, JSON-serializable data)
+        on_done: Called with the data of the 'done' event before it is sent;
+                 errors are logged and the event is still sent
+        
+    Returns:
+        Flask response with a text/event-stream body
+    """
+    def generate():
+        try:
+            for event, data in events:
+                if event == "done" and on_done is not None:
+                    # The result is complete; a failure to store it must not replace it
+                    try:
+                        on_done(data)
+                    except Exception as e:
+                        logger.error(f"Error handling completed stream: {str(e)}")
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming response: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'message': str(e)})}\n\n"
+        finally:
+            # Closes the LLM stream too when the browser disconnects
+            events.close()
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # Main routes
 @app.route('/')
 def index():
@@ -186,6 +229,18 @@ def analyze_market():
         logger.error(f"Error analyzing market: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+def _save_stock_analysis(symbol, analysis, user_id):
+    """Store a stock analysis in the database if available."""
+    if db.connected:
+        analysis_data = {
+            "analysis_type": "stock_analysis",
+            "symbol": symbol,
+            "content": analysis,
+            "timestamp": datetime.now(),
+            "user_id": user_id
+        }
+        db.save_analysis_result(analysis_data)
+
 @app.route('/api/analyze/stock', methods=['POST'])
 def analyze_stock():
     """Generate stock analysis using the financial agent."""
@@ -199,22 +254,33 @@ def analyze_stock():
         
         analysis = financial_agent.stock_analysis(symbol, company_name)
         
-        # Store analysis in database if available
-        if db.connected:
-            analysis_data = {
-                "analysis_type": "stock_analysis",
-                "symbol": symbol,
-                "content": analysis,
-                "timestamp": datetime.now(),
-                "user_id": session.get("user_id")
-            }
-            db.save_analysis_result(analysis_data)
+        _save_stock_analysis(symbol, analysis, session.get("user_id"))
         
         return jsonify({"status": "success", "data": analysis})
     except Exception as e:
         logger.error(f"Error analyzing stock: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/analyze/stock/stream', methods=['POST'])
+def analyze_stock_stream():
+    """Stream a stock analysis from the financial agent as server-sent events."""
+    try:
+        data = request.get_json()
+        if not data or 'symbol' not in data:
+            return jsonify({"status": "error", "message": "Symbol is required"}), 400
+        
+        symbol = data['symbol']
+        company_name = data.get('company_name')
+        user_id = session.get("user_id")
+        
+        return _sse_response(
+            financial_agent.stock_analysis_stream(symbol, company_name),
+            on_done=lambda analysis: _save_stock_analysis(symbol, analysis, user_id)
+        )
+    except Exception as e:
+        logger.error(f"Error streaming stock analysis: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 @app.route('/api/advice', methods=['POST'])
 def get_investment_advice():
     """Generate personalized investment advice."""
@@ -280,6 +346,22 @@ def get_book_insights():
         logger.error(f"Error getting book insights: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/books/insights/stream', methods=['POST'])
+def stream_book_insights():
+    """Stream insights from financial books based on a query as server-sent events."""
+    try:
+        data = request.get_json()
+        if not data or 'query' not in data:
+            return jsonify({"status": "error", "message": "Query is required"}), 400
+        
+        query = data['query']
+        book_id = data.get('book_id')  # Optional
+        
+        return _sse_response(rag_system.generate_book_insight_stream(query, book_id))
+    except Exception as e:
+        logger.error(f"Error streaming book insights: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 @app.route('/api/answer', methods=['POST'])
 def answer_question():
     """Answer a financial question using the financial agent."""
@@ -289,13 +371,35 @@ def answer_question():
             return jsonify({"status": "error", "message": "Question is required"}), 400
         
         question = data['question']
-        answer = financial_agent.answer_financial_question(question)
+        mode = data.get('mode') or request.args.get('mode')
+        if mode and mode not in ANSWER_MODES:
+            return jsonify({"status": "error", "message": f"mode must be one of: {', '.join(ANSWER_MODES)}"}), 400
+        
+        answer = financial_agent.answer_financial_question(question, mode=mode)
         
         return jsonify({"status": "success", "data": answer})
     except Exception as e:
         logger.error(f"Error answering question: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/answer/stream', methods=['POST'])
+def answer_question_stream():
+    """Stream an answer to a financial question as server-sent events."""
+    try:
+        data = request.get_json()
+        if not data or 'question' not in data:
+            return jsonify({"status": "error", "message": "Question is required"}), 400
+        
+        question = data['question']
+        mode = data.get('mode') or request.args.get('mode')
+        if mode and mode not in ANSWER_MODES:
+            return jsonify({"status": "error", "message": f"mode must be one of: {', '.join(ANSWER_MODES)}"}), 400
+        
+        return _sse_response(financial_agent.answer_financial_question_stream(question, mode=mode))
+    except Exception as e:
+        logger.error(f"Error streaming answer: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 # API endpoints for portfolio management
 @app.route('/api/portfolio', methods=['GET', 'POST'])
 def manage_portfolio():
@@ -347,6 +451,44 @@ def analyze_portfolio():
         logger.error(f"Error analyzing portfolio: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+# Admin endpoints
+def _admin_authorized() -> bool:
+    """Check the X-Admin-Token header; admin endpoints are disabled unless a token is configured."""
+    if not config.ADMIN_API_TOKEN:
+        return False
+    token = request.headers.get("X-Admin-Token", "")
+    return hmac.compare_digest(token, config.ADMIN_API_TOKEN)
+
+@app.route('/api/admin/cache')
+def admin_cache_stats():
+    """Get per-namespace and per-tier cache statistics, query embedding and semantic cache statistics and API quota usage."""
+    if not _admin_authorized():
+        return jsonify({"status": "error", "message": "Admin API disabled or invalid admin token"}), 403
+    
+    try:
+        data = {
+            "cache": cache_manager.get_cache_stats(),
+            "api_usage": cache_manager.get_api_usage_stats(),
+            "query_embeddings": query_embedding_cache.get_stats(),
+            "semantic_responses": semantic_response_cache.get_stats()
+        }
+        return jsonify({"status": "success", "data": data})
+    except Exception as e:
+        logger.error(f"Error getting cache stats: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/api/admin/models')
+def admin_model_stats():
+    """Get the model route for each LLM task with per-model latency and error statistics."""
+    if not _admin_authorized():
+        return jsonify({"status": "error", "message": "Admin API disabled or invalid admin token"}), 403
+    
+    try:
+        return jsonify({"status": "success", "data": model_router.get_stats()})
+    except Exception as e:
+        logger.error(f"Error getting model router stats: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -36,18 +36,138 @@ DATABASE_URL = os.environ.get("DATABASE_URL")
 LLM_MODEL = os.environ.get("LLM_MODEL", "llama3-70b-8192")
 LLM_TEMPERATURE = float(os.environ.get("LLM_TEMPERATURE", "0.5"))
 LLM_MAX_TOKENS = int(os.environ.get("LLM_MAX_TOKENS", "4096"))
+ANSWER_MODE = os.environ.get("ANSWER_MODE", "single_pass")  # Default for /api/answer: "single_pass" (one LLM call) or "multi_stage" (three)
+
+# Model routing: each task tries its models in order, falling back to the next on errors or
+# rate limits. An attempt slower than latency_budget_ms moves on to the next model (the last one
+# is never cut off), and models whose average latency exceeds the budget are tried last.
+# max_tokens caps what callers request. Calls without a task use LLM_MODEL.
+MODEL_ROUTES = {
+    "extraction": {
+        "models": [m.strip() for m in os.environ.get("MODEL_ROUTE_EXTRACTION", "llama3-8b-8192,llama3-70b-8192").split(",") if m.strip()],
+        "latency_budget_ms": int(os.environ.get("MODEL_ROUTE_EXTRACTION_LATENCY_MS", "5000")),
+        "max_tokens": int(os.environ.get("MODEL_ROUTE_EXTRACTION_MAX_TOKENS", "1024"))
+    },
+    "summarization": {
+        "models": [m.strip() for m in os.environ.get("MODEL_ROUTE_SUMMARIZATION", "llama3-8b-8192,llama3-70b-8192").split(",") if m.strip()],
+        "latency_budget_ms": int(os.environ.get("MODEL_ROUTE_SUMMARIZATION_LATENCY_MS", "8000")),
+        "max_tokens": int(os.environ.get("MODEL_ROUTE_SUMMARIZATION_MAX_TOKENS", "1024"))
+    },
+    "analysis": {
+        "models": [m.strip() for m in os.environ.get("MODEL_ROUTE_ANALYSIS", f"{LLM_MODEL},llama3-8b-8192").split(",") if m.strip()],
+        "latency_budget_ms": int(os.environ.get("MODEL_ROUTE_ANALYSIS_LATENCY_MS", "30000")),
+        "max_tokens": int(os.environ.get("MODEL_ROUTE_ANALYSIS_MAX_TOKENS", "2048"))
+    },
+    "advice": {
+        "models": [m.strip() for m in os.environ.get("MODEL_ROUTE_ADVICE", f"{LLM_MODEL},llama3-8b-8192").split(",") if m.strip()],
+        "latency_budget_ms": int(os.environ.get("MODEL_ROUTE_ADVICE_LATENCY_MS", "30000")),
+        "max_tokens": int(os.environ.get("MODEL_ROUTE_ADVICE_MAX_TOKENS", "2048"))
+    }
+}
+MODEL_ROUTER_STATS_PATH = os.environ.get("MODEL_ROUTER_STATS_PATH", str(DATA_DIR / "model_router_stats.json"))  # Latency stats kept across restarts; empty disables
 
 # RAG settings
-EMBEDDING_CHUNK_SIZE = int(os.environ.get("EMBEDDING_CHUNK_SIZE", "1024"))
-EMBEDDING_CHUNK_OVERLAP = int(os.environ.get("EMBEDDING_CHUNK_OVERLAP", "128"))
+EMBEDDING_CHUNK_SIZE = int(os.environ.get("EMBEDDING_CHUNK_SIZE", "256"))  # Tokens per chunk; the default embedding model (all-MiniLM-L6-v2) reads at most 256
+EMBEDDING_CHUNK_OVERLAP = int(os.environ.get("EMBEDDING_CHUNK_OVERLAP", "32"))  # Tokens shared by consecutive chunks (whole sentences only)
+BOOK_SUMMARY_CONCURRENCY = int(os.environ.get("BOOK_SUMMARY_CONCURRENCY", "4"))  # Parallel LLM calls while precomputing book summaries
+BOOK_SUMMARY_REQUESTS_PER_MINUTE = int(os.environ.get("BOOK_SUMMARY_REQUESTS_PER_MINUTE", "20"))  # Stays under the Groq free tier's 30 requests/minute
+BOOK_SUMMARY_SECTION_TOKENS = int(os.environ.get("BOOK_SUMMARY_SECTION_TOKENS", "3000"))  # Book text per summarization prompt
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "0"))  # Processes chunking books during indexing; 0 uses one per CPU
+INGEST_EMBED_BATCH_SIZE = int(os.environ.get("INGEST_EMBED_BATCH_SIZE", "64"))  # Chunks per embedding call during indexing
+INGEST_EMBED_THREADS = int(os.environ.get("INGEST_EMBED_THREADS", "2"))  # Concurrent embedding calls during indexing
+VECTOR_STORE_BACKEND = os.environ.get("VECTOR_STORE_BACKEND", "chroma")  # "chroma" or "numpy" (memory-mapped matrix, fastest for a few books)
+VECTOR_STORE_DTYPE = os.environ.get("VECTOR_STORE_DTYPE", "float16")  # Embedding storage type for the numpy store: float16 or float32
+QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get("QUERY_EMBEDDING_CACHE_SIZE", "2048"))  # Query embeddings kept in memory, shared by all searches
+RERANKER_MODEL = os.environ.get("RERANKER_MODEL", "")  # Optional sentence-transformers cross-encoder, e.g. cross-encoder/ms-marco-MiniLM-L-6-v2; empty reranks by embedding cosine
+RERANKER_CANDIDATES = int(os.environ.get("RERANKER_CANDIDATES", "20"))  # Keyword-matched chunks per book scored by the reranker when the index has no results
+RERANKER_CACHE_SIZE = int(os.environ.get("RERANKER_CACHE_SIZE", "20000"))  # (query, passage) scores kept in memory
 
 # API resource management
 # Rate limiting settings for API calls to avoid exceeding free tier limits
 TAVILY_RATE_LIMIT_PER_DAY = int(os.environ.get("TAVILY_RATE_LIMIT_PER_DAY", "50"))  # Conservative daily limit for Tavily API
 GROQ_RATE_LIMIT_PER_DAY = int(os.environ.get("GROQ_RATE_LIMIT_PER_DAY", "100"))  # Conservative daily limit for Groq API
+GROQ_MAX_CONCURRENT_REQUESTS = int(os.environ.get("GROQ_MAX_CONCURRENT_REQUESTS", "4"))  # Groq calls in flight at once, across all threads
+GROQ_TOKENS_PER_MINUTE = int(os.environ.get("GROQ_TOKENS_PER_MINUTE", "6000"))  # Prompt plus max_tokens budget per minute (Groq free tier for llama3-70b); 0 disables
+API_QUOTA_DB_PATH = os.environ.get("API_QUOTA_DB_PATH", str(DATA_DIR / "api_quota.sqlite3"))  # Shared by all worker processes
 ENABLE_RESPONSE_CACHING = os.environ.get("ENABLE_RESPONSE_CACHING", "True").lower() == "true"
 CACHE_EXPIRY_SECONDS = int(os.environ.get("CACHE_EXPIRY_SECONDS", "3600"))  # Default 1 hour cache for API responses
 CACHE_DIR = os.environ.get("CACHE_DIR", os.path.join(os.path.dirname(__file__), "data", "cache"))
+CACHE_STALE_TTL_SECONDS = int(os.environ.get("CACHE_STALE_TTL_SECONDS", "600"))  # Grace period for serving stale entries while one worker refreshes them
+CACHE_REFRESH_WORKERS = int(os.environ.get("CACHE_REFRESH_WORKERS", "4"))  # Background threads for stale-while-revalidate refreshes
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "json")  # Disk tier storage: "json" (file per key) or "sqlite" (single WAL-mode file)
+CACHE_SQLITE_PATH = os.environ.get("CACHE_SQLITE_PATH")  # Defaults to <CACHE_DIR>/cache.sqlite3
+CACHE_CODEC = os.environ.get("CACHE_CODEC", "auto")  # "auto" (orjson if installed), "json", "orjson" or "msgpack"
+CACHE_COMPRESSION = os.environ.get("CACHE_COMPRESSION", "auto")  # "auto" (zstd if installed, else gzip), "zstd", "gzip" or "none"
+CACHE_COMPRESSION_THRESHOLD = int(os.environ.get("CACHE_COMPRESSION_THRESHOLD", "4096"))  # Only compress entries at least this many bytes
+CACHE_MEMORY_MAX_ENTRIES = int(os.environ.get("CACHE_MEMORY_MAX_ENTRIES", "1024"))  # In-process LRU tier entry limit
+CACHE_MEMORY_MAX_BYTES = int(os.environ.get("CACHE_MEMORY_MAX_BYTES", str(32 * 1024 * 1024)))  # In-process LRU tier size limit
+CACHE_DISK_MAX_BYTES = int(os.environ.get("CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))  # Disk tier size budget
+CACHE_DISK_MAX_FILES = int(os.environ.get("CACHE_DISK_MAX_FILES", "10000"))  # Disk tier entry budget
+CACHE_SWEEP_INTERVAL_SECONDS = int(os.environ.get("CACHE_SWEEP_INTERVAL_SECONDS", "300"))  # Background eviction sweep interval (0 disables)
+
+# Semantic response cache (opt-in): a Groq call whose question is close enough to an
+# earlier one of the same task and prompt template, in the same time bucket, reuses its answer.
+# Thresholds are cosine similarities between the questions; tasks left empty are never reused.
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE_ENABLED", "False").lower() == "true"
+SEMANTIC_CACHE_BUCKET_SECONDS = int(os.environ.get("SEMANTIC_CACHE_BUCKET_SECONDS", "3600"))  # Answers are only reused within the same bucket, as market context changes
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))  # Questions indexed in memory
+SEMANTIC_CACHE_THRESHOLDS = {
+    task: float(threshold) for task, threshold in {
+        "analysis": os.environ.get("SEMANTIC_CACHE_ANALYSIS_THRESHOLD", "0.93"),
+        "advice": os.environ.get("SEMANTIC_CACHE_ADVICE_THRESHOLD", "0.93"),
+        # Texts that differ only in a figure embed almost identically, so these are off by default
+        "summarization": os.environ.get("SEMANTIC_CACHE_SUMMARIZATION_THRESHOLD", ""),
+        "extraction": os.environ.get("SEMANTIC_CACHE_EXTRACTION_THRESHOLD", "")
+    }.items() if threshold
+}
+
+# Cache namespaces, resolved from the key prefix before the first "_" (e.g. "groq_<model>_...").
+# Keys without a declared prefix fall into "default", which uses the global settings above.
+# max_entries/max_bytes bound a namespace's share of the disk tier (0 for no limit);
+# eviction picks what goes first once a namespace is over its limits:
+# "lru" (least recently read), "fifo" (oldest write) or "ttl" (soonest to expire)
+CACHE_NAMESPACES = {
+    "groq": {
+        "ttl": int(os.environ.get("CACHE_GROQ_TTL_SECONDS", str(CACHE_EXPIRY_SECONDS))),
+        "max_entries": int(os.environ.get("CACHE_GROQ_MAX_ENTRIES", "4000")),
+        "max_bytes": int(os.environ.get("CACHE_GROQ_MAX_BYTES", str(96 * 1024 * 1024))),
+        "eviction": os.environ.get("CACHE_GROQ_EVICTION", "lru")
+    },
+    "tavily": {
+        "ttl": int(os.environ.get("CACHE_TAVILY_TTL_SECONDS", str(CACHE_EXPIRY_SECONDS))),
+        "max_entries": int(os.environ.get("CACHE_TAVILY_MAX_ENTRIES", "2000")),
+        "max_bytes": int(os.environ.get("CACHE_TAVILY_MAX_BYTES", str(64 * 1024 * 1024))),
+        "eviction": os.environ.get("CACHE_TAVILY_EVICTION", "lru")
+    },
+    "market": {
+        "ttl": int(os.environ.get("CACHE_MARKET_TTL_SECONDS", str(CACHE_EXPIRY_SECONDS))),
+        "max_entries": int(os.environ.get("CACHE_MARKET_MAX_ENTRIES", "1000")),
+        "max_bytes": int(os.environ.get("CACHE_MARKET_MAX_BYTES", str(16 * 1024 * 1024))),
+        "eviction": os.environ.get("CACHE_MARKET_EVICTION", "ttl")
+    },
+    "rag": {
+        "ttl": int(os.environ.get("CACHE_RAG_TTL_SECONDS", str(7 * 24 * 60 * 60))),
+        "max_entries": int(os.environ.get("CACHE_RAG_MAX_ENTRIES", "2000")),
+        "max_bytes": int(os.environ.get("CACHE_RAG_MAX_BYTES", str(64 * 1024 * 1024))),
+        "eviction": os.environ.get("CACHE_RAG_EVICTION", "lru")
+    }
+}
+ADMIN_API_TOKEN = os.environ.get("ADMIN_API_TOKEN")  # Required as X-Admin-Token on /api/admin/*; the admin endpoints are disabled when unset
+
+# Market calendar settings
+NSE_HOLIDAYS = [d for d in os.environ.get("NSE_HOLIDAYS", "").split(",") if d.strip()]  # Extra exchange holidays as comma-separated YYYY-MM-DD dates
+MARKET_SESSION_CACHE_TTL_SECONDS = int(os.environ.get("MARKET_SESSION_CACHE_TTL_SECONDS", "120"))  # Quote/index cache TTL while NSE is open
+MARKET_CLOSE_GRACE_SECONDS = int(os.environ.get("MARKET_CLOSE_GRACE_SECONDS", "1800"))  # Keep the session TTL this long after the close so closing prices settle
+
+# Cache warm-up settings (python -m utils.cache_warmer, or the in-process scheduler)
+CACHE_WARM_SCHEDULE_ENABLED = os.environ.get("CACHE_WARM_SCHEDULE_ENABLED", "False").lower() == "true"  # Run the warm-up scheduler inside the app process
+CACHE_WARM_TIME = os.environ.get("CACHE_WARM_TIME", "09:16")  # IST time on trading days, just after the open so market data is session-fresh
+CACHE_WARM_SYMBOLS = [s.strip().upper() for s in os.environ.get(
+    "CACHE_WARM_SYMBOLS", "RELIANCE,TCS,HDFCBANK,INFY,ICICIBANK,HINDUNILVR,ITC,SBIN,BHARTIARTL,LT"
+).split(",") if s.strip()]  # Watchlist whose quotes are prefetched
+CACHE_WARM_NEWS_LIMITS = [int(n) for n in os.environ.get("CACHE_WARM_NEWS_LIMITS", "5,10").split(",") if n.strip()]  # Market news page sizes requested by the dashboard and /api/news
+CACHE_WARM_MIN_QUOTA_PERCENT = int(os.environ.get("CACHE_WARM_MIN_QUOTA_PERCENT", "50"))  # Stop spending an API's quota once less than this share of its daily limit is left
+CACHE_WARM_LOCK_PATH = os.environ.get("CACHE_WARM_LOCK_PATH", str(DATA_DIR / "cache_warm_runs.sqlite3"))  # Records claimed warm-up runs so one process per run warms
 
 # Financial book settings
 FINANCIAL_BOOKS = [
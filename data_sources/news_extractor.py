@@ -9,6 +9,8 @@ import hashlib
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Union
 
+import config
+
 # Import cache manager for API usage optimization
 try:
     from utils.cache_manager import cache_manager
@@ -57,15 +59,34 @@ class NewsExtractor:
         # Generate a cache key from the endpoint and params
         cache_key = f"tavily_{endpoint}_{hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()}"
         
-        # Check if we have a cached response
-        if self.caching_enabled:
-            cached_response = cache_manager.get(cache_key)
-            if cached_response:
-                logger.info(f"Using cached response for Tavily API request to {endpoint}")
-                return cached_response
+        if not self.caching_enabled:
+            return self._call_api(endpoint, params)
+        
+        # Concurrent callers for the same query share one upstream request, and an
+        # expired result is served stale while a single worker refreshes it
+        return cache_manager.get_or_compute(
+            cache_key,
+            lambda: self._call_api(endpoint, params, check_rate_limit=True),
+            stale_ttl=config.CACHE_STALE_TTL_SECONDS
+        )
+    
+    def _call_api(self, endpoint: str, params: Dict[str, Any], check_rate_limit: bool = False) -> Dict[str, Any]:
+        """
+        Call the Tavily API without consulting the cache.
+        
+        Args:
+            endpoint: API endpoint
+            params: Request parameters
+            check_rate_limit: Whether to count the call against the daily rate limit
             
-            # Check if we have exceeded the rate limit
-            if not cache_manager.track_api_call("tavily"):
+        Returns:
+            API response as a dictionary
+        """
+        # Reserve quota up front; it is refunded if the request fails
+        reservation = None
+        if check_rate_limit:
+            reservation = cache_manager.reserve_api_call("tavily")
+            if reservation is None:
                 logger.warning("Tavily API daily rate limit exceeded")
                 return {"error": "Daily rate limit for Tavily API exceeded. Try again tomorrow."}
         
@@ -92,13 +113,14 @@ class NewsExtractor:
             response.raise_for_status()
             result = response.json()
             
-            # Cache the successful response
-            if self.caching_enabled and "error" not in result:
-                cache_manager.set(cache_key, result)
+            if reservation is not None:
+                cache_manager.commit_api_call(reservation)
                 
             return result
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, ValueError) as e:
             logger.error(f"Error calling Tavily API: {str(e)}")
+            if reservation is not None:
+                cache_manager.release_api_call(reservation)
             return {"error": str(e)}
         
     def _parse_search_results(self, results: Dict[str, Any]) -> Dict[str, Any]:
@@ -10,7 +10,10 @@ import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Union
-from utils.cache_manager import CacheManager
+
+import config
+from utils.cache_manager import cache_manager
+from utils.market_calendar import market_data_ttl
 
 logger = logging.getLogger(__name__)
 
@@ -22,8 +25,8 @@ class StockData:
         # For Indian stocks, we need to append .NS for NSE stocks
         self.default_exchange = ".NS"
         
-        # Initialize cache manager for Yahoo Finance API calls
-        self.cache = CacheManager(cache_dir="data/cache", enabled=True)
+        # Yahoo Finance responses share the app-wide cache ("market" namespace)
+        self.cache = cache_manager
         
         # Headers to mimic a browser request
         self.headers = {
@@ -50,120 +53,140 @@ class StockData:
             Dictionary with market data
         """
         try:
-            # Check if we have a cached response
-            cache_key = f"market_overview_{datetime.now().strftime('%Y-%m-%d_%H')}"
-            cached_data = self.cache.get(cache_key)
-            if cached_data:
-                return cached_data
-            
-            # Get data for major Indian indices
-            indices_data = []
-            total_volume = 0
-            
-            for name, symbol in self.market_indices.items():
-                # Get the index data from Yahoo Finance
-                index = yf.Ticker(symbol)
-                
-                # Get the current data
-                current_data = index.history(period="2d")
-                
-                if len(current_data) < 2:
-                    logger.warning(f"Insufficient historical data for {name} ({symbol})")
-                    continue
-                
-                # Get the last full trading day data
-                current = current_data.iloc[-1]
-                prev = current_data.iloc[-2]
-                
-                # Calculate changes
-                value = current['Close']
-                prev_close = prev['Close']
-                change = value - prev_close
-                change_percent = (change / prev_close) * 100
-                
-                index_data = {
-                    "name": name,
-                    "value": round(value, 2),
-                    "change": round(change, 2),
-                    "change_percent": round(change_percent, 2),
-                    "high": round(current['High'], 2),
-                    "low": round(current['Low'], 2),
-                    "volume": int(current['Volume']) if not pd.isna(current['Volume']) else 0,
-                    "symbol": symbol
-                }
-                
-                indices_data.append(index_data)
-                total_volume += index_data["volume"]
-            
-            # For advances/declines, we would need additional data sources
-            # Since these aren't readily available from Yahoo Finance, we'll estimate
-            # based on the indices' performance
-            positive_indices = sum(1 for idx in indices_data if idx["change"] > 0)
-            negative_indices = sum(1 for idx in indices_data if idx["change"] < 0)
-            
-            # Approximate market breadth based on our limited data
-            # In a production system, you'd use specific market breadth APIs
-            result = {
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "indices": indices_data,
-                "advances": int(1000 * (positive_indices / len(indices_data))) if indices_data else 0,
-                "declines": int(1000 * (negative_indices / len(indices_data))) if indices_data else 0,
-                "unchanged": int(1000 * ((len(indices_data) - positive_indices - negative_indices) / len(indices_data))) if indices_data else 0,
-                "total_volume": total_volume
-            }
-            
-            # Cache the results for one hour
-            self.cache.set(cache_key, result, ttl=3600)
-            
-            return result
+            # A fixed key lets an expired overview be served stale while a single
+            # worker refetches it, instead of every caller missing at the top of the hour.
+            # Fresh for a couple of minutes during the session, until the next open after it.
+            return self.cache.get_or_compute(
+                "market_overview",
+                self._fetch_market_overview,
+                ttl=market_data_ttl(),
+                stale_ttl=config.CACHE_STALE_TTL_SECONDS
+            )
             
         except Exception as e:
             logger.error(f"Error getting market overview: {str(e)}")
             return {"error": str(e)}
-            
-    def get_sector_performance(self) -> Dict[str, Any]:
+    
+    def _fetch_market_overview(self) -> Dict[str, Any]:
         """
-        Get performance data for market sectors.
+        Fetch the market overview from Yahoo Finance.
         
         Returns:
-            Dictionary with sector performance data
+            Dictionary with market data
         """
-        try:
-            # In a production system, we would make API calls to NSE/BSE APIs
-            # For demo purposes, we'll generate sample data
+        # Get data for major Indian indices
+        indices_data = []
+        total_volume = 0
+        
+        for name, symbol in self.market_indices.items():
+            # Get the index data from Yahoo Finance
+            index = yf.Ticker(symbol)
             
-            # List of Indian market sectors
-            sectors = [
-                "IT", "Banking", "Financial Services", "FMCG", "Pharma", 
-                "Auto", "Metal", "Energy", "Reality", "Media"
-            ]
+            # Get the current data
+            current_data = index.history(period="2d")
             
-            # Generate random performance for each sector
-            sector_data = []
-            for sector in sectors:
-                change = random.uniform(-3, 3)
-                value = random.uniform(10000, 20000)
-                
-                sector_data.append({
-                    "name": sector,
-                    "value": value,
-                    "change": change,
-                    "change_percent": change  # In a real implementation, would calculate properly
-                })
+            if len(current_data) < 2:
+                logger.warning(f"Insufficient historical data for {name} ({symbol})")
+                continue
             
-            # Sort by change (descending) to show best/worst performing
-            sector_data.sort(key=lambda x: x["change"], reverse=True)
+            # Get the last full trading day data
+            current = current_data.iloc[-1]
+            prev = current_data.iloc[-2]
             
-            return {
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "sectors": sector_data,
-                "top_sector": sector_data[0]["name"],
-                "bottom_sector": sector_data[-1]["name"]
+            # Calculate changes
+            value = current['Close']
+            prev_close = prev['Close']
+            change = value - prev_close
+            change_percent = (change / prev_close) * 100
+            
+            index_data = {
+                "name": name,
+                "value": round(value, 2),
+                "change": round(change, 2),
+                "change_percent": round(change_percent, 2),
+                "high": round(current['High'], 2),
+                "low": round(current['Low'], 2),
+                "volume": int(current['Volume']) if not pd.isna(current['Volume']) else 0,
+                "symbol": symbol
             }
             
+            indices_data.append(index_data)
+            total_volume += index_data["volume"]
+        
+        # For advances/declines, we would need additional data sources
+        # Since these aren't readily available from Yahoo Finance, we'll estimate
+        # based on the indices' performance
+        positive_indices = sum(1 for idx in indices_data if idx["change"] > 0)
+        negative_indices = sum(1 for idx in indices_data if idx["change"] < 0)
+        
+        # Approximate market breadth based on our limited data
+        # In a production system, you'd use specific market breadth APIs
+        return {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "indices": indices_data,
+            "advances": int(1000 * (positive_indices / len(indices_data))) if indices_data else 0,
+            "declines": int(1000 * (negative_indices / len(indices_data))) if indices_data else 0,
+            "unchanged": int(1000 * ((len(indices_data) - positive_indices - negative_indices) / len(indices_data))) if indices_data else 0,
+            "total_volume": total_volume
+        }
+            
+    def get_sector_performance(self) -> Dict[str, Any]:
+        """
+        Get performance data for market sectors.
+        
+        Returns:
+            Dictionary with sector performance data
+        """
+        try:
+            return self.cache.get_or_compute(
+                "market_sectors",
+                self._fetch_sector_performance,
+                ttl=market_data_ttl(),
+                stale_ttl=config.CACHE_STALE_TTL_SECONDS
+            )
+            
         except Exception as e:
             logger.error(f"Error getting sector performance: {str(e)}")
             return {"error": str(e)}
+    
+    def _fetch_sector_performance(self) -> Dict[str, Any]:
+        """
+        Fetch performance data for market sectors.
+        
+        Returns:
+            Dictionary with sector performance data
+        """
+        # In a production system, we would make API calls to NSE/BSE APIs
+        # For demo purposes, we'll generate sample data
+        
+        # List of Indian market sectors
+        sectors = [
+            "IT", "Banking", "Financial Services", "FMCG", "Pharma", 
+            "Auto", "Metal", "Energy", "Reality", "Media"
+        ]
+        
+        # Generate random performance for each sector
+        sector_data = []
+        for sector in sectors:
+            change = random.uniform(-3, 3)
+            value = random.uniform(10000, 20000)
+            
+            sector_data.append({
+                "name": sector,
+                "value": value,
+                "change": change,
+                "change_percent": change  # In a real implementation, would calculate properly
+            })
+        
+        # Sort by change (descending) to show best/worst performing
+        sector_data.sort(key=lambda x: x["change"], reverse=True)
+        
+        return {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "sectors": sector_data,
+            "top_sector": sector_data[0]["name"],
+            "bottom_sector": sector_data[-1]["name"]
+        }
             
     def get_stock_price(self, symbol: str) -> Dict[str, Any]:
         """
@@ -179,46 +202,61 @@ class StockData:
             # Normalize symbol (remove NSE/BSE suffixes if present)
             symbol = symbol.split('.')[0].strip().upper()
             
-            # In a production system, we would make API calls to NSE/BSE APIs
-            # For demo purposes, we'll generate sample data
-            
-            # Generate random price data
-            price = random.uniform(500, 2000)
-            prev_close = price - random.uniform(-50, 50)
-            change = price - prev_close
-            change_percent = (change / prev_close) * 100
-            
-            volume = random.randint(100000, 1000000)
-            avg_volume = volume * random.uniform(0.8, 1.2)
-            
-            # Performance for different time periods
-            performance = {
-                "1d": change_percent,
-                "1w": random.uniform(-5, 5),
-                "1m": random.uniform(-10, 10),
-                "3m": random.uniform(-15, 15),
-                "6m": random.uniform(-20, 20),
-                "1y": random.uniform(-30, 30)
-            }
-            
-            return {
-                "symbol": symbol,
-                "price": price,
-                "prev_close": prev_close,
-                "open": prev_close + random.uniform(-10, 10),
-                "high": price + random.uniform(1, 10),
-                "low": price - random.uniform(1, 10),
-                "change": change,
-                "change_percent": change_percent,
-                "volume": volume,
-                "avg_volume": avg_volume,
-                "performance": performance,
-                "date": datetime.now().strftime("%Y-%m-%d")
-            }
+            return self.cache.get_or_compute(
+                f"market_quote_{symbol}",
+                lambda: self._fetch_stock_price(symbol),
+                ttl=market_data_ttl(),
+                stale_ttl=config.CACHE_STALE_TTL_SECONDS
+            )
             
         except Exception as e:
             logger.error(f"Error getting stock price for {symbol}: {str(e)}")
             return {"error": str(e)}
+    
+    def _fetch_stock_price(self, symbol: str) -> Dict[str, Any]:
+        """
+        Fetch current price data for a normalized stock symbol.
+        
+        Args:
+            symbol: Stock symbol without exchange suffix
+            
+        Returns:
+            Dictionary with stock price data
+        """
+        # In a production system, we would make API calls to NSE/BSE APIs
+        # For demo purposes, we'll generate sample data
+        price = random.uniform(500, 2000)
+        prev_close = price - random.uniform(-50, 50)
+        change = price - prev_close
+        change_percent = (change / prev_close) * 100
+        
+        volume = random.randint(100000, 1000000)
+        avg_volume = volume * random.uniform(0.8, 1.2)
+        
+        # Performance for different time periods
+        performance = {
+            "1d": change_percent,
+            "1w": random.uniform(-5, 5),
+            "1m": random.uniform(-10, 10),
+            "3m": random.uniform(-15, 15),
+            "6m": random.uniform(-20, 20),
+            "1y": random.uniform(-30, 30)
+        }
+        
+        return {
+            "symbol": symbol,
+            "price": price,
+            "prev_close": prev_close,
+            "open": prev_close + random.uniform(-10, 10),
+            "high": price + random.uniform(1, 10),
+            "low": price - random.uniform(1, 10),
+            "change": change,
+            "change_percent": change_percent,
+            "volume": volume,
+            "avg_volume": avg_volume,
+            "performance": performance,
+            "date": datetime.now().strftime("%Y-%m-%d")
+        }
             
     def get_company_info(self, symbol: str) -> Dict[str, Any]:
         """
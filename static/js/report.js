@@ -281,32 +281,93 @@ function generateStockAnalysis() {
     
     resultContainer.innerHTML = '<p>Generating stock analysis... Please wait.</p>';
     
-    // Call the stock analysis API
-    fetch('/api/analyze/stock', {
+    // Call the stock analysis API, showing the analysis as it is written
+    let output = null;
+    streamEvents('/api/analyze/stock/stream', {
+        symbol: symbol,
+        company_name: companyName
+    }, {
+        onMeta: meta => {
+            resultContainer.innerHTML = `
+                <h4>AI Analysis for ${meta.company_name || symbol}</h4>
+                <div class="analysis-content">
+                    <p></p>
+                </div>
+            `;
+            output = resultContainer.querySelector('.analysis-content p');
+        },
+        onToken: token => {
+            if (output) output.textContent += token;
+        },
+        onDone: data => {
+            resultContainer.innerHTML = `
+                <h4>AI Analysis for ${data.company_name || symbol}</h4>
+                <div class="analysis-content">
+                    <p>${data.analysis}</p>
+                </div>
+            `;
+        },
+        onError: message => {
+            resultContainer.innerHTML = `<p>Error: ${message || 'Failed to generate analysis'}</p>`;
+        }
+    });
+}
+
+/**
+ * Posts JSON to a server-sent events endpoint and dispatches its events
+ * as they arrive: 'meta' once before the text, 'token' for each piece of
+ * text, then 'done' with the complete result, or 'error'.
+ */
+function streamEvents(url, body, handlers) {
+    const dispatch = (event, data) => {
+        if (event === 'meta' && handlers.onMeta) handlers.onMeta(data);
+        else if (event === 'token' && handlers.onToken) handlers.onToken(data);
+        else if (event === 'done' && handlers.onDone) handlers.onDone(data);
+        else if (event === 'error' && handlers.onError) handlers.onError(data.message);
+    };
+    
+    return fetch(url, {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
         },
-        body: JSON.stringify({
-            symbol: symbol,
-            company_name: companyName
-        })
+        body: JSON.stringify(body)
     })
-        .then(response => response.json())
-        .then(data => {
-            if (data.status === 'success' && data.data) {
-                resultContainer.innerHTML = `
-                    <h4>AI Analysis for ${data.data.company_name || symbol}</h4>
-                    <div class="analysis-content">
-                        <p>${data.data.analysis}</p>
-                    </div>
-                `;
-            } else {
-                resultContainer.innerHTML = `<p>Error: ${data.message || 'Failed to generate analysis'}</p>`;
+        .then(response => {
+            // Requests rejected before streaming starts get a JSON error
+            if (!(response.headers.get('Content-Type') || '').startsWith('text/event-stream')) {
+                return response.json().then(data => dispatch('error', data));
             }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            
+            const read = () => reader.read().then(({ done, value }) => {
+                buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+                
+                // Events are separated by a blank line
+                let end;
+                while ((end = buffer.indexOf('\n\n')) !== -1) {
+                    const block = buffer.slice(0, end);
+                    buffer = buffer.slice(end + 2);
+                    
+                    let event = 'message';
+                    let data = '';
+                    block.split('\n').forEach(line => {
+                        if (line.startsWith('event: ')) event = line.slice(7);
+                        else if (line.startsWith('data: ')) data += line.slice(6);
+                    });
+                    dispatch(event, JSON.parse(data));
+                }
+                
+                if (!done) return read();
+            });
+            
+            return read();
         })
         .catch(error => {
-            resultContainer.innerHTML = `<p>Error: ${error.message}</p>`;
+            dispatch('error', { message: error.message });
         });
 }
 
@@ -387,45 +448,47 @@ function setupBookInsights() {
         
         resultsContainer.innerHTML = '<p>Generating insights... Please wait.</p>';
         
-        // Call the book insights API
-        fetch('/api/books/insights', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
+        // Call the book insights API, showing the insight as it is written
+        let output = null;
+        streamEvents('/api/books/insights/stream', {
+            query: query,
+            book_id: bookId
+        }, {
+            onMeta: () => {
+                resultsContainer.innerHTML = `
+                    <div class="insights-content">
+                        <p></p>
+                    </div>
+                `;
+                output = resultsContainer.querySelector('.insights-content p');
             },
-            body: JSON.stringify({
-                query: query,
-                book_id: bookId
-            })
-        })
-            .then(response => response.json())
-            .then(data => {
-                if (data.status === 'success' && data.data) {
-                    let html = `
-                        <div class="insights-content">
-                            <p>${data.data.insight}</p>
-                        </div>
-                    `;
-                    
-                    if (data.data.sources && data.data.sources.length > 0) {
-                        html += '<div class="insights-sources">';
-                        html += '<h5>Sources</h5>';
-                        html += '<ul>';
-                        data.data.sources.forEach(source => {
-                            html += `<li><strong>${source.book_title}</strong> by ${source.book_author}: "${source.snippet}"</li>`;
-                        });
-                        html += '</ul>';
-                        html += '</div>';
-                    }
-                    
-                    resultsContainer.innerHTML = html;
-                } else {
-                    resultsContainer.innerHTML = `<p>Error: ${data.message || 'Failed to generate insights'}</p>`;
+            onToken: token => {
+                if (output) output.textContent += token;
+            },
+            onDone: data => {
+                let html = `
+                    <div class="insights-content">
+                        <p>${data.insight}</p>
+                    </div>
+                `;
+                
+                if (data.sources && data.sources.length > 0) {
+                    html += '<div class="insights-sources">';
+                    html += '<h5>Sources</h5>';
+                    html += '<ul>';
+                    data.sources.forEach(source => {
+                        html += `<li><strong>${source.book_title}</strong> by ${source.book_author}: "${source.snippet}"</li>`;
+                    });
+                    html += '</ul>';
+                    html += '</div>';
                 }
-            })
-            .catch(error => {
-                resultsContainer.innerHTML = `<p>Error: ${error.message}</p>`;
-            });
+                
+                resultsContainer.innerHTML = html;
+            },
+            onError: message => {
+                resultsContainer.innerHTML = `<p>Error: ${message || 'Failed to generate insights'}</p>`;
+            }
+        });
     });
     
     // Also trigger on Enter key in textarea
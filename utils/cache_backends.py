@@ -0,0 +1,438 @@
+"""
+Storage backends for the disk tier of the cache manager
+"""
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional, List, Tuple
+from pathlib import Path
+
+from utils.memory_cache import entry_deadline
+from utils.cache_codec import CacheCodec
+
+logger = logging.getLogger(__name__)
+
+# Cache entry files are named after the MD5 of their key; other files in the
+# cache directory (API usage, RAG artifacts) are never touched by the sweeper
+CACHE_FILE_PATTERN = re.compile(r"^[0-9a-f]{32}\.json$")
+
+# Namespace of entries written without one (including legacy entries)
+DEFAULT_NAMESPACE = "default"
+
+# Entry field each eviction policy evicts in ascending order of
+EVICTION_ORDER = {
+    "lru": "accessed_at",  # least recently read first
+    "fifo": "created_at",  # oldest write first
+    "ttl": "expires_at"  # soonest to expire first
+}
+
+class CacheBackend:
+    """
+    Base class for disk tier storage.
+
+    Backends store serialized cache entries (bytes) together with their
+    namespace and expiry time, and report enough metadata for the sweeper to
+    enforce per-namespace policies and the overall disk budget.
+    """
+
+    name = "base"
+
+    def read(self, key: str) -> Optional[bytes]:
+        """Return the serialized entry for a key, or None if missing."""
+        raise NotImplementedError
+
+    def write(self, key: str, payload: bytes, expires_at: float, namespace: str = DEFAULT_NAMESPACE) -> None:
+        """
+        Store a serialized entry for a key. expires_at is the time after which
+        the entry may be purged, including any stale-while-revalidate grace.
+        """
+        raise NotImplementedError
+
+    def write_many(self, items: List[Tuple[str, bytes, float, str]]) -> None:
+        """Store several (key, payload, expires_at, namespace) entries in one batch."""
+        for key, payload, expires_at, namespace in items:
+            self.write(key, payload, expires_at, namespace)
+
+    def delete(self, key: str) -> None:
+        """Remove the entry for a key if present."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        raise NotImplementedError
+
+    def touch_many(self, accessed: Dict[str, float]) -> None:
+        """Record last-access times for keys, used for LRU eviction."""
+        raise NotImplementedError
+
+    def sweep(self, now: float, max_bytes: int, max_files: int,
+              policies: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Purge expired entries, then evict entries until every namespace meets
+        its own limits and the store as a whole meets the disk budget.
+
+        Args:
+            now: Current time; entries whose deadline is before it are purged
+            max_bytes: Size budget of the whole store
+            max_files: Entry budget of the whole store
+            policies: Per-namespace 'max_entries', 'max_bytes' and 'eviction'
+                      ('lru', 'fifo' or 'ttl')
+
+        Returns:
+            Dictionary with per-namespace 'expired' and 'evicted' counts and
+            the remaining per-namespace 'usage' ({'entries', 'bytes'})
+        """
+        raise NotImplementedError
+
+    @property
+    def location(self) -> str:
+        """Identifier of the underlying storage, used to share one sweeper per store."""
+        raise NotImplementedError
+
+
+def select_victims(entries: List[Dict[str, Any]], max_bytes: int, max_files: int,
+                   policies: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Choose entries to evict. Each namespace is first trimmed to its own limits
+    in the order of its eviction policy, then the least recently accessed of
+    the remaining entries go until the overall budget is met.
+
+    Args:
+        entries: Entry metadata with 'namespace', 'size', 'accessed_at',
+                 'created_at' and 'expires_at'
+        max_bytes: Size budget of the whole store
+        max_files: Entry budget of the whole store
+        policies: Per-namespace limits and eviction policy
+
+    Returns:
+        Entries to evict
+    """
+    victims = []
+    evicted = set()
+
+    by_namespace: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in entries:
+        by_namespace.setdefault(entry["namespace"], []).append(entry)
+
+    for namespace, group in by_namespace.items():
+        policy = (policies or {}).get(namespace)
+        if not policy:
+            continue
+
+        ns_max_entries = policy.get("max_entries") or len(group)
+        ns_max_bytes = policy.get("max_bytes") or float("inf")
+        ns_bytes = sum(entry["size"] for entry in group)
+        if len(group) <= ns_max_entries and ns_bytes <= ns_max_bytes:
+            continue
+
+        order_by = EVICTION_ORDER.get(policy.get("eviction", "lru"), "accessed_at")
+        remaining = len(group)
+        for entry in sorted(group, key=lambda entry: entry[order_by]):
+            if remaining <= ns_max_entries and ns_bytes <= ns_max_bytes:
+                break
+            victims.append(entry)
+            evicted.add(id(entry))
+            remaining -= 1
+            ns_bytes -= entry["size"]
+
+    survivors = [entry for entry in entries if id(entry) not in evicted]
+    total_bytes = sum(entry["size"] for entry in survivors)
+    files = len(survivors)
+
+    # Oldest access first
+    for entry in sorted(survivors, key=lambda entry: entry["accessed_at"]):
+        if total_bytes <= max_bytes and files <= max_files:
+            break
+        victims.append(entry)
+        files -= 1
+        total_bytes -= entry["size"]
+
+    return victims
+
+
+def summarize_sweep(expired: List[Dict[str, Any]], evicted: List[Dict[str, Any]],
+                    survivors: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Group the outcome of a sweep by namespace."""
+    result = {"expired": {}, "evicted": {}, "usage": {}}
+    for entry in expired:
+        result["expired"][entry["namespace"]] = result["expired"].get(entry["namespace"], 0) + 1
+    for entry in evicted:
+        result["evicted"][entry["namespace"]] = result["evicted"].get(entry["namespace"], 0) + 1
+    for entry in survivors:
+        usage = result["usage"].setdefault(entry["namespace"], {"entries": 0, "bytes": 0})
+        usage["entries"] += 1
+        usage["bytes"] += entry["size"]
+    return result
+
+
+class JSONDirBackend(CacheBackend):
+    """
+    One file per key (`<md5>.json`) in a directory. File mtime is used as the
+    last-access time. This is the original layout and stays the default; the
+    suffix is kept even for binary-encoded entries so existing files resolve.
+    """
+
+    name = "json"
+
+    def __init__(self, cache_dir: Path, codec: Optional[CacheCodec] = None):
+        """
+        Initialize the backend.
+
+        Args:
+            cache_dir: Directory to store cache files
+            codec: Codec used to read entry expiry times during sweeps
+        """
+        self.cache_dir = Path(cache_dir)
+        self.codec = codec or CacheCodec(codec="json", compression="none")
+        self.cache_dir.mkdir(exist_ok=True, parents=True)
+
+    def _get_cache_path(self, key: str) -> Path:
+        """Get the path to the cache file for a key."""
+        # Use hash of key as filename to avoid invalid characters
+        hashed_key = hashlib.md5(key.encode()).hexdigest()
+        return self.cache_dir / f"{hashed_key}.json"
+
+    def read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._get_cache_path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, key: str, payload: bytes, expires_at: float, namespace: str = DEFAULT_NAMESPACE) -> None:
+        # Namespace and expiry travel inside the encoded entry
+        with open(self._get_cache_path(key), 'wb') as f:
+            f.write(payload)
+
+    def delete(self, key: str) -> None:
+        self._get_cache_path(key).unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        for cache_file in self.cache_dir.iterdir():
+            if CACHE_FILE_PATTERN.match(cache_file.name):
+                cache_file.unlink(missing_ok=True)
+
+    def touch_many(self, accessed: Dict[str, float]) -> None:
+        for key, accessed_at in accessed.items():
+            try:
+                os.utime(self._get_cache_path(key), (accessed_at, accessed_at))
+            except OSError:
+                pass
+
+    def sweep(self, now: float, max_bytes: int, max_files: int,
+              policies: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+        # Entry files carry their namespace and expiry inside, so each one has to be read
+        expired, entries = [], []
+        for cache_file in self.cache_dir.iterdir():
+            if not CACHE_FILE_PATTERN.match(cache_file.name):
+                continue
+
+            try:
+                stat = cache_file.stat()
+                with open(cache_file, 'rb') as f:
+                    cache_data = self.codec.decode(f.read())
+            except FileNotFoundError:
+                continue
+            except (ValueError, OSError):
+                # Unreadable entries are treated as expired
+                cache_data = {}
+
+            entry = {
+                "path": cache_file,
+                "namespace": cache_data.get('namespace', DEFAULT_NAMESPACE),
+                "size": stat.st_size,
+                "accessed_at": stat.st_mtime,
+                "created_at": cache_data.get('cached_at', 0),
+                "expires_at": entry_deadline(cache_data)
+            }
+            (expired if entry["expires_at"] < now else entries).append(entry)
+
+        victims = select_victims(entries, max_bytes, max_files, policies)
+        for entry in expired + victims:
+            entry["path"].unlink(missing_ok=True)
+
+        evicted_paths = {entry["path"] for entry in victims}
+        survivors = [entry for entry in entries if entry["path"] not in evicted_paths]
+        return summarize_sweep(expired, victims, survivors)
+
+    @property
+    def location(self) -> str:
+        return str(self.cache_dir.resolve())
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    All entries in a single WAL-mode SQLite file. Namespace, expiry and last
+    access are indexed columns, so bulk expiry and usage accounting are single
+    statements and only over-budget namespaces are scanned for eviction.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_path: Path):
+        """
+        Initialize the backend.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(exist_ok=True, parents=True)
+
+        # sqlite3 connections cannot be shared across threads by default,
+        # so each thread gets its own connection to the same file
+        self._local = threading.local()
+
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                " key TEXT PRIMARY KEY,"
+                " value BLOB NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " size INTEGER NOT NULL)"
+            )
+            # Columns added after the first release of this table
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(cache_entries)")}
+            if "namespace" not in columns:
+                conn.execute(f"ALTER TABLE cache_entries ADD COLUMN namespace TEXT NOT NULL DEFAULT '{DEFAULT_NAMESPACE}'")
+            if "created_at" not in columns:
+                conn.execute("ALTER TABLE cache_entries ADD COLUMN created_at REAL NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires_at ON cache_entries (expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed_at ON cache_entries (accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_namespace ON cache_entries (namespace)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def read(self, key: str) -> Optional[bytes]:
+        row = self._connect().execute(
+            "SELECT value FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def write(self, key: str, payload: bytes, expires_at: float, namespace: str = DEFAULT_NAMESPACE) -> None:
+        self.write_many([(key, payload, expires_at, namespace)])
+
+    def write_many(self, items: List[Tuple[str, bytes, float, str]]) -> None:
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache_entries "
+                "(key, value, expires_at, accessed_at, size, namespace, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(key, sqlite3.Binary(payload), expires_at, now, len(payload), namespace, now)
+                 for key, payload, expires_at, namespace in items]
+            )
+
+    def delete(self, key: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache_entries")
+
+    def touch_many(self, accessed: Dict[str, float]) -> None:
+        if not accessed:
+            return
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "UPDATE cache_entries SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in accessed.items()]
+            )
+
+    def sweep(self, now: float, max_bytes: int, max_files: int,
+              policies: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+        conn = self._connect()
+        with conn:
+            expired = dict(conn.execute(
+                "SELECT namespace, COUNT(*) FROM cache_entries WHERE expires_at < ? GROUP BY namespace", (now,)
+            ).fetchall())
+            conn.execute("DELETE FROM cache_entries WHERE expires_at < ?", (now,))
+
+        usage = {
+            namespace: {"entries": entries, "bytes": size}
+            for namespace, entries, size in conn.execute(
+                "SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries GROUP BY namespace"
+            )
+        }
+
+        over_budget = [
+            namespace for namespace, counts in usage.items()
+            if namespace in (policies or {}) and (
+                counts["entries"] > (policies[namespace].get("max_entries") or counts["entries"]) or
+                counts["bytes"] > (policies[namespace].get("max_bytes") or counts["bytes"])
+            )
+        ]
+        over_total = (sum(counts["entries"] for counts in usage.values()) > max_files or
+                      sum(counts["bytes"] for counts in usage.values()) > max_bytes)
+
+        evicted = {}
+        if over_budget or over_total:
+            # Only entry metadata is loaded, never the values, and only for the
+            # namespaces over their limits unless the whole store is over budget
+            query = "SELECT key, namespace, size, accessed_at, created_at, expires_at FROM cache_entries"
+            params = ()
+            if not over_total:
+                query += f" WHERE namespace IN ({', '.join('?' * len(over_budget))})"
+                params = tuple(over_budget)
+
+            entries = [
+                {"key": key, "namespace": namespace, "size": size, "accessed_at": accessed_at,
+                 "created_at": created_at, "expires_at": expires_at}
+                for key, namespace, size, accessed_at, created_at, expires_at in conn.execute(query, params)
+            ]
+            victims = select_victims(entries, max_bytes, max_files, policies)
+            with conn:
+                conn.executemany("DELETE FROM cache_entries WHERE key = ?", [(entry["key"],) for entry in victims])
+
+            for entry in victims:
+                namespace = entry["namespace"]
+                evicted[namespace] = evicted.get(namespace, 0) + 1
+                usage[namespace]["entries"] -= 1
+                usage[namespace]["bytes"] -= entry["size"]
+
+        return {"expired": expired, "evicted": evicted, "usage": usage}
+
+    @property
+    def location(self) -> str:
+        return str(self.db_path.resolve())
+
+
+def create_cache_backend(name: str, cache_dir: Path, sqlite_path: Optional[str] = None,
+                         codec: Optional[CacheCodec] = None) -> CacheBackend:
+    """
+    Create a storage backend by name.
+
+    Args:
+        name: Backend name ('json' or 'sqlite')
+        cache_dir: Cache directory
+        sqlite_path: Optional database path for the SQLite backend
+        codec: Codec the cache manager encodes entries with
+
+    Returns:
+        Cache backend instance
+    """
+    name = (name or "json").lower()
+    if name == "sqlite":
+        return SQLiteBackend(Path(sqlite_path) if sqlite_path else Path(cache_dir) / "cache.sqlite3")
+    if name != "json":
+        logger.warning(f"Unknown cache backend '{name}', falling back to json")
+    return JSONDirBackend(Path(cache_dir), codec=codec)
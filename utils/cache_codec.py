@@ -0,0 +1,183 @@
+"""
+Serialization of cache entries with an optional fast codec and compression
+"""
+import json
+import gzip
+import logging
+from typing import Dict, Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Header bytes identifying the payload format. Legacy entries are plain JSON
+# text and always start with '{', which never collides with these values.
+FORMAT_JSON = 0x01
+FORMAT_ORJSON = 0x02
+FORMAT_MSGPACK = 0x03
+
+COMPRESSION_NONE = 0x00
+COMPRESSION_GZIP = 0x10
+COMPRESSION_ZSTD = 0x20
+
+_FORMAT_MASK = 0x0F
+_COMPRESSION_MASK = 0xF0
+
+class CacheCodec:
+    """
+    Encodes cache entries as a one-byte header followed by the payload.
+
+    The low nibble of the header names the serializer (json, orjson, msgpack),
+    the high nibble the compression (none, gzip, zstd). Compression is only
+    applied to payloads above a size threshold. Payloads without a header
+    (legacy JSON files) are decoded as plain JSON.
+    """
+
+    def __init__(self, codec: str = "auto", compression: str = "auto", compression_threshold: int = 4096):
+        """
+        Initialize the codec.
+
+        Args:
+            codec: Serializer to write with ('auto', 'json', 'orjson' or 'msgpack')
+            compression: Compression to write with ('auto', 'none', 'gzip' or 'zstd')
+            compression_threshold: Minimum serialized size in bytes before compressing
+        """
+        self.format = self._resolve_format(codec)
+        self.compression = self._resolve_compression(compression)
+        self.compression_threshold = compression_threshold
+
+        if zstandard is not None:
+            self._zstd_compressor = zstandard.ZstdCompressor(level=3)
+            self._zstd_decompressor = zstandard.ZstdDecompressor()
+
+    @staticmethod
+    def _resolve_format(codec: str) -> int:
+        """Pick the serializer, falling back to json when a library is missing."""
+        codec = (codec or "auto").lower()
+        if codec in ("auto", "orjson") and orjson is not None:
+            return FORMAT_ORJSON
+        if codec == "msgpack" and msgpack is not None:
+            return FORMAT_MSGPACK
+        if codec not in ("auto", "json"):
+            logger.warning(f"Cache codec '{codec}' is not available, using json")
+        return FORMAT_JSON
+
+    @staticmethod
+    def _resolve_compression(compression: str) -> int:
+        """Pick the compression, falling back to gzip when zstandard is missing."""
+        compression = (compression or "auto").lower()
+        if compression == "none":
+            return COMPRESSION_NONE
+        if compression in ("auto", "zstd") and zstandard is not None:
+            return COMPRESSION_ZSTD
+        if compression == "zstd":
+            logger.warning("zstandard is not installed, compressing cache entries with gzip")
+        return COMPRESSION_GZIP
+
+    def encode(self, cache_data: Dict[str, Any]) -> bytes:
+        """
+        Serialize a cache entry.
+
+        Args:
+            cache_data: Cache entry dictionary
+
+        Returns:
+            Header byte followed by the (possibly compressed) payload
+
+        Raises:
+            TypeError, ValueError: If the entry cannot be serialized
+        """
+        fmt = self.format
+        try:
+            if fmt == FORMAT_ORJSON:
+                payload = orjson.dumps(cache_data)
+            elif fmt == FORMAT_MSGPACK:
+                payload = msgpack.packb(cache_data, use_bin_type=True)
+        except (TypeError, ValueError):
+            # e.g. non-string dict keys, which only the stdlib encoder coerces
+            fmt = FORMAT_JSON
+
+        if fmt == FORMAT_JSON:
+            payload = json.dumps(cache_data).encode()
+
+        compression = COMPRESSION_NONE
+        if self.compression != COMPRESSION_NONE and len(payload) >= self.compression_threshold:
+            compression = self.compression
+            payload = self._compress(payload, compression)
+
+        return bytes([fmt | compression]) + payload
+
+    def decode(self, raw: bytes) -> Dict[str, Any]:
+        """
+        Deserialize a cache entry written by encode() or by the legacy JSON cache.
+
+        Args:
+            raw: Stored bytes
+
+        Returns:
+            Cache entry dictionary
+
+        Raises:
+            ValueError: If the payload is corrupt or uses an unavailable format
+        """
+        if not raw:
+            raise ValueError("Empty cache entry")
+
+        header = raw[0]
+        if header == ord('{'):
+            # Legacy entry written with json.dump
+            return json.loads(raw)
+
+        fmt = header & _FORMAT_MASK
+        compression = header & _COMPRESSION_MASK
+        try:
+            payload = self._decompress(raw[1:], compression)
+        except ValueError:
+            raise
+        except Exception as e:
+            # gzip/zlib/zstd each raise their own error types for corrupt data
+            raise ValueError(f"Corrupt compressed cache entry: {str(e)}") from e
+
+        if fmt == FORMAT_ORJSON:
+            if orjson is None:
+                return json.loads(payload)
+            return orjson.loads(payload)
+        if fmt == FORMAT_MSGPACK:
+            if msgpack is None:
+                raise ValueError("Cache entry is msgpack-encoded but msgpack is not installed")
+            return msgpack.unpackb(payload, raw=False)
+        if fmt == FORMAT_JSON:
+            return json.loads(payload)
+
+        raise ValueError(f"Unknown cache entry header: {header:#x}")
+
+    def _compress(self, payload: bytes, compression: int) -> bytes:
+        """Compress a payload."""
+        if compression == COMPRESSION_ZSTD:
+            return self._zstd_compressor.compress(payload)
+        return gzip.compress(payload, compresslevel=6)
+
+    def _decompress(self, payload: bytes, compression: int) -> bytes:
+        """Decompress a payload."""
+        if compression == COMPRESSION_NONE:
+            return payload
+        if compression == COMPRESSION_GZIP:
+            return gzip.decompress(payload)
+        if compression == COMPRESSION_ZSTD:
+            if zstandard is None:
+                raise ValueError("Cache entry is zstd-compressed but zstandard is not installed")
+            return self._zstd_decompressor.decompress(payload)
+        raise ValueError(f"Unknown cache compression: {compression:#x}")
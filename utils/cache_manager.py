@@ -2,59 +2,151 @@
 Cache Manager for API responses to minimize external API calls
 """
 import os
-import json
 import time
+import sqlite3
 import logging
-import hashlib
-from typing import Dict, Any, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Union, Callable
 from pathlib import Path
 
 import config
+from utils.memory_cache import MemoryCache, entry_deadline
+from utils.cache_backends import CacheBackend, DEFAULT_NAMESPACE, create_cache_backend
+from utils.cache_codec import CacheCodec
+from utils.quota_store import QuotaStore
 
 logger = logging.getLogger(__name__)
 
+# Stores that already have a sweeper thread in this process
+_swept_stores = set()
+_swept_stores_lock = threading.Lock()
+
+# Counters kept for each cache namespace
+_NAMESPACE_COUNTERS = ("hits", "misses", "stale_serves", "expired", "evictions", "bytes_written")
+
+def _is_cacheable(value: Any) -> bool:
+    """Default check for get_or_compute: skip empty values and error responses."""
+    if not value:
+        return False
+    return not (isinstance(value, dict) and "error" in value)
+
+class _InFlight:
+    """A computation that concurrent callers for the same key wait on."""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
 class CacheManager:
     """
     Manages caching of API responses to minimize external API calls.
-    Uses simple file-based cache with TTL (time-to-live) expiry.
+    Uses a two-tier cache with TTL (time-to-live) expiry: an in-process
+    LRU tier in front of a pluggable disk tier (see utils.cache_backends).
     """
     
-    def __init__(self, cache_dir: Optional[str] = None, enabled: Optional[bool] = None):
+    def __init__(self, cache_dir: Optional[str] = None, enabled: Optional[bool] = None,
+                 memory_max_entries: Optional[int] = None, memory_max_bytes: Optional[int] = None,
+                 disk_max_bytes: Optional[int] = None, disk_max_files: Optional[int] = None,
+                 sweep_interval: Optional[int] = None, backend: Union[str, CacheBackend, None] = None,
+                 namespaces: Optional[Dict[str, Dict[str, Any]]] = None):
         """
         Initialize the cache manager.
         
         Args:
             cache_dir: Directory to store cache files
             enabled: Whether caching is enabled (defaults to config setting)
+            memory_max_entries: Entry limit of the in-memory tier (defaults to config setting)
+            memory_max_bytes: Size limit of the in-memory tier (defaults to config setting)
+            disk_max_bytes: Size budget of the disk tier (defaults to config setting)
+            disk_max_files: Entry budget of the disk tier (defaults to config setting)
+            sweep_interval: Seconds between background sweeps, 0 to disable (defaults to config setting)
+            backend: Disk tier backend name ('json' or 'sqlite') or instance (defaults to config setting)
+            namespaces: Per-namespace TTL, limits and eviction policy (defaults to config setting)
         """
         self.cache_dir = Path(cache_dir or config.CACHE_DIR)
         self.enabled = config.ENABLE_RESPONSE_CACHING if enabled is None else enabled
         self.cache_expiry = config.CACHE_EXPIRY_SECONDS  # Default TTL in seconds
+        self.namespaces = config.CACHE_NAMESPACES if namespaces is None else namespaces
         
         # Ensure cache directory exists
         self.cache_dir.mkdir(exist_ok=True, parents=True)
         
-        # Track API usage
-        self._api_usage = {
-            "tavily": {"count": 0, "last_reset": time.time()},
-            "groq": {"count": 0, "last_reset": time.time()}
+        # Serialization of disk tier entries
+        self.codec = CacheCodec(
+            codec=config.CACHE_CODEC,
+            compression=config.CACHE_COMPRESSION,
+            compression_threshold=config.CACHE_COMPRESSION_THRESHOLD
+        )
+        
+        # Disk tier storage
+        if isinstance(backend, CacheBackend):
+            self.backend = backend
+        else:
+            self.backend = create_cache_backend(
+                backend or config.CACHE_BACKEND,
+                self.cache_dir,
+                sqlite_path=config.CACHE_SQLITE_PATH,
+                codec=self.codec
+            )
+        
+        # In-memory tier so hot keys never touch the filesystem
+        self.memory_cache = MemoryCache(
+            max_entries=config.CACHE_MEMORY_MAX_ENTRIES if memory_max_entries is None else memory_max_entries,
+            max_bytes=config.CACHE_MEMORY_MAX_BYTES if memory_max_bytes is None else memory_max_bytes
+        )
+        
+        # Hit/miss counters per tier
+        self._stats_lock = threading.Lock()
+        self._tier_stats = {
+            "memory": {"hits": 0, "misses": 0},
+            "disk": {"hits": 0, "misses": 0}
         }
+        self._swr_stats = {"stale_serves": 0, "coalesced_waits": 0, "refreshes": 0}
+        
+        # Counters per namespace, plus its disk usage as of the last sweep
+        self._namespace_stats: Dict[str, Dict[str, int]] = {}
+        self._disk_usage: Dict[str, Dict[str, int]] = {}
+        self._last_sweep_at: Optional[float] = None
         
-        # Load any existing API usage data
-        self._load_api_usage()
+        # In-flight computations for get_or_compute, keyed by cache key
+        self._inflight: Dict[str, _InFlight] = {}
+        self._inflight_lock = threading.Lock()
+        self._refresh_executor: Optional[ThreadPoolExecutor] = None
+        
+        # Disk budget enforced by the background sweeper
+        self.disk_max_bytes = config.CACHE_DISK_MAX_BYTES if disk_max_bytes is None else disk_max_bytes
+        self.disk_max_files = config.CACHE_DISK_MAX_FILES if disk_max_files is None else disk_max_files
+        self.sweep_interval = config.CACHE_SWEEP_INTERVAL_SECONDS if sweep_interval is None else sweep_interval
+        
+        # Keys read since the last sweep; the sweeper hands them to the backend
+        # in one batch so disk LRU order reflects real usage without a write per read
+        self._recent_access: Dict[str, float] = {}
+        self._sweeper_thread: Optional[threading.Thread] = None
+        self._sweeper_stop = threading.Event()
+        
+        # Track API usage in a store shared by all worker processes
+        self.quota_store = QuotaStore(
+            config.API_QUOTA_DB_PATH,
+            limits={
+                "tavily": config.TAVILY_RATE_LIMIT_PER_DAY,
+                "groq": config.GROQ_RATE_LIMIT_PER_DAY
+            }
+        )
+        
+        if self.enabled and self.sweep_interval > 0:
+            self.start_sweeper()
         
         logger.info(f"Cache manager initialized. Caching {'enabled' if self.enabled else 'disabled'}.")
     
-    def _get_cache_path(self, key: str) -> Path:
-        """Get the path to the cache file for a key."""
-        # Use hash of key as filename to avoid invalid characters
-        hashed_key = hashlib.md5(key.encode()).hexdigest()
-        return self.cache_dir / f"{hashed_key}.json"
-    
     def get(self, key: str) -> Optional[Dict[str, Any]]:
         """
         Get a cached response for a key if it exists and is not expired.
         
+        The memory tier is checked first; disk hits are promoted into it.
+        Returned values may be shared with the memory tier and must not be mutated.
+        
         Args:
             key: Cache key
             
@@ -64,60 +156,156 @@ class CacheManager:
         if not self.enabled:
             return None
         
-        cache_path = self._get_cache_path(key)
+        cached_data = self._lookup(key, allow_stale=False)
+        return cached_data.get('data') if cached_data is not None else None
+    
+    def _lookup(self, key: str, allow_stale: bool) -> Optional[Dict[str, Any]]:
+        """
+        Find the cache data for a key in the memory tier, then the disk tier.
         
-        if not cache_path.exists():
-            return None
+        Args:
+            key: Cache key
+            allow_stale: Whether entries past 'expires_at' but within 'stale_until' count as found
+            
+        Returns:
+            Cache data dictionary or None
+        """
+        now = time.time()
+        
+        def usable(entry: Dict[str, Any]) -> bool:
+            deadline = entry_deadline(entry) if allow_stale else entry.get('expires_at', 0)
+            return deadline >= now
+        
+        namespace = self.namespace_for(key)
+        
+        cached_data = self.memory_cache.get(key)
+        if cached_data is not None and usable(cached_data):
+            self._record("memory", hit=True, namespace=namespace)
+            self._note_access(key)
+            logger.debug(f"Memory cache hit for key: {key}")
+            return cached_data
+        
+        self._record("memory", hit=False)
         
         try:
-            with open(cache_path, 'r') as f:
-                cached_data = json.load(f)
+            raw = self.backend.read(key)
+            if raw is None:
+                self._record("disk", hit=False, namespace=namespace)
+                return None
             
-            # Check if cached data is expired
-            if cached_data.get('expires_at', 0) < time.time():
+            cached_data = self.codec.decode(raw)
+            
+            if entry_deadline(cached_data) < now:
                 logger.debug(f"Cache expired for key: {key}")
-                cache_path.unlink(missing_ok=True)  # Remove expired cache
+                self.backend.delete(key)  # Remove expired cache
+                self._record("disk", hit=False, namespace=namespace)
+                return None
+            
+            # Promote to the memory tier, stale entries included
+            self.memory_cache.set(key, cached_data, len(raw))
+            
+            if not usable(cached_data):
+                self._record("disk", hit=False, namespace=namespace)
                 return None
             
+            self._note_access(key)
+            self._record("disk", hit=True, namespace=namespace)
             logger.debug(f"Cache hit for key: {key}")
-            return cached_data.get('data')
+            return cached_data
             
-        except (json.JSONDecodeError, IOError) as e:
+        except (ValueError, OSError, sqlite3.Error) as e:
             logger.warning(f"Error reading cache: {str(e)}")
+            self._record("disk", hit=False, namespace=namespace)
             return None
     
-    def set(self, key: str, data: Dict[str, Any], ttl: Optional[int] = None) -> None:
+    def set(self, key: str, data: Dict[str, Any], ttl: Optional[int] = None, stale_ttl: int = 0) -> None:
         """
-        Cache data for a key.
+        Cache data for a key, writing through both the memory and disk tiers.
         
         Args:
             key: Cache key
             data: Data to cache
-            ttl: Time-to-live in seconds (defaults to global setting)
+            ttl: Time-to-live in seconds (defaults to the key's namespace setting)
+            stale_ttl: Extra seconds after expiry during which get_or_compute may serve the entry stale
         """
-        if not self.enabled:
-            return
+        self.set_many({key: data}, ttl=ttl, stale_ttl=stale_ttl)
+    
+    def set_many(self, items: Dict[str, Dict[str, Any]], ttl: Optional[int] = None, stale_ttl: int = 0) -> None:
+        """
+        Cache several key/data pairs with one batched disk write.
         
-        ttl = ttl or self.cache_expiry
-        expires_at = time.time() + ttl
+        Args:
+            items: Mapping of cache keys to data
+            ttl: Time-to-live in seconds (defaults to each key's namespace setting)
+            stale_ttl: Extra seconds after expiry during which get_or_compute may serve entries stale
+        """
+        if not self.enabled or not items:
+            return
         
-        cache_path = self._get_cache_path(key)
+        now = time.time()
         
-        cache_data = {
-            'data': data,
-            'cached_at': time.time(),
-            'expires_at': expires_at
-        }
+        batch = []
+        for key, data in items.items():
+            namespace = self.namespace_for(key)
+            expires_at = now + (ttl or self.namespace_policy(namespace)["ttl"])
+            cache_data = {
+                'data': data,
+                'cached_at': now,
+                'expires_at': expires_at,
+                'namespace': namespace
+            }
+            if stale_ttl > 0:
+                cache_data['stale_until'] = expires_at + stale_ttl
+            
+            try:
+                payload = self.codec.encode(cache_data)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Error serializing cache data for key {key}: {str(e)}")
+                continue
+            
+            self.memory_cache.set(key, cache_data, len(payload))
+            batch.append((key, payload, entry_deadline(cache_data), namespace))
+            self._count(namespace, "bytes_written", len(payload))
         
         try:
-            with open(cache_path, 'w') as f:
-                json.dump(cache_data, f)
+            self.backend.write_many(batch)
+            logger.debug(f"Cached {len(batch)} entries")
             
-            logger.debug(f"Cached data for key: {key}, expires in {ttl} seconds")
-            
-        except IOError as e:
+        except (OSError, sqlite3.Error) as e:
             logger.warning(f"Error writing cache: {str(e)}")
     
+    def namespace_for(self, key: str) -> str:
+        """
+        Get the namespace of a cache key from its prefix.
+        
+        Args:
+            key: Cache key, e.g. 'groq_<model>_...'
+            
+        Returns:
+            Declared namespace matching the prefix, or 'default'
+        """
+        prefix = key.split("_", 1)[0]
+        return prefix if prefix in self.namespaces else DEFAULT_NAMESPACE
+    
+    def namespace_policy(self, namespace: str) -> Dict[str, Any]:
+        """
+        Get the TTL, limits and eviction policy of a namespace.
+        
+        Args:
+            namespace: Namespace name
+            
+        Returns:
+            Dictionary with 'ttl', 'max_entries', 'max_bytes' and 'eviction'
+        """
+        policy = {
+            "ttl": self.cache_expiry,
+            "max_entries": 0,
+            "max_bytes": 0,
+            "eviction": "lru"
+        }
+        policy.update(self.namespaces.get(namespace, {}))
+        return policy
+    
     def clear(self, key: Optional[str] = None) -> None:
         """
         Clear cache for a specific key or all cache if key is None.
@@ -126,89 +314,338 @@ class CacheManager:
             key: Optional cache key to clear
         """
         if key:
-            cache_path = self._get_cache_path(key)
-            if cache_path.exists():
-                cache_path.unlink()
-                logger.debug(f"Cleared cache for key: {key}")
+            self.memory_cache.delete(key)
+            self.backend.delete(key)
+            logger.debug(f"Cleared cache for key: {key}")
         else:
-            # Clear all cache files
-            for cache_file in self.cache_dir.glob("*.json"):
-                cache_file.unlink()
+            self.memory_cache.clear()
+            self.backend.clear()
+            logger.debug("Cleared all cache entries")
+    
+    def get_or_compute(self, key: str, compute_fn: Callable[[], Any], ttl: Optional[int] = None,
+                       stale_ttl: int = 0, cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Get a cached value, computing it on a miss with request coalescing and
+        stale-while-revalidate.
+        
+        Concurrent callers that miss on the same key wait for a single call to
+        compute_fn. Once an entry expires it is still served for stale_ttl more
+        seconds while exactly one background worker recomputes it.
+        
+        Args:
+            key: Cache key
+            compute_fn: Zero-argument function producing the value on a miss
+            ttl: Time-to-live in seconds (defaults to the key's namespace setting)
+            stale_ttl: Seconds after expiry during which the stale value may be served
+            cacheable: Predicate deciding whether a computed value is stored
+                       (defaults to skipping empty values and error responses)
             
-            logger.debug("Cleared all cache files")
+        Returns:
+            Cached or freshly computed value; exceptions from compute_fn propagate
+        """
+        if not self.enabled:
+            return compute_fn()
+        
+        cacheable = cacheable or _is_cacheable
+        
+        cached_data = self._lookup(key, allow_stale=stale_ttl > 0)
+        if cached_data is not None:
+            if cached_data.get('expires_at', 0) < time.time():
+                with self._stats_lock:
+                    self._swr_stats["stale_serves"] += 1
+                self._count(self.namespace_for(key), "stale_serves")
+                logger.debug(f"Serving stale cache entry for key: {key}")
+                self._refresh_in_background(key, compute_fn, ttl, stale_ttl, cacheable)
+            return cached_data.get('data')
+        
+        with self._inflight_lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlight()
+                self._inflight[key] = call
+        
+        if not leader:
+            with self._stats_lock:
+                self._swr_stats["coalesced_waits"] += 1
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        self._run_computation(key, call, compute_fn, ttl, stale_ttl, cacheable)
+        if call.error is not None:
+            raise call.error
+        return call.result
     
-    def track_api_call(self, api_name: str) -> bool:
+    def _run_computation(self, key: str, call: _InFlight, compute_fn: Callable[[], Any],
+                         ttl: Optional[int], stale_ttl: int, cacheable: Callable[[Any], bool]) -> None:
+        """Run compute_fn for an in-flight call, cache the result and release waiters."""
+        try:
+            call.result = compute_fn()
+            if cacheable(call.result):
+                self.set(key, call.result, ttl=ttl, stale_ttl=stale_ttl)
+        except Exception as e:
+            call.error = e
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+    
+    def _refresh_in_background(self, key: str, compute_fn: Callable[[], Any], ttl: Optional[int],
+                               stale_ttl: int, cacheable: Callable[[Any], bool]) -> None:
+        """Recompute a stale key on the refresh pool unless a computation is already running."""
+        with self._inflight_lock:
+            if key in self._inflight:
+                return
+            call = _InFlight()
+            self._inflight[key] = call
+            
+            if self._refresh_executor is None:
+                self._refresh_executor = ThreadPoolExecutor(
+                    max_workers=config.CACHE_REFRESH_WORKERS,
+                    thread_name_prefix="cache-refresh"
+                )
+        
+        with self._stats_lock:
+            self._swr_stats["refreshes"] += 1
+        
+        def refresh():
+            self._run_computation(key, call, compute_fn, ttl, stale_ttl, cacheable)
+            if call.error is not None:
+                logger.warning(f"Background refresh failed for key {key}: {str(call.error)}")
+        
+        self._refresh_executor.submit(refresh)
+    
+    def wait_for_refreshes(self, timeout: Optional[float] = None) -> bool:
         """
-        Track API call and check if rate limit is exceeded.
+        Wait until the computations in flight right now, including background
+        refreshes of stale entries, have finished.
         
         Args:
-            api_name: API name ('tavily' or 'groq')
+            timeout: Maximum seconds to wait in total (waits indefinitely if None)
             
         Returns:
-            True if call is allowed, False if rate limit exceeded
+            True if all of them finished within the timeout
         """
-        # Check if we need to reset the counter (daily)
-        current_time = time.time()
-        one_day_seconds = 24 * 60 * 60
+        with self._inflight_lock:
+            calls = list(self._inflight.values())
         
-        if api_name not in self._api_usage:
-            self._api_usage[api_name] = {"count": 0, "last_reset": current_time}
+        deadline = None if timeout is None else time.time() + timeout
+        for call in calls:
+            remaining = None if deadline is None else max(0, deadline - time.time())
+            if not call.done.wait(remaining):
+                return False
+        return True
+    
+    def _note_access(self, key: str) -> None:
+        """Remember a read so the next sweep can update the disk LRU order."""
+        if self.sweep_interval > 0:
+            self._recent_access[key] = time.time()
+    
+    def start_sweeper(self) -> None:
+        """
+        Start the background thread that enforces the disk budget.
+        Only one sweeper runs per store in a process.
+        """
+        sweep_key = self.backend.location
+        with _swept_stores_lock:
+            if sweep_key in _swept_stores:
+                return
+            _swept_stores.add(sweep_key)
         
-        if current_time - self._api_usage[api_name]["last_reset"] > one_day_seconds:
-            # Reset counter if it's been more than a day
-            self._api_usage[api_name] = {"count": 0, "last_reset": current_time}
+        self._sweeper_stop.clear()
+        self._sweeper_thread = threading.Thread(
+            target=self._sweeper_loop,
+            name=f"cache-sweeper-{self.cache_dir.name}",
+            daemon=True
+        )
+        self._sweeper_thread.start()
+        logger.info(f"Cache sweeper started for {self.backend.location} (every {self.sweep_interval}s)")
+    
+    def stop_sweeper(self) -> None:
+        """Stop the background sweeper thread if this instance owns it."""
+        if self._sweeper_thread is None:
+            return
         
-        # Get the appropriate rate limit based on API name
-        rate_limit = None
-        if api_name.lower() == "tavily":
-            rate_limit = config.TAVILY_RATE_LIMIT_PER_DAY
-        elif api_name.lower() == "groq":
-            rate_limit = config.GROQ_RATE_LIMIT_PER_DAY
+        self._sweeper_stop.set()
+        self._sweeper_thread.join(timeout=5)
+        self._sweeper_thread = None
         
-        if rate_limit is None:
-            # Unknown API, allow the call
-            return True
+        with _swept_stores_lock:
+            _swept_stores.discard(self.backend.location)
+    
+    def _sweeper_loop(self) -> None:
+        """Run sweeps until stopped, starting with one right away."""
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Error during cache sweep: {str(e)}")
+            if self._sweeper_stop.wait(self.sweep_interval):
+                break
+    
+    def sweep(self) -> Dict[str, Any]:
+        """
+        Enforce namespace policies and the disk budget. Expired entries are
+        evicted first, then entries of namespaces over their own limits in the
+        order of their eviction policy, then the least recently accessed ones
+        until the overall size and file budgets are met.
         
-        # Check if we've exceeded the rate limit
-        if self._api_usage[api_name]["count"] >= rate_limit:
-            logger.warning(f"{api_name} API daily rate limit exceeded: {rate_limit} calls/day")
-            return False
+        Returns:
+            Dictionary with the number of expired and evicted entries, the
+            remaining file count and size, and the same figures per namespace
+        """
+        # Carry reads over to the disk access order
+        recent_access, self._recent_access = self._recent_access, {}
+        self.backend.touch_many(recent_access)
         
-        # Increment the counter and save usage
-        self._api_usage[api_name]["count"] += 1
-        self._save_api_usage()
+        policies = {namespace: self.namespace_policy(namespace) for namespace in self.namespaces}
+        result = self.backend.sweep(time.time(), self.disk_max_bytes, self.disk_max_files, policies)
         
-        # Log when approaching limit
-        usage_percent = (self._api_usage[api_name]["count"] / rate_limit) * 100
-        if usage_percent >= 80:
-            logger.warning(f"{api_name} API usage at {usage_percent:.1f}% of daily limit")
-        elif usage_percent >= 50:
-            logger.info(f"{api_name} API usage at {usage_percent:.1f}% of daily limit")
+        for namespace, count in result["expired"].items():
+            self._count(namespace, "expired", count)
+        for namespace, count in result["evicted"].items():
+            self._count(namespace, "evictions", count)
         
+        with self._stats_lock:
+            self._disk_usage = result["usage"]
+            self._last_sweep_at = time.time()
+        
+        expired = sum(result["expired"].values())
+        evicted = sum(result["evicted"].values())
+        if expired or evicted:
+            logger.info(f"Cache sweep removed {expired} expired and {evicted} evicted entries")
+        
+        return {
+            "expired": expired,
+            "evicted": evicted,
+            "files": sum(usage["entries"] for usage in result["usage"].values()),
+            "bytes": sum(usage["bytes"] for usage in result["usage"].values()),
+            "namespaces": result
+        }
+    
+    def _record(self, tier: str, hit: bool, namespace: Optional[str] = None) -> None:
+        """
+        Record a hit or miss for a cache tier, and for the key's namespace
+        when the lookup ends at this tier.
+        """
+        with self._stats_lock:
+            self._tier_stats[tier]["hits" if hit else "misses"] += 1
+        if namespace is not None:
+            self._count(namespace, "hits" if hit else "misses")
+    
+    def _count(self, namespace: str, counter: str, amount: int = 1) -> None:
+        """Add to a per-namespace counter."""
+        with self._stats_lock:
+            counters = self._namespace_stats.setdefault(namespace, dict.fromkeys(_NAMESPACE_COUNTERS, 0))
+            counters[counter] += amount
+    
+    def get_namespace_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get policy, counters and disk usage for each namespace.
+        
+        Returns:
+            Dictionary keyed by namespace with its TTL, limits and eviction
+            policy, hit/miss/stale serve/expiry/eviction counters since startup,
+            hit rate, bytes written, and entries and bytes on disk as of the last sweep
+        """
+        with self._stats_lock:
+            counters = {namespace: dict(counts) for namespace, counts in self._namespace_stats.items()}
+            disk_usage = {namespace: dict(usage) for namespace, usage in self._disk_usage.items()}
+            last_sweep_at = self._last_sweep_at
+        
+        names = set(self.namespaces) | {DEFAULT_NAMESPACE} | set(counters) | set(disk_usage)
+        stats = {}
+        for namespace in sorted(names):
+            ns_stats = self.namespace_policy(namespace)
+            ns_stats.update(counters.get(namespace, dict.fromkeys(_NAMESPACE_COUNTERS, 0)))
+            lookups = ns_stats["hits"] + ns_stats["misses"]
+            ns_stats["hit_rate"] = (ns_stats["hits"] / lookups) if lookups > 0 else 0.0
+            
+            usage = disk_usage.get(namespace, {"entries": 0, "bytes": 0})
+            ns_stats["entries"] = usage["entries"]
+            ns_stats["bytes"] = usage["bytes"]
+            ns_stats["usage_as_of"] = last_sweep_at
+            stats[namespace] = ns_stats
+        
+        return stats
+    
+    def get_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get hit/miss statistics for each cache tier and for stale-while-revalidate.
+        
+        Returns:
+            Dictionary with per-tier counters and hit rates, stale serve,
+            coalesced wait and background refresh counts, and per-namespace stats
+        """
+        with self._stats_lock:
+            stats = {tier: dict(counts) for tier, counts in self._tier_stats.items()}
+        
+        for tier, counts in stats.items():
+            lookups = counts["hits"] + counts["misses"]
+            counts["hit_rate"] = (counts["hits"] / lookups) if lookups > 0 else 0.0
+        
+        with self._stats_lock:
+            stats["revalidation"] = dict(self._swr_stats)
+        
+        stats["memory"]["entries"] = len(self.memory_cache)
+        stats["memory"]["bytes"] = self.memory_cache.total_bytes
+        
+        stats["namespaces"] = self.get_namespace_stats()
+        
+        return stats
+    
+    def track_api_call(self, api_name: str) -> bool:
+        """
+        Track API call and check if rate limit is exceeded.
+        
+        Args:
+            api_name: API name ('tavily' or 'groq')
+            
+        Returns:
+            True if call is allowed, False if rate limit exceeded
+        """
+        reservation = self.reserve_api_call(api_name)
+        if reservation is None:
+            return False
+        
+        self.commit_api_call(reservation)
         return True
     
-    def _save_api_usage(self) -> None:
-        """Save API usage data to file."""
-        usage_path = self.cache_dir / "api_usage.json"
+    def reserve_api_call(self, api_name: str) -> Optional[str]:
+        """
+        Reserve one call against the API's daily limit, shared across processes.
+        
+        Follow up with commit_api_call() once the call was made, or
+        release_api_call() to refund the quota if it failed.
         
+        Args:
+            api_name: API name ('tavily' or 'groq')
+            
+        Returns:
+            Reservation id, or None if the rate limit is exceeded
+        """
         try:
-            with open(usage_path, 'w') as f:
-                json.dump(self._api_usage, f)
-        except IOError as e:
-            logger.warning(f"Error saving API usage data: {str(e)}")
+            return self.quota_store.reserve(api_name)
+        except sqlite3.Error as e:
+            # Fail open: a broken quota store should not take the app down
+            logger.warning(f"Error reserving {api_name} API quota: {str(e)}")
+            return ""
     
-    def _load_api_usage(self) -> None:
-        """Load API usage data from file if it exists."""
-        usage_path = self.cache_dir / "api_usage.json"
-        
-        if not usage_path.exists():
+    def commit_api_call(self, reservation: Optional[str]) -> None:
+        """Confirm a reserved API call."""
+        if reservation:
+            self.quota_store.commit(reservation)
+    
+    def release_api_call(self, reservation: Optional[str]) -> None:
+        """Refund a reserved API call that was not made or failed."""
+        if not reservation:
             return
-        
         try:
-            with open(usage_path, 'r') as f:
-                self._api_usage = json.load(f)
-        except (json.JSONDecodeError, IOError) as e:
-            logger.warning(f"Error loading API usage data: {str(e)}")
+            self.quota_store.release(reservation)
+        except sqlite3.Error as e:
+            logger.warning(f"Error releasing API quota: {str(e)}")
     
     def get_api_usage_stats(self) -> Dict[str, Dict[str, Any]]:
         """
@@ -217,28 +654,17 @@ class CacheManager:
         Returns:
             Dictionary with API usage statistics
         """
-        current_time = time.time()
-        one_day_seconds = 24 * 60 * 60
-        
         stats = {}
-        for api_name, usage in self._api_usage.items():
-            if api_name.lower() == "tavily":
-                limit = config.TAVILY_RATE_LIMIT_PER_DAY
-            elif api_name.lower() == "groq":
-                limit = config.GROQ_RATE_LIMIT_PER_DAY
-            else:
-                limit = 0
-            
-            # Calculate time until reset
-            elapsed = current_time - usage["last_reset"]
-            time_until_reset = max(0, one_day_seconds - elapsed)
+        for api_name in self.quota_store.limits:
+            usage = self.quota_store.usage(api_name)
+            limit = usage["limit"]
             
             stats[api_name] = {
                 "count": usage["count"],
                 "limit": limit,
                 "usage_percent": (usage["count"] / limit * 100) if limit > 0 else 0,
-                "reset_in_seconds": time_until_reset,
-                "reset_in_hours": time_until_reset / 3600
+                "reset_in_seconds": usage["reset_in_seconds"],
+                "reset_in_hours": usage["reset_in_seconds"] / 3600
             }
         
         return stats
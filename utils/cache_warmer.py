@@ -0,0 +1,327 @@
+"""
+Cache warm-up: prefetch market data, news and book summaries before users ask
+
+Run once from the command line:
+
+    python -m utils.cache_warmer
+    python -m utils.cache_warmer --only indices watchlist --symbols TCS INFY
+
+or keep the scheduler running in the foreground with --schedule. The app
+starts the same scheduler in-process when CACHE_WARM_SCHEDULE_ENABLED is set.
+Every scheduler claims each run in a small SQLite file first, so with
+several app workers (or workers plus the CLI scheduler) each run happens
+once.
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Callable
+
+import config
+from utils.cache_manager import cache_manager
+from utils.market_calendar import nse_calendar
+
+logger = logging.getLogger(__name__)
+
+# Targets in the order they are warmed; free sources first so a tight quota
+# never starves them
+WARM_TARGETS = ["indices", "sectors", "watchlist", "news", "books"]
+
+# Claimed scheduled runs are remembered this long
+WARM_RUN_RETENTION_SECONDS = 30 * 24 * 60 * 60
+
+class CacheWarmer:
+    """
+    Prefetches the entries the first requests of the day need: index data,
+    sector performance, watchlist quotes, market news and book summaries.
+    Calls that cost Tavily or Groq quota are skipped once the remaining
+    daily quota drops below a configurable share, so warming never uses up
+    the budget meant for interactive requests.
+    """
+
+    def __init__(self, symbols: Optional[List[str]] = None, news_limits: Optional[List[int]] = None,
+                 min_quota_percent: Optional[int] = None, lock_path: Optional[str] = None):
+        """
+        Initialize the warmer.
+
+        Args:
+            symbols: Watchlist symbols whose quotes are prefetched (defaults to config setting)
+            news_limits: Market news page sizes to prefetch (defaults to config setting)
+            min_quota_percent: Share of an API's daily limit that must remain for
+                               warming to spend its quota (defaults to config setting)
+            lock_path: SQLite file recording claimed scheduled runs (defaults to config setting)
+        """
+        self.symbols = config.CACHE_WARM_SYMBOLS if symbols is None else symbols
+        self.news_limits = config.CACHE_WARM_NEWS_LIMITS if news_limits is None else news_limits
+        self.min_quota_percent = config.CACHE_WARM_MIN_QUOTA_PERCENT if min_quota_percent is None else min_quota_percent
+        self.lock_path = str(config.CACHE_WARM_LOCK_PATH if lock_path is None else lock_path)
+
+        self._scheduler_thread: Optional[threading.Thread] = None
+        self._scheduler_stop = threading.Event()
+
+    def warm(self, targets: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Warm the cache for the given targets.
+
+        Args:
+            targets: Subset of WARM_TARGETS to warm (defaults to all)
+
+        Returns:
+            Report with per-target 'warmed', 'skipped' and 'failed' counts,
+            the API quota spent and the duration in seconds
+        """
+        targets = [target for target in WARM_TARGETS if target in (targets or WARM_TARGETS)]
+        started = time.time()
+        usage_before = self._quota_counts()
+
+        warmers = {
+            "indices": self.warm_indices,
+            "sectors": self.warm_sectors,
+            "watchlist": self.warm_watchlist,
+            "news": self.warm_news,
+            "books": self.warm_book_summaries
+        }
+
+        report = {"targets": {}}
+        for target in targets:
+            try:
+                report["targets"][target] = warmers[target]()
+            except Exception as e:
+                logger.error(f"Error warming {target}: {str(e)}")
+                report["targets"][target] = {"warmed": 0, "skipped": 0, "failed": 1}
+
+        # Entries that were stale are refreshed in the background; wait so
+        # the report (and a CLI run) covers them
+        cache_manager.wait_for_refreshes(timeout=120)
+
+        usage_after = self._quota_counts()
+        report["quota_used"] = {
+            api_name: usage_after.get(api_name, 0) - usage_before.get(api_name, 0)
+            for api_name in usage_after
+        }
+        report["duration_seconds"] = round(time.time() - started, 2)
+
+        totals = {
+            outcome: sum(counts[outcome] for counts in report["targets"].values())
+            for outcome in ("warmed", "skipped", "failed")
+        }
+        logger.info(
+            f"Cache warm-up finished in {report['duration_seconds']}s: {totals['warmed']} warmed, "
+            f"{totals['skipped']} skipped, {totals['failed']} failed, quota used {report['quota_used']}"
+        )
+        return report
+
+    def warm_indices(self) -> Dict[str, int]:
+        """Prefetch the market overview (index data)."""
+        from data_sources.stock_data import stock_data
+        return self._run([stock_data.get_market_overview])
+
+    def warm_sectors(self) -> Dict[str, int]:
+        """Prefetch sector performance."""
+        from data_sources.stock_data import stock_data
+        return self._run([stock_data.get_sector_performance])
+
+    def warm_watchlist(self) -> Dict[str, int]:
+        """Prefetch quotes for the watchlist symbols."""
+        from data_sources.stock_data import stock_data
+        return self._run([
+            lambda symbol=symbol: stock_data.get_stock_price(symbol) for symbol in self.symbols
+        ])
+
+    def warm_news(self) -> Dict[str, int]:
+        """Prefetch Indian market news for each configured page size."""
+        from data_sources.news_extractor import news_extractor
+        return self._run([
+            lambda limit=limit: news_extractor.get_market_news(market="Indian", limit=limit)
+            for limit in self.news_limits
+        ], api_name="tavily")
+
+    def warm_book_summaries(self) -> Dict[str, int]:
+        """Precompute any missing or outdated book summaries; current ones are left as they are."""
+        from ai.rag_system import initialize_rag_system
+        rag_system = initialize_rag_system()
+        return self._run([
+            lambda book_id=book["id"]: rag_system.precompute_book_summary(book_id)
+            for book in rag_system.get_available_books()
+        ], api_name="groq")
+
+    def _run(self, fetches: List[Callable[[], Any]], api_name: Optional[str] = None) -> Dict[str, int]:
+        """
+        Run fetch functions, counting results.
+
+        Args:
+            fetches: Zero-argument functions that populate the cache
+            api_name: API whose quota the fetches may spend, checked before each one
+
+        Returns:
+            Dictionary with 'warmed', 'skipped' and 'failed' counts
+        """
+        counts = {"warmed": 0, "skipped": 0, "failed": 0}
+        for fetch in fetches:
+            if api_name and not self._has_quota_headroom(api_name):
+                counts["skipped"] += 1
+                continue
+
+            result = fetch()
+            if not result or (isinstance(result, dict) and "error" in result):
+                counts["failed"] += 1
+            else:
+                counts["warmed"] += 1
+        return counts
+
+    def _has_quota_headroom(self, api_name: str) -> bool:
+        """Check that more than min_quota_percent of an API's daily limit is left."""
+        try:
+            remaining = cache_manager.quota_store.remaining(api_name)
+        except sqlite3.Error as e:
+            # Same fail-open policy as reserving quota
+            logger.warning(f"Error reading {api_name} API quota: {str(e)}")
+            return True
+
+        if remaining is None:
+            return True
+
+        limit = cache_manager.quota_store.limits[api_name]
+        if remaining * 100 <= limit * self.min_quota_percent:
+            logger.info(f"Skipping {api_name} warm-up: {remaining}/{limit} calls left today")
+            return False
+        return True
+
+    def _quota_counts(self) -> Dict[str, int]:
+        """Current window usage per API."""
+        try:
+            return {api_name: stats["count"] for api_name, stats in cache_manager.get_api_usage_stats().items()}
+        except sqlite3.Error:
+            return {}
+
+    def next_run(self, now: Optional[datetime] = None) -> datetime:
+        """
+        Get the next scheduled warm-up: CACHE_WARM_TIME (IST) on the next trading day.
+
+        Args:
+            now: Reference time (defaults to the current time)
+
+        Returns:
+            Timezone-aware time of the next run
+        """
+        now = datetime.now(nse_calendar.tz) if now is None else now.astimezone(nse_calendar.tz)
+        hour, minute = (int(part) for part in config.CACHE_WARM_TIME.split(":"))
+
+        day = now.date()
+        while True:
+            run_at = datetime(day.year, day.month, day.day, hour, minute, tzinfo=nse_calendar.tz)
+            if run_at > now and nse_calendar.is_trading_day(day):
+                return run_at
+            day += timedelta(days=1)
+
+    def start_scheduler(self) -> None:
+        """Start a daemon thread that warms the cache at every scheduled run."""
+        if self._scheduler_thread is not None:
+            return
+
+        self._scheduler_stop.clear()
+        self._scheduler_thread = threading.Thread(
+            target=self._scheduler_loop,
+            name="cache-warmer",
+            daemon=True
+        )
+        self._scheduler_thread.start()
+        logger.info(f"Cache warm-up scheduled for {self.next_run().isoformat()}")
+
+    def stop_scheduler(self) -> None:
+        """Stop the scheduler thread."""
+        if self._scheduler_thread is None:
+            return
+
+        self._scheduler_stop.set()
+        self._scheduler_thread.join(timeout=5)
+        self._scheduler_thread = None
+
+    def _scheduler_loop(self) -> None:
+        """Sleep until each scheduled run and warm the cache, until stopped."""
+        while True:
+            run_at = self.next_run()
+            delay = (run_at - datetime.now(nse_calendar.tz)).total_seconds()
+            if self._scheduler_stop.wait(max(0, delay)):
+                break
+            if not self._claim_run(run_at):
+                continue
+            try:
+                self.warm()
+            except Exception as e:
+                logger.error(f"Error during scheduled cache warm-up: {str(e)}")
+
+    def _claim_run(self, run_at: datetime) -> bool:
+        """
+        Atomically claim a scheduled run for this process.
+
+        Args:
+            run_at: Scheduled time of the run
+
+        Returns:
+            True if this process claimed the run, False if another process already had
+        """
+        run_key = run_at.isoformat()
+        try:
+            os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.lock_path, timeout=30, isolation_level=None)
+            try:
+                conn.execute("CREATE TABLE IF NOT EXISTS warm_runs (run_key TEXT PRIMARY KEY, claimed_at REAL NOT NULL)")
+                # The primary key makes the first insert of a run win across processes
+                claimed = conn.execute(
+                    "INSERT OR IGNORE INTO warm_runs (run_key, claimed_at) VALUES (?, ?)",
+                    (run_key, time.time())
+                ).rowcount == 1
+                conn.execute("DELETE FROM warm_runs WHERE claimed_at < ?", (time.time() - WARM_RUN_RETENTION_SECONDS,))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # Without the claim every worker could warm, multiplying quota use
+            logger.warning(f"Skipping scheduled cache warm-up, could not claim the run: {str(e)}")
+            return False
+
+        if not claimed:
+            logger.info(f"Cache warm-up for {run_key} already run by another process")
+        return claimed
+
+
+# Create a global cache warmer instance
+cache_warmer = CacheWarmer()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Prefetch frequently requested data into the response cache.")
+    parser.add_argument("--only", nargs="+", choices=WARM_TARGETS, help="Warm only these targets")
+    parser.add_argument("--symbols", nargs="+", help="Watchlist symbols (defaults to CACHE_WARM_SYMBOLS)")
+    parser.add_argument("--min-quota-percent", type=int,
+                        help="Skip Tavily/Groq calls once less than this share of the daily limit is left")
+    parser.add_argument("--schedule", action="store_true",
+                        help=f"Keep running and warm at {config.CACHE_WARM_TIME} IST on every trading day")
+    args = parser.parse_args(argv)
+
+    warmer = CacheWarmer(
+        symbols=[symbol.upper() for symbol in args.symbols] if args.symbols else None,
+        min_quota_percent=args.min_quota_percent
+    )
+
+    if args.schedule:
+        warmer.start_scheduler()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            warmer.stop_scheduler()
+        return 0
+
+    report = warmer.warm(args.only)
+    print(json.dumps(report, indent=2))
+    return 0 if all(counts["failed"] == 0 for counts in report["targets"].values()) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
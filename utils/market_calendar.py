@@ -0,0 +1,189 @@
+"""
+NSE trading calendar used to decide how long market data stays fresh
+"""
+import logging
+from datetime import datetime, date, time, timedelta, timezone
+from typing import Iterable, Optional, Set
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# India has no daylight saving time, so a fixed offset is exact
+IST = timezone(timedelta(hours=5, minutes=30), name="IST")
+
+# NSE equity segment trading holidays (weekday closures only). Extend with
+# the NSE_HOLIDAYS setting when the exchange publishes next year's circular.
+NSE_HOLIDAYS = {
+    # 2025
+    date(2025, 2, 26),  # Mahashivratri
+    date(2025, 3, 14),  # Holi
+    date(2025, 3, 31),  # Id-Ul-Fitr
+    date(2025, 4, 10),  # Shri Mahavir Jayanti
+    date(2025, 4, 14),  # Dr. Baba Saheb Ambedkar Jayanti
+    date(2025, 4, 18),  # Good Friday
+    date(2025, 5, 1),  # Maharashtra Day
+    date(2025, 8, 15),  # Independence Day
+    date(2025, 8, 27),  # Ganesh Chaturthi
+    date(2025, 10, 2),  # Mahatma Gandhi Jayanti / Dussehra
+    date(2025, 10, 21),  # Diwali Laxmi Pujan
+    date(2025, 10, 22),  # Diwali Balipratipada
+    date(2025, 11, 5),  # Prakash Gurpurb Sri Guru Nanak Dev
+    date(2025, 12, 25),  # Christmas
+    # 2026 fixed-date holidays; lunar-calendar ones come from NSE_HOLIDAYS
+    date(2026, 1, 26),  # Republic Day
+    date(2026, 4, 14),  # Dr. Baba Saheb Ambedkar Jayanti
+    date(2026, 5, 1),  # Maharashtra Day
+    date(2026, 10, 2),  # Mahatma Gandhi Jayanti
+    date(2026, 12, 25),  # Christmas
+}
+
+class MarketCalendar:
+    """
+    Trading sessions of an exchange: session hours in local time, weekends
+    and holidays. Answers whether the market is open, when it next opens, and
+    how long data fetched now can be cached.
+    """
+
+    def __init__(self, holidays: Iterable[date] = (), open_time: time = time(9, 15),
+                 close_time: time = time(15, 30), tz: timezone = IST):
+        """
+        Initialize the calendar.
+
+        Args:
+            holidays: Weekday dates on which the exchange is closed
+            open_time: Session open in exchange local time
+            close_time: Session close in exchange local time
+            tz: Exchange time zone
+        """
+        self.holidays: Set[date] = set(holidays)
+        self.open_time = open_time
+        self.close_time = close_time
+        self.tz = tz
+
+    def _local(self, now: Optional[datetime]) -> datetime:
+        """Convert a time (default: now) to exchange local time."""
+        if now is None:
+            return datetime.now(self.tz)
+        if now.tzinfo is None:
+            # Naive datetimes are taken as system local time, like datetime.now()
+            now = now.astimezone()
+        return now.astimezone(self.tz)
+
+    def is_trading_day(self, day: date) -> bool:
+        """
+        Check whether the exchange holds a session on a date.
+
+        Args:
+            day: Date in exchange local time
+
+        Returns:
+            True on weekdays that are not holidays
+        """
+        return day.weekday() < 5 and day not in self.holidays
+
+    def is_open(self, now: Optional[datetime] = None) -> bool:
+        """
+        Check whether the regular session is in progress.
+
+        Args:
+            now: Time to check (defaults to the current time)
+
+        Returns:
+            True between open and close on a trading day
+        """
+        local = self._local(now)
+        return self.is_trading_day(local.date()) and self.open_time <= local.time() < self.close_time
+
+    def next_open(self, now: Optional[datetime] = None) -> datetime:
+        """
+        Get the start of the next regular session.
+
+        Args:
+            now: Reference time (defaults to the current time)
+
+        Returns:
+            Timezone-aware open time strictly after now
+        """
+        local = self._local(now)
+        day = local.date()
+        if local.time() >= self.open_time:
+            day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return datetime.combine(day, self.open_time, tzinfo=self.tz)
+
+    def last_close(self, now: Optional[datetime] = None) -> datetime:
+        """
+        Get the end of the most recent regular session that has closed.
+
+        Args:
+            now: Reference time (defaults to the current time)
+
+        Returns:
+            Timezone-aware close time at or before now
+        """
+        local = self._local(now)
+        day = local.date()
+        if local.time() < self.close_time:
+            day -= timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return datetime.combine(day, self.close_time, tzinfo=self.tz)
+
+    def cache_ttl(self, session_ttl: int, close_grace: int = 0, now: Optional[datetime] = None) -> int:
+        """
+        Get how long market data fetched now stays fresh.
+
+        During the session data is cached for session_ttl seconds. For
+        close_grace seconds after the close it keeps that short TTL so the
+        settled closing values are picked up. Otherwise prices cannot change
+        until the next open, so data stays valid until then.
+
+        Args:
+            session_ttl: TTL in seconds while the market is open
+            close_grace: Seconds after the close during which session_ttl still applies
+            now: Reference time (defaults to the current time)
+
+        Returns:
+            TTL in seconds
+        """
+        local = self._local(now)
+        if self.is_open(local):
+            return session_ttl
+
+        since_close = (local - self.last_close(local)).total_seconds()
+        if since_close < close_grace:
+            return session_ttl
+
+        return max(session_ttl, int((self.next_open(local) - local).total_seconds()))
+
+
+def _parse_holidays(values: Iterable[str]) -> Set[date]:
+    """Parse YYYY-MM-DD strings, skipping invalid ones."""
+    holidays = set()
+    for value in values:
+        try:
+            holidays.add(date.fromisoformat(value.strip()))
+        except ValueError:
+            logger.warning(f"Ignoring invalid NSE holiday date: {value}")
+    return holidays
+
+# Create a global NSE calendar instance
+nse_calendar = MarketCalendar(holidays=NSE_HOLIDAYS | _parse_holidays(config.NSE_HOLIDAYS))
+
+def market_data_ttl(now: Optional[datetime] = None) -> int:
+    """
+    Get the cache TTL for NSE quotes and index data fetched now.
+
+    Args:
+        now: Reference time (defaults to the current time)
+
+    Returns:
+        TTL in seconds
+    """
+    return nse_calendar.cache_ttl(
+        session_ttl=config.MARKET_SESSION_CACHE_TTL_SECONDS,
+        close_grace=config.MARKET_CLOSE_GRACE_SECONDS,
+        now=now
+    )
@@ -0,0 +1,113 @@
+"""
+In-process LRU cache used as the first tier in front of the disk cache
+"""
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def entry_deadline(cache_data: Dict[str, Any]) -> float:
+    """Time after which a cache entry can no longer be served, even as stale."""
+    return max(cache_data.get('expires_at', 0), cache_data.get('stale_until', 0))
+
+class MemoryCache:
+    """
+    Thread-safe LRU cache bounded by entry count and approximate byte size.
+    Entries carry their own expiry time and are dropped once it has passed
+    (or once their 'stale_until' grace period has passed, if they have one).
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024):
+        """
+        Initialize the memory cache.
+
+        Args:
+            max_entries: Maximum number of entries to keep
+            max_bytes: Maximum total size of the entries in bytes
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        # key -> (cache_data, size_in_bytes)
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the cache data stored for a key if present and not past its deadline.
+        Stale entries are returned as-is; callers compare 'expires_at' themselves.
+
+        The returned dictionary is shared with the cache and must not be mutated.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cache data dictionary ('data', 'cached_at', 'expires_at', optional 'stale_until') or None
+        """
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+
+            cache_data, _ = item
+            if entry_deadline(cache_data) < time.time():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return cache_data
+
+    def set(self, key: str, cache_data: Dict[str, Any], size: int) -> None:
+        """
+        Store cache data for a key, evicting least recently used entries if needed.
+
+        Args:
+            key: Cache key
+            cache_data: Cache data dictionary including 'expires_at'
+            size: Approximate size of the serialized entry in bytes
+        """
+        if self.max_entries <= 0 or size > self.max_bytes:
+            # Entry can never fit; make sure an older copy does not linger
+            self.delete(key)
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (cache_data, size)
+            self._total_bytes += size
+
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def delete(self, key: str) -> None:
+        """Remove a key from the cache if present."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _remove(self, key: str) -> None:
+        """Remove a key; caller must hold the lock."""
+        _, size = self._entries.pop(key)
+        self._total_bytes -= size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        """Approximate total size of the cached entries in bytes."""
+        return self._total_bytes
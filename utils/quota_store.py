@@ -0,0 +1,255 @@
+"""
+Cross-process API quota counters backed by SQLite
+"""
+import time
+import uuid
+import atexit
+import sqlite3
+import logging
+import threading
+from typing import Dict, Any, Optional, List
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+class QuotaStore:
+    """
+    Sliding-window API call counters shared by every process using the same
+    database file.
+
+    Usage is kept in fixed-size time buckets per API; the window total is the
+    sum of the buckets younger than the window. A call first reserves quota
+    (atomically checked against the limit and counted), then either commits
+    the reservation or releases it to refund the quota if the call failed.
+    Commits only clear bookkeeping rows, so they are buffered and written in
+    batches.
+    """
+
+    def __init__(self, db_path: Path, limits: Dict[str, int], window_seconds: int = 24 * 60 * 60,
+                 bucket_seconds: int = 60, flush_interval: float = 5.0, flush_batch_size: int = 20,
+                 reservation_timeout: int = 10 * 60):
+        """
+        Initialize the quota store.
+
+        Args:
+            db_path: Path to the SQLite database file shared across processes
+            limits: Maximum calls per window for each API name
+            window_seconds: Length of the sliding window in seconds
+            bucket_seconds: Granularity of the usage buckets in seconds
+            flush_interval: Maximum seconds commits are buffered before being written
+            flush_batch_size: Number of buffered commits that triggers a write
+            reservation_timeout: Seconds after which an unfinished reservation is treated as committed
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(exist_ok=True, parents=True)
+        self.limits = {name.lower(): limit for name, limit in limits.items()}
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self.reservation_timeout = reservation_timeout
+
+        self._local = threading.local()
+        self._pending_commits: List[str] = []
+        self._pending_lock = threading.Lock()
+        self._last_flush = time.time()
+
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS quota_buckets ("
+                " api TEXT NOT NULL,"
+                " bucket INTEGER NOT NULL,"
+                " used INTEGER NOT NULL,"
+                " PRIMARY KEY (api, bucket))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS quota_reservations ("
+                " id TEXT PRIMARY KEY,"
+                " api TEXT NOT NULL,"
+                " bucket INTEGER NOT NULL,"
+                " units INTEGER NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+
+        atexit.register(self.flush)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode so transactions can be opened explicitly with BEGIN IMMEDIATE
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _bucket(self, now: float) -> int:
+        """Start time of the bucket containing now."""
+        return int(now // self.bucket_seconds) * self.bucket_seconds
+
+    def _window_start(self, now: float) -> int:
+        """Start time of the oldest bucket that overlaps the window."""
+        return self._bucket(now - self.window_seconds)
+
+    def reserve(self, api_name: str, units: int = 1) -> Optional[str]:
+        """
+        Atomically reserve quota for a call.
+
+        Args:
+            api_name: API name (e.g. 'tavily' or 'groq')
+            units: Number of calls to reserve
+
+        Returns:
+            Reservation id, or None if the call would exceed the limit
+        """
+        api_name = api_name.lower()
+        limit = self.limits.get(api_name)
+        now = time.time()
+        bucket = self._bucket(now)
+        reservation_id = uuid.uuid4().hex
+
+        conn = self._connect()
+        # BEGIN IMMEDIATE takes the write lock up front, so the check and the
+        # increment cannot interleave with another process
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            used = conn.execute(
+                "SELECT COALESCE(SUM(used), 0) FROM quota_buckets WHERE api = ? AND bucket >= ?",
+                (api_name, self._window_start(now))
+            ).fetchone()[0]
+
+            if limit is not None and used + units > limit:
+                conn.execute("ROLLBACK")
+                logger.warning(f"{api_name} API rate limit exceeded: {limit} calls per {self.window_seconds}s")
+                return None
+
+            conn.execute(
+                "INSERT INTO quota_buckets (api, bucket, used) VALUES (?, ?, ?) "
+                "ON CONFLICT (api, bucket) DO UPDATE SET used = used + excluded.used",
+                (api_name, bucket, units)
+            )
+            conn.execute(
+                "INSERT INTO quota_reservations (id, api, bucket, units, created_at) VALUES (?, ?, ?, ?, ?)",
+                (reservation_id, api_name, bucket, units, now)
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+        if limit:
+            usage_percent = (used + units) / limit * 100
+            if usage_percent >= 80:
+                logger.warning(f"{api_name} API usage at {usage_percent:.1f}% of daily limit")
+            elif usage_percent >= 50:
+                logger.info(f"{api_name} API usage at {usage_percent:.1f}% of daily limit")
+
+        return reservation_id
+
+    def commit(self, reservation_id: str) -> None:
+        """
+        Confirm that a reserved call was made. The usage is already counted, so
+        the bookkeeping row is cleared in the next batched flush.
+
+        Args:
+            reservation_id: Id returned by reserve()
+        """
+        with self._pending_lock:
+            self._pending_commits.append(reservation_id)
+            due = (len(self._pending_commits) >= self.flush_batch_size or
+                   time.time() - self._last_flush >= self.flush_interval)
+
+        if due:
+            self.flush()
+
+    def release(self, reservation_id: str) -> None:
+        """
+        Refund a reservation whose call was not made or failed.
+
+        Args:
+            reservation_id: Id returned by reserve()
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT api, bucket, units FROM quota_reservations WHERE id = ?", (reservation_id,)
+            ).fetchone()
+            if row:
+                api_name, bucket, units = row
+                conn.execute(
+                    "UPDATE quota_buckets SET used = MAX(used - ?, 0) WHERE api = ? AND bucket = ?",
+                    (units, api_name, bucket)
+                )
+                conn.execute("DELETE FROM quota_reservations WHERE id = ?", (reservation_id,))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def flush(self) -> None:
+        """Write buffered commits and prune buckets and reservations that are no longer needed."""
+        with self._pending_lock:
+            pending, self._pending_commits = self._pending_commits, []
+            self._last_flush = time.time()
+
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("DELETE FROM quota_reservations WHERE id = ?", [(r,) for r in pending])
+                # Abandoned reservations (e.g. the process died mid-call) stay counted
+                conn.execute(
+                    "DELETE FROM quota_reservations WHERE created_at < ?",
+                    (now - self.reservation_timeout,)
+                )
+                conn.execute("DELETE FROM quota_buckets WHERE bucket < ?", (self._window_start(now),))
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Error flushing API quota commits: {str(e)}")
+
+    def usage(self, api_name: str) -> Dict[str, Any]:
+        """
+        Get current usage within the sliding window for an API.
+
+        Args:
+            api_name: API name
+
+        Returns:
+            Dictionary with count, limit and seconds until the oldest counted call leaves the window
+        """
+        api_name = api_name.lower()
+        now = time.time()
+        window_start = self._window_start(now)
+
+        count, oldest = self._connect().execute(
+            "SELECT COALESCE(SUM(used), 0), MIN(bucket) FROM quota_buckets "
+            "WHERE api = ? AND bucket >= ? AND used > 0",
+            (api_name, window_start)
+        ).fetchone()
+
+        reset_in = max(0, oldest + self.bucket_seconds + self.window_seconds - now) if oldest is not None else 0
+
+        return {
+            "count": count,
+            "limit": self.limits.get(api_name, 0),
+            "reset_in_seconds": reset_in
+        }
+
+    def remaining(self, api_name: str) -> Optional[int]:
+        """
+        Get the number of calls left in the window, or None if the API has no limit.
+
+        Args:
+            api_name: API name
+        """
+        limit = self.limits.get(api_name.lower())
+        if limit is None:
+            return None
+        return max(0, limit - self.usage(api_name)["count"])
@@ -0,0 +1,73 @@
+"""
+Token bucket rate limiter shared by threads
+"""
+import time
+import threading
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: `rate` units are added every `period` seconds,
+    up to `capacity`. acquire() takes units and sleeps until they are
+    available; callers queue fairly because a request larger than the
+    balance reserves its units and leaves the bucket in debt.
+    """
+
+    def __init__(self, rate: float, period: float = 60.0, capacity: Optional[float] = None):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate: Units allowed per period (e.g. requests or tokens per minute)
+            period: Length of the period in seconds
+            capacity: Largest burst (defaults to one second's worth, at least 1)
+        """
+        if rate <= 0 or period <= 0:
+            raise ValueError("rate and period must be positive")
+
+        self.rate = rate
+        self.period = period
+        self.per_second = rate / period
+        self.capacity = capacity if capacity is not None else max(1.0, self.per_second)
+
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """
+        Take units from the bucket without waiting.
+
+        Args:
+            amount: Units to take
+
+        Returns:
+            Seconds the caller must wait before using them
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.per_second)
+            self._updated = now
+
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.per_second
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """
+        Take units from the bucket, sleeping until they are available.
+
+        Args:
+            amount: Units to take
+
+        Returns:
+            Seconds spent waiting
+        """
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+        return wait